@@ -0,0 +1,258 @@
+"""
+アドミッション制御とクライアントごとのレート制限
+
+重いエンドポイントを処理クラス（download / dsp / llm）に分け、クラスごとに
+- 同時実行数の上限と、上限を超えた分の有限な待ち行列（満杯・待ち時間切れは429 + Retry-After）
+- クライアント（APIキーまたはIPアドレス）ごとのトークンバケット
+を適用する。上限は実行時に update_limits() で変更できる。
+"""
+import asyncio
+import contextvars
+import hashlib
+import math
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from config import get_admission_overrides
+from metrics import registry
+
+DOWNLOAD = "download"
+DSP = "dsp"
+LLM = "llm"
+
+DEFAULT_LIMITS: Dict[str, Dict[str, float]] = {
+    # max_concurrent: 同時実行数 / max_queue: 待ち行列の長さ / queue_timeout: 待ち時間の上限（秒）
+    # rate: クライアントごとの補充レート（回/秒、0で無制限） / burst: バケット容量
+    DOWNLOAD: {"max_concurrent": 4, "max_queue": 16, "queue_timeout": 60.0, "rate": 0.5, "burst": 20},
+    DSP: {"max_concurrent": 2, "max_queue": 8, "queue_timeout": 120.0, "rate": 0.2, "burst": 10},
+    LLM: {"max_concurrent": 4, "max_queue": 8, "queue_timeout": 120.0, "rate": 0.1, "burst": 5},
+}
+
+INTEGER_LIMITS = ("max_concurrent", "max_queue")
+
+# 推定処理時間の初期値（秒、Retry-Afterの算出に使用）
+INITIAL_SERVICE_SECONDS = {DOWNLOAD: 10.0, DSP: 30.0, LLM: 20.0}
+
+# ミドルウェアで設定されるクライアントのIPアドレス
+client_address_var: contextvars.ContextVar[str] = contextvars.ContextVar("clipers_client_address", default="unknown")
+
+ADMISSION_ACTIVE = registry.gauge(
+    "clipers_admission_active", "Admitted computations currently running", ["endpoint_class"])
+ADMISSION_QUEUED = registry.gauge(
+    "clipers_admission_queued", "Computations waiting for a slot", ["endpoint_class"])
+ADMISSION_REJECTED = registry.counter(
+    "clipers_admission_rejected_total", "Requests rejected with 429", ["endpoint_class", "reason"])
+ADMISSION_WAIT = registry.histogram(
+    "clipers_admission_wait_seconds", "Time spent waiting for a slot", ["endpoint_class"])
+
+
+class AdmissionRejected(Exception):
+    """上限超過で受け付けられない場合の例外（429に変換する）"""
+
+    def __init__(self, endpoint_class: str, reason: str, retry_after: float):
+        super().__init__(f"{endpoint_class}: {reason}")
+        self.endpoint_class = endpoint_class
+        self.reason = reason
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+
+
+class _ClassGate:
+    """1つの処理クラスの同時実行数と待ち行列（イベントループ上でのみ使用）"""
+
+    def __init__(self, name: str, limits: Dict[str, float]):
+        self.name = name
+        self.limits = dict(limits)
+        self.active = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.service_seconds = INITIAL_SERVICE_SECONDS.get(name, 10.0)
+
+    def retry_after(self) -> float:
+        """待ち行列が捌けるまでのおおよその秒数"""
+        slots = max(1, int(self.limits["max_concurrent"]))
+        return self.service_seconds * (len(self.waiters) + 1) / slots
+
+    def _has_slot(self) -> bool:
+        return self.limits["max_concurrent"] <= 0 or self.active < self.limits["max_concurrent"]
+
+    async def acquire(self):
+        if self._has_slot() and not self.waiters:
+            self.active += 1
+            return
+        if len(self.waiters) >= self.limits["max_queue"]:
+            raise AdmissionRejected(self.name, "queue_full", self.retry_after())
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append(future)
+        ADMISSION_QUEUED.inc(endpoint_class=self.name)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.limits["queue_timeout"])
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                # タイムアウトと同時に枠が割り当てられた場合はそのまま実行する
+                return
+            future.cancel()
+            raise AdmissionRejected(self.name, "queue_timeout", self.retry_after())
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(0.0)
+            else:
+                future.cancel()
+            raise
+        finally:
+            if future in self.waiters:
+                self.waiters.remove(future)
+            ADMISSION_QUEUED.dec(endpoint_class=self.name)
+
+    def release(self, elapsed: float):
+        self.active -= 1
+        if elapsed > 0:
+            # 処理時間の指数移動平均（Retry-Afterの見積もり用）
+            self.service_seconds = 0.8 * self.service_seconds + 0.2 * elapsed
+        self.wake()
+
+    def wake(self):
+        """空いた枠を待ち行列の先頭から割り当てる（枠はここで確保してから起こす）"""
+        while self.waiters and self._has_slot():
+            future = self.waiters.popleft()
+            if not future.done():
+                self.active += 1
+                future.set_result(None)
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """トークンを1つ消費する。不足している場合は次のトークンまでの秒数を返す（0なら成功）"""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionController:
+    """処理クラスごとのアドミッション制御とクライアントごとのレート制限"""
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, float]]] = None, max_clients: int = 10000):
+        self._lock = threading.Lock()
+        self._gates: Dict[str, _ClassGate] = {}
+        self._buckets: Dict[tuple, TokenBucket] = {}
+        self.max_clients = max_clients
+        merged = {name: dict(values) for name, values in DEFAULT_LIMITS.items()}
+        for name, values in (limits or {}).items():
+            merged.setdefault(name, dict(DEFAULT_LIMITS[DSP])).update(values)
+        for name, values in merged.items():
+            self._gates[name] = _ClassGate(name, values)
+
+    def _gate(self, endpoint_class: str) -> _ClassGate:
+        if endpoint_class not in self._gates:
+            raise ValueError(f"不明な処理クラスです: {endpoint_class}")
+        return self._gates[endpoint_class]
+
+    def check_rate(self, endpoint_class: str, client_id: str):
+        """クライアントのトークンを消費（不足していればAdmissionRejected）"""
+        limits = self._gate(endpoint_class).limits
+        if limits["rate"] <= 0:
+            return
+        with self._lock:
+            key = (endpoint_class, client_id)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_clients:
+                    self._evict_full_buckets()
+                bucket = self._buckets[key] = TokenBucket(limits["rate"], limits["burst"])
+            else:
+                bucket.rate, bucket.burst = limits["rate"], limits["burst"]
+            wait = bucket.take()
+        if wait > 0:
+            ADMISSION_REJECTED.inc(endpoint_class=endpoint_class, reason="rate_limited")
+            raise AdmissionRejected(endpoint_class, "rate_limited", wait)
+
+    def _evict_full_buckets(self):
+        """満タンまで回復したバケット（= 最近使われていないクライアント）を破棄"""
+        now = time.monotonic()
+        for key in [key for key, bucket in self._buckets.items()
+                    if bucket.tokens + (now - bucket.updated) * bucket.rate >= bucket.burst]:
+            del self._buckets[key]
+
+    async def acquire(self, endpoint_class: str) -> float:
+        """実行枠を確保（待ち行列が満杯・待ち時間切れならAdmissionRejected）。確保時刻を返す"""
+        gate = self._gate(endpoint_class)
+        started = time.perf_counter()
+        try:
+            await gate.acquire()
+        except AdmissionRejected as e:
+            ADMISSION_REJECTED.inc(endpoint_class=endpoint_class, reason=e.reason)
+            raise
+        ADMISSION_WAIT.observe(time.perf_counter() - started, endpoint_class=endpoint_class)
+        ADMISSION_ACTIVE.set(gate.active, endpoint_class=endpoint_class)
+        return time.perf_counter()
+
+    def release(self, endpoint_class: str, admitted_at: float):
+        gate = self._gate(endpoint_class)
+        gate.release(time.perf_counter() - admitted_at)
+        ADMISSION_ACTIVE.set(gate.active, endpoint_class=endpoint_class)
+
+    def update_limits(self, updates: Dict[str, Dict[str, float]]) -> Dict[str, Dict]:
+        """上限を実行時に変更（指定したキーのみ上書き）し、変更後の設定を返す"""
+        validated = {}
+        for endpoint_class, values in updates.items():
+            gate = self._gate(endpoint_class)
+            if not isinstance(values, dict):
+                raise ValueError(f"{endpoint_class}: 設定はオブジェクトで指定してください")
+            unknown = set(values) - set(gate.limits)
+            if unknown:
+                raise ValueError(f"不明な設定項目です: {', '.join(sorted(unknown))}")
+            parsed = {key: int(value) if key in INTEGER_LIMITS else float(value) for key, value in values.items()}
+            if any(value < 0 for value in parsed.values()):
+                raise ValueError(f"{endpoint_class}: 負の値は指定できません")
+            validated[endpoint_class] = parsed
+        # 全クラスの検証が通ってから反映する（一部だけ変更された状態を残さない）
+        for endpoint_class, parsed in validated.items():
+            gate = self._gates[endpoint_class]
+            gate.limits.update(parsed)
+            # 上限を引き上げた場合は待機中のリクエストを起こす
+            gate.wake()
+        return self.snapshot()
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            clients: Dict[str, int] = {}
+            for endpoint_class, _ in self._buckets:
+                clients[endpoint_class] = clients.get(endpoint_class, 0) + 1
+        return {
+            name: {
+                "limits": dict(gate.limits),
+                "active": gate.active,
+                "queued": len(gate.waiters),
+                "estimated_service_seconds": round(gate.service_seconds, 2),
+                "rate_limited_clients": clients.get(name, 0)
+            }
+            for name, gate in self._gates.items()
+        }
+
+
+def api_key_digest(api_key: Optional[str]) -> Optional[str]:
+    """APIキーのsha256の先頭16桁（キーそのものを保持・記録しないための識別子、キーがない場合はNone）"""
+    if not api_key:
+        return None
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
+
+def client_id_for(api_key: Optional[str] = None, address: Optional[str] = None) -> str:
+    """レート制限のキー（APIキーはハッシュ化して保持、なければIPアドレス）"""
+    if api_key:
+        return "key:" + api_key_digest(api_key)
+    return "ip:" + (address or client_address_var.get())
+
+
+admission = AdmissionController(get_admission_overrides())
@@ -0,0 +1,119 @@
+"""
+音声分析プロファイル
+
+分析ごとのサンプルレート・チャンネル構成・フレーム/ホップ長・特徴量セットをまとめた
+名前付きプロファイル。リクエスト単位で精度と処理速度のトレードオフを選択できる。
+
+- speech-fast: 8kHzモノラル。話し声中心の動画向けの高速モード
+- default: 22.05kHzモノラル。従来の分析と同じ設定
+- music-hq: 44.1/48kHzステレオ。ステレオ幅と高域エネルギーも分析する音楽向けモード
+"""
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional, Tuple
+
+from config import get_analysis_profile
+
+FEATURE_DB = "db"
+FEATURE_PITCH = "pitch"
+FEATURE_STEREO = "stereo"
+FEATURE_SPECTRAL = "spectral"
+
+
+@dataclass(frozen=True)
+class AnalysisProfile:
+    """音声分析の設定一式"""
+    name: str
+    sample_rate: int
+    mono: bool
+    # dB測定（RMS）のフレーム長・ホップ長（秒）
+    frame_seconds: float
+    hop_seconds: float
+    # 音調分析・スペクトル分析のSTFT設定（サンプル数）
+    n_fft: int
+    stft_hop: int
+    features: Tuple[str, ...]
+    # このレートの音声はリサンプルせずそのまま分析する
+    native_rates: Tuple[int, ...] = ()
+    # リサンプル品質（Noneの場合は設定値）
+    resample_quality: Optional[str] = None
+    # 分析に十分な音声ストリームの最低ビットレート（kbps、これ以上で最小のストリームを取得する）
+    min_audio_kbps: int = 48
+    description: str = ""
+
+    def frame_length(self, sr: int) -> int:
+        return int(self.frame_seconds * sr)
+
+    def hop_length(self, sr: int) -> int:
+        return int(self.hop_seconds * sr)
+
+    def decode_rate(self) -> Optional[int]:
+        """デコード時の目標サンプルレート（Noneの場合はネイティブのまま読み込む）"""
+        return None if self.native_rates else self.sample_rate
+
+    def has(self, feature: str) -> bool:
+        return feature in self.features
+
+    def to_dict(self) -> Dict:
+        result = asdict(self)
+        result["features"] = list(self.features)
+        result["native_rates"] = list(self.native_rates)
+        return result
+
+
+PROFILES: Dict[str, AnalysisProfile] = {
+    profile.name: profile
+    for profile in (
+        AnalysisProfile(
+            name="speech-fast",
+            sample_rate=8000,
+            mono=True,
+            frame_seconds=0.040,
+            hop_seconds=0.020,
+            n_fft=512,
+            stft_hop=160,
+            features=(FEATURE_DB, FEATURE_PITCH),
+            resample_quality="medium",
+            min_audio_kbps=32,
+            description="8kHzモノラル・20msホップの高速モード（話し声向け）"
+        ),
+        AnalysisProfile(
+            name="default",
+            sample_rate=22050,
+            mono=True,
+            frame_seconds=0.025,
+            hop_seconds=0.010,
+            n_fft=2048,
+            stft_hop=512,
+            features=(FEATURE_DB, FEATURE_PITCH),
+            description="22.05kHzモノラル（従来の分析と同じ設定）"
+        ),
+        AnalysisProfile(
+            name="music-hq",
+            sample_rate=44100,
+            mono=False,
+            frame_seconds=0.025,
+            hop_seconds=0.010,
+            n_fft=4096,
+            stft_hop=1024,
+            features=(FEATURE_DB, FEATURE_PITCH, FEATURE_STEREO, FEATURE_SPECTRAL),
+            native_rates=(44100, 48000),
+            min_audio_kbps=128,
+            description="44.1/48kHzステレオ。ステレオ幅と高域エネルギーを含む音楽向けモード"
+        ),
+    )
+}
+
+DEFAULT_PROFILE = "default"
+
+
+def get_profile(name: Optional[str] = None) -> AnalysisProfile:
+    """
+    名前からプロファイルを取得（Noneの場合は設定値 CLIPERS_ANALYSIS_PROFILE）
+
+    Raises:
+        ValueError: 不明なプロファイル名の場合
+    """
+    name = name or get_analysis_profile() or DEFAULT_PROFILE
+    if name not in PROFILES:
+        raise ValueError(f"不明な分析プロファイルです: {name}（{', '.join(PROFILES)}）")
+    return PROFILES[name]
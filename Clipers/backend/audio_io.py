@@ -0,0 +1,330 @@
+"""
+音声デコードの抽象化レイヤー
+
+librosa.loadの代わりに、ファイル形式に応じて最も安価なデコードバックエンドを選択する。
+- soundfile: WAV/FLAC/OGGをネイティブPCMとして直接読み込み
+- ffmpeg: 圧縮フォーマット(m4a/webm/opus等)をパイプ経由でデコード・リサンプル
+- memmap: 一度デコードしたPCMを.npyとして保存し、以降はメモリマップで読み込み
+- librosa: 従来通りのlibrosa.load（フォールバック）
+
+バックエンドごとのデコードスループットを記録し、get_decode_stats()で参照できる。
+"""
+import os
+import re
+import shutil
+import subprocess
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from config import get_audio_backend, get_resample_quality
+from derived_cache import derived_path, atomic_output
+
+# リサンプル品質 → librosa(soxr)のres_type
+RESAMPLE_RES_TYPES = {
+    "high": "soxr_hq",     # librosa.loadの既定値と同等
+    "medium": "soxr_mq",
+    "fast": "soxr_qq",     # RMS/dBエンベロープ用途には十分な低品質・高速モード
+}
+
+# リサンプル品質 → ffmpegのaresampleフィルタ
+FFMPEG_RESAMPLE_FILTERS = {
+    "high": "aresample=resampler=soxr:precision=28",
+    "medium": None,        # ffmpeg既定のswresample
+    "fast": "aresample=filter_size=4:phase_shift=6",
+}
+
+SOUNDFILE_EXTENSIONS = {'.wav', '.flac', '.ogg', '.aiff', '.aif'}
+
+# ffmpeg -i の出力から音声ストリームの仕様を読み取るパターンと、チャンネルレイアウト → チャンネル数
+FFMPEG_AUDIO_STREAM_PATTERN = re.compile(r"Stream #\d+:\d+.*?: Audio: [^,]+, (\d+) Hz, ([^,\n]+)")
+FFMPEG_DURATION_PATTERN = re.compile(r"Duration: (\d+):(\d+):([\d.]+)")
+FFMPEG_CHANNEL_LAYOUTS = {
+    "mono": 1, "stereo": 2, "2.1": 3, "3.0": 3, "quad": 4, "4.0": 4,
+    "5.0": 5, "5.0(side)": 5, "5.1": 6, "5.1(side)": 6, "6.1": 7, "7.1": 8,
+}
+
+
+class AudioDecodeError(RuntimeError):
+    """音声デコードに失敗した場合の例外"""
+
+
+class DecodeStats:
+    """バックエンドごとのデコード性能を集計（スレッドセーフ）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict] = {}
+
+    def record(self, backend: str, audio_seconds: float, wall_seconds: float, file_bytes: int):
+        with self._lock:
+            entry = self._stats.setdefault(backend, {
+                "calls": 0,
+                "audio_seconds": 0.0,
+                "wall_seconds": 0.0,
+                "bytes": 0
+            })
+            entry["calls"] += 1
+            entry["audio_seconds"] += audio_seconds
+            entry["wall_seconds"] += wall_seconds
+            entry["bytes"] += file_bytes
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            result = {}
+            for backend, entry in self._stats.items():
+                wall = entry["wall_seconds"]
+                result[backend] = {
+                    **entry,
+                    # 実時間に対するデコード速度（大きいほど高速）
+                    "realtime_factor": round(entry["audio_seconds"] / wall, 2) if wall > 0 else None,
+                    "mb_per_second": round(entry["bytes"] / 1e6 / wall, 2) if wall > 0 else None
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+decode_stats = DecodeStats()
+
+
+def _to_mono(y: np.ndarray) -> np.ndarray:
+    """(channels, samples)形式の配列をモノラルに変換"""
+    if y.ndim == 1:
+        return y
+    return np.mean(y, axis=0)
+
+
+def _resample(y: np.ndarray, orig_sr: int, target_sr: Optional[int], quality: str) -> Tuple[np.ndarray, int]:
+    if target_sr is None or orig_sr == target_sr:
+        return y, orig_sr
+    import librosa  # type: ignore
+    res_type = RESAMPLE_RES_TYPES.get(quality, RESAMPLE_RES_TYPES["high"])
+    return librosa.resample(y, orig_sr=orig_sr, target_sr=target_sr, res_type=res_type), target_sr
+
+
+class SoundfileBackend:
+    """libsndfileによるネイティブPCM読み込み（WAV/FLAC/OGG）"""
+    name = "soundfile"
+
+    def available(self) -> bool:
+        try:
+            import soundfile  # type: ignore # noqa: F401
+            return True
+        except ImportError:
+            return False
+
+    def decode(self, path: str, sr: Optional[int], mono: bool, quality: str) -> Tuple[np.ndarray, int]:
+        import soundfile as sf  # type: ignore
+        data, native_sr = sf.read(path, dtype='float32', always_2d=True)
+        y = data.T  # (channels, samples)
+        if mono:
+            y = _to_mono(y)
+        return _resample(np.ascontiguousarray(y), native_sr, sr, quality)
+
+
+class FFmpegPipeBackend:
+    """ffmpegのパイプ出力による圧縮フォーマットのデコード（リサンプルもffmpeg側で実施）"""
+    name = "ffmpeg"
+
+    def available(self) -> bool:
+        return shutil.which('ffmpeg') is not None
+
+    def probe(self, path: str) -> Tuple[int, int]:
+        """
+        (チャンネル数, サンプルレート)を取得（ffprobe、ない場合は ffmpeg -i の出力から）
+
+        Raises:
+            AudioDecodeError: 音声ストリームの仕様を取得できない場合
+        """
+        if shutil.which('ffprobe') is not None:
+            result = subprocess.run([
+                'ffprobe', '-v', 'error', '-select_streams', 'a:0',
+                '-show_entries', 'stream=channels,sample_rate', '-of', 'csv=p=0', path
+            ], capture_output=True, text=True)
+            try:
+                sample_rate, channels = result.stdout.strip().split(',')[:2]
+                return int(channels), int(sample_rate)
+            except ValueError:
+                raise AudioDecodeError(f"ffprobeで音声ストリームの仕様を取得できません: {result.stderr.strip()[-500:]}")
+        channels, sample_rate, _ = _ffmpeg_stream_info(path)
+        if channels is None or sample_rate is None:
+            raise AudioDecodeError("ffmpegの出力から音声ストリームの仕様を取得できません")
+        return channels, sample_rate
+
+    def decode(self, path: str, sr: Optional[int], mono: bool, quality: str) -> Tuple[np.ndarray, int]:
+        if mono and sr:
+            channels, target_sr = 1, sr
+        else:
+            native_channels, native_sr = self.probe(path)
+            channels = 1 if mono else native_channels
+            target_sr = sr or native_sr
+        command = ['ffmpeg', '-nostdin', '-v', 'error', '-i', path, '-vn']
+        resample_filter = FFMPEG_RESAMPLE_FILTERS.get(quality)
+        if resample_filter:
+            command += ['-af', resample_filter]
+        command += ['-f', 'f32le', '-acodec', 'pcm_f32le', '-ac', str(channels), '-ar', str(target_sr), '-']
+
+        result = subprocess.run(command, capture_output=True)
+        if result.returncode != 0:
+            raise AudioDecodeError(f"ffmpegデコード失敗: {result.stderr.decode(errors='ignore').strip()}")
+
+        y = np.frombuffer(result.stdout, dtype=np.float32)
+        if channels > 1:
+            y = y.reshape(-1, channels).T
+        return np.ascontiguousarray(y), target_sr
+
+
+def _ffmpeg_stream_info(path: str) -> Tuple[Optional[int], Optional[int], Optional[float]]:
+    """ffmpeg -i の出力から(チャンネル数, サンプルレート, 長さ)を取得（取得できない項目はNone）"""
+    result = subprocess.run(['ffmpeg', '-hide_banner', '-nostdin', '-i', path], capture_output=True, text=True)
+    stream = FFMPEG_AUDIO_STREAM_PATTERN.search(result.stderr)
+    duration = FFMPEG_DURATION_PATTERN.search(result.stderr)
+    channels = sample_rate = None
+    if stream:
+        sample_rate = int(stream.group(1))
+        layout = stream.group(2).strip()
+        count = re.match(r"(\d+) channels", layout)
+        channels = int(count.group(1)) if count else FFMPEG_CHANNEL_LAYOUTS.get(layout)
+    seconds = (int(duration.group(1)) * 3600 + int(duration.group(2)) * 60 + float(duration.group(3))
+               if duration else None)
+    return channels, sample_rate, seconds
+
+
+class LibrosaBackend:
+    """従来のlibrosa.load（audioread/soundfile経由）"""
+    name = "librosa"
+
+    def available(self) -> bool:
+        return True
+
+    def decode(self, path: str, sr: Optional[int], mono: bool, quality: str) -> Tuple[np.ndarray, int]:
+        import librosa  # type: ignore
+        res_type = RESAMPLE_RES_TYPES.get(quality, RESAMPLE_RES_TYPES["high"])
+        return librosa.load(path, sr=sr, mono=mono, res_type=res_type)
+
+
+class MemmapBackend:
+    """デコード済みPCMを.npyにキャッシュし、メモリマップで読み込む"""
+    name = "memmap"
+
+    def available(self) -> bool:
+        return True
+
+    def cache_path(self, path: str, sr: Optional[int], mono: bool, quality: str) -> str:
+        """キャッシュディレクトリ内の.npyのパス（元ファイルの実パス・更新時刻・サイズとデコード条件ごと）"""
+        channel_tag = "mono" if mono else "multi"
+        return derived_path(path, f".{sr or 'native'}.{channel_tag}.{quality}.f32.npy")
+
+    def decode(self, path: str, sr: Optional[int], mono: bool, quality: str) -> Tuple[np.ndarray, int]:
+        cache_path = self.cache_path(path, sr, mono, quality)
+        sr_path = cache_path + ".sr"
+        # .srは.npyの後に書くため、両方あれば.npyは書き込み済み
+        if os.path.exists(cache_path) and os.path.exists(sr_path):
+            with open(sr_path) as f:
+                cached_sr = int(f.read().strip())
+            return np.load(cache_path, mmap_mode='r'), cached_sr
+
+        backend = _BACKENDS[_auto_backend_name(path)]
+        y, decoded_sr = backend.decode(path, sr, mono, quality)
+        with atomic_output(cache_path) as temp_path:
+            np.save(temp_path, np.asarray(y, dtype=np.float32))
+        with atomic_output(sr_path) as temp_path:
+            with open(temp_path, 'w') as f:
+                f.write(str(decoded_sr))
+        return np.load(cache_path, mmap_mode='r'), decoded_sr
+
+
+_BACKENDS = {
+    backend.name: backend
+    for backend in (SoundfileBackend(), FFmpegPipeBackend(), MemmapBackend(), LibrosaBackend())
+}
+
+
+def _auto_backend_name(path: str) -> str:
+    """ファイル形式から最も安価なバックエンドを選択"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in SOUNDFILE_EXTENSIONS and _BACKENDS["soundfile"].available():
+        return "soundfile"
+    if _BACKENDS["ffmpeg"].available():
+        return "ffmpeg"
+    return "librosa"
+
+
+def available_backends() -> Dict[str, bool]:
+    """各バックエンドの利用可否"""
+    return {name: backend.available() for name, backend in _BACKENDS.items()}
+
+
+def load_audio(path: str, sr: Optional[int] = 22050, mono: bool = True,
+               backend: Optional[str] = None, quality: Optional[str] = None) -> Tuple[np.ndarray, int]:
+    """
+    音声ファイルを読み込む（librosa.loadと同じ (y, sr) を返す）
+
+    Args:
+        path: 音声ファイルのパス
+        sr: 目標サンプルレート（Noneの場合はネイティブのまま）
+        mono: Trueの場合はモノラルに変換
+        backend: "auto" / "soundfile" / "ffmpeg" / "memmap" / "librosa"（Noneの場合は設定値）
+        quality: リサンプル品質 "high" / "medium" / "fast"（Noneの場合は設定値）
+    """
+    backend = backend or get_audio_backend()
+    quality = quality or get_resample_quality()
+    if quality not in RESAMPLE_RES_TYPES:
+        raise ValueError(f"不明なリサンプル品質です: {quality}")
+
+    name = _auto_backend_name(path) if backend == "auto" else backend
+    if name not in _BACKENDS:
+        raise ValueError(f"不明な音声バックエンドです: {backend}")
+    if not _BACKENDS[name].available():
+        raise AudioDecodeError(f"音声バックエンドが利用できません: {name}")
+
+    start = time.perf_counter()
+    y, decoded_sr = _BACKENDS[name].decode(path, sr, mono, quality)
+    elapsed = time.perf_counter() - start
+
+    file_bytes = os.path.getsize(path) if os.path.exists(path) else 0
+    decode_stats.record(name, y.shape[-1] / decoded_sr, elapsed, file_bytes)
+    return y, decoded_sr
+
+
+def resample(y: np.ndarray, orig_sr: int, target_sr: int, quality: Optional[str] = None) -> Tuple[np.ndarray, int]:
+    """読み込み済みの波形をリサンプル（quality: "high" / "medium" / "fast"、Noneの場合は設定値）"""
+    return _resample(y, orig_sr, target_sr, quality or get_resample_quality())
+
+
+def audio_info(path: str) -> Tuple[int, int]:
+    """デコードせずに(チャンネル数, サンプルレート)を取得"""
+    if _auto_backend_name(path) == "soundfile":
+        import soundfile as sf  # type: ignore
+        info = sf.info(path)
+        return info.channels, info.samplerate
+    return _BACKENDS["ffmpeg"].probe(path)
+
+
+def audio_duration(path: str) -> Optional[float]:
+    """デコードせずに長さ（秒）を取得（soundfile、それ以外の形式はffprobe、ない場合は ffmpeg -i。取得できない場合はNone）"""
+    if _auto_backend_name(path) == "soundfile":
+        import soundfile as sf  # type: ignore
+        try:
+            return float(sf.info(path).duration)
+        except RuntimeError:
+            return None
+    if shutil.which('ffprobe') is None:
+        return _ffmpeg_stream_info(path)[2]
+    result = subprocess.run([
+        'ffprobe', '-v', 'error', '-show_entries', 'format=duration', '-of', 'csv=p=0', path
+    ], capture_output=True, text=True)
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return None
+
+
+def get_decode_stats() -> Dict[str, Dict]:
+    """バックエンドごとのデコードスループットを取得"""
+    return decode_stats.snapshot()
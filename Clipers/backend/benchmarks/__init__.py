@@ -0,0 +1,3 @@
+"""
+Clipers分析パイプラインのベンチマーク
+"""
@@ -0,0 +1,180 @@
+"""
+ベンチマーク用の合成フィクスチャ
+
+- 合成音声（トーン / ノイズバースト / 音声風エンベロープ）
+- YouTube Data API v3 の応答を模したJSON
+- Gemini モデルの代替（決まったJSONを返す）
+"""
+import json
+import os
+import tempfile
+from typing import Dict, List
+
+import numpy as np
+
+FIXTURE_SAMPLE_RATE = 22050
+AUDIO_KINDS = ("tones", "noise_bursts", "speech")
+DEFAULT_FIXTURE_DIR = os.path.join(tempfile.gettempdir(), "clipers_bench_fixtures")
+
+
+def _tones(t: np.ndarray, rng: np.random.Generator, sr: int) -> np.ndarray:
+    """周波数が変化するトーン（20秒ごとに大音量区間）"""
+    freq = 220 + 110 * np.sin(2 * np.pi * t / 30.0)
+    phase = 2 * np.pi * np.cumsum(freq) / sr
+    loud = 1.0 + 4.0 * ((t % 20.0) > 17.0)
+    return 0.05 * loud * np.sin(phase)
+
+
+def _noise_bursts(t: np.ndarray, rng: np.random.Generator, sr: int) -> np.ndarray:
+    """静かな背景ノイズに不規則なノイズバースト"""
+    y = 0.005 * rng.standard_normal(len(t))
+    n_bursts = max(1, int(t[-1] / 15))
+    for start in rng.uniform(0, t[-1], n_bursts):
+        mask = (t >= start) & (t < start + rng.uniform(0.3, 2.0))
+        y[mask] += 0.3 * rng.standard_normal(mask.sum())
+    return y
+
+
+def _speech(t: np.ndarray, rng: np.random.Generator, sr: int) -> np.ndarray:
+    """音節レート(約4Hz)で振幅変調された倍音と、ところどころのポーズ"""
+    f0 = 140 + 40 * np.sin(2 * np.pi * t / 7.0)
+    phase = 2 * np.pi * np.cumsum(f0) / sr
+    voiced = sum(np.sin(k * phase) / k for k in range(1, 6))
+    syllables = np.clip(np.sin(2 * np.pi * 4.0 * t), 0, None)
+    pauses = ((t % 12.0) < 10.0).astype(np.float32)
+    excitement = 1.0 + 2.0 * ((t % 45.0) > 40.0)
+    return 0.08 * voiced * syllables * pauses * excitement + 0.002 * rng.standard_normal(len(t))
+
+
+_GENERATORS = {"tones": _tones, "noise_bursts": _noise_bursts, "speech": _speech}
+
+
+def synthetic_audio(kind: str, minutes: float, fixture_dir: str = DEFAULT_FIXTURE_DIR, seed: int = 0,
+                    sample_rate: int = FIXTURE_SAMPLE_RATE, channels: int = 1) -> str:
+    """
+    合成音声のWAVファイルを生成してパスを返す（生成済みなら再利用）
+
+    channels=2の場合、右チャンネルは減衰させた左チャンネルに独立ノイズを加えたもの（ステレオ幅あり）
+    """
+    import soundfile as sf  # type: ignore
+
+    os.makedirs(fixture_dir, exist_ok=True)
+    suffix = "" if (sample_rate, channels) == (FIXTURE_SAMPLE_RATE, 1) else f"_{sample_rate}hz_{channels}ch"
+    path = os.path.join(fixture_dir, f"{kind}_{minutes:g}min{suffix}.wav")
+    if os.path.exists(path):
+        return path
+
+    rng = np.random.default_rng(seed)
+    n_samples = int(minutes * 60 * sample_rate)
+    chunk = 60 * sample_rate
+    with sf.SoundFile(path, 'w', samplerate=sample_rate, channels=channels, subtype='PCM_16') as f:
+        for offset in range(0, n_samples, chunk):
+            t = np.arange(offset, min(offset + chunk, n_samples)) / sample_rate
+            y = _GENERATORS[kind](t, rng, sample_rate)
+            if channels == 2:
+                y = np.stack([y, 0.7 * y + 0.01 * rng.standard_normal(len(y))], axis=1)
+            f.write(np.clip(y, -1.0, 1.0).astype(np.float32))
+    return path
+
+
+_COMMENT_TEMPLATES = [
+    "{m}:{s:02d} のところ最高に面白い！",
+    "何度見ても感動する {m}:{s:02d}",
+    "つまらないと思ったけど{m}:{s:02d}からの展開が良い",
+    "東京の20代会社員です。毎回楽しみにしてます",
+    "大阪の大学生です！友達にシェアしました",
+    "高校生女子です。この企画好き",
+    "最悪のオチで笑った",
+    "エンジニアとして勉強になる動画でした",
+]
+
+
+def canned_comment_threads(n_comments: int, seed: int = 0) -> List[Dict]:
+    """commentThreads APIのitemsを模したコメント一覧"""
+    rng = np.random.default_rng(seed)
+    items = []
+    for i in range(n_comments):
+        template = _COMMENT_TEMPLATES[i % len(_COMMENT_TEMPLATES)]
+        text = template.format(m=int(rng.integers(0, 10)), s=int(rng.integers(0, 60)))
+        items.append({
+            "snippet": {
+                "topLevelComment": {
+                    "snippet": {
+                        "textDisplay": text,
+                        "likeCount": int(rng.integers(0, 500)),
+                        "authorDisplayName": f"user{i}",
+                        "publishedAt": "2026-01-01T00:00:00Z"
+                    }
+                }
+            }
+        })
+    return items
+
+
+def canned_video_item(duration_seconds: int = 600) -> Dict:
+    """videos APIのitemを模した動画情報"""
+    minutes, seconds = divmod(duration_seconds, 60)
+    return {
+        "snippet": {
+            "title": "なぜこの動画はバズったのか？衝撃の結末",
+            "description": "みんなでチェック！感想をコメントしてください #shorts #バズ #検証",
+            "publishedAt": "2026-01-01T00:00:00Z",
+            "channelTitle": "ベンチマークチャンネル"
+        },
+        "statistics": {"viewCount": "123456", "likeCount": "4567", "commentCount": "890"},
+        "contentDetails": {"duration": f"PT{minutes}M{seconds}S"}
+    }
+
+
+class CannedResponse:
+    """requests.Responseの代替"""
+
+    def __init__(self, payload: Dict, status_code: int = 200):
+        self._payload = payload
+        self.status_code = status_code
+        self.text = json.dumps(payload, ensure_ascii=False)
+        self.content = self.text.encode("utf-8")
+
+    def json(self) -> Dict:
+        return self._payload
+
+
+def canned_youtube_get(n_comments: int = 300, page_size: int = 100):
+    """YouTube Data APIへのrequests.getを置き換える関数を生成"""
+    comments = canned_comment_threads(n_comments)
+
+    def fake_get(url: str, params: Dict = None, **kwargs):
+        params = params or {}
+        if url.endswith("/videos"):
+            return CannedResponse({"items": [canned_video_item()]})
+        page = int(params.get("pageToken") or 0)
+        items = comments[page * page_size:(page + 1) * page_size]
+        payload = {"items": items}
+        if (page + 1) * page_size < len(comments):
+            payload["nextPageToken"] = str(page + 1)
+        return CannedResponse(payload)
+
+    return fake_get
+
+
+class FakeGeminiResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGeminiModel:
+    """GenerativeModelの代替（プロンプトを受け取り決まったJSONを返す）"""
+
+    def __init__(self):
+        self.prompts: List[str] = []
+
+    def generate_content(self, prompt: str) -> FakeGeminiResponse:
+        self.prompts.append(prompt)
+        return FakeGeminiResponse("```json\n" + json.dumps({
+            "narrative_score": 7,
+            "hook_score": 8,
+            "engagement_score": 6,
+            "tech_score": 9,
+            "golden_clip": {"time": "00:42", "reason": "コメントで最も言及された区間"},
+            "summary": "ベンチマーク用の固定応答です。"
+        }, ensure_ascii=False) + "\n```")
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+起動時のモジュール読み込み時間とRSSのベンチマーク（python -X importtime）
+
+シナリオごとに新しいPythonプロセスで main_enhanced を読み込み、
+importtimeの合計・上位モジュール・読み込まれた重い依存関係・ピークRSSを出力する。
+
+- slim: main_enhanced の読み込みのみ（エンゲージメント・ユーザー属性・Geminiのみを扱うプロセス相当）
+- dsp:  音声分析・描画・ダウンロード系の依存関係まで読み込んだ状態（分析を1回処理したワーカー相当）
+
+使い方:
+    python benchmarks/import_time.py --repeat 5 --output import_time.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Optional
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("numpy", "scipy", "librosa", "numba", "matplotlib", "soundfile", "yt_dlp", "google.generativeai")
+
+SCENARIOS = {
+    "slim": "import main_enhanced",
+    "dsp": (
+        "import main_enhanced\n"
+        "for instance in (main_enhanced.improved_analyzer, main_enhanced.comprehensive_analyzer,\n"
+        "                 main_enhanced.visualizer, main_enhanced.evaluation_framework):\n"
+        "    instance.lazy_load()\n"
+        "import librosa.feature, yt_dlp"
+    ),
+}
+
+REPORT_CODE = (
+    "\nimport json, resource, sys\n"
+    "peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n"
+    "peak = peak if sys.platform == 'darwin' else peak * 1024\n"
+    "print(json.dumps({'peak_rss_mb': round(peak / 1e6, 1),\n"
+    "                  'loaded': [m for m in %r if m in sys.modules]}))\n" % (HEAVY_MODULES,)
+)
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """-X importtime の出力を（モジュール名, 自身の時間, 累積時間, 深さ）の一覧に変換"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        head, cumulative_us, name = line.split("|")
+        self_us = int(head.split(":", 1)[1])
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        entries.append({
+            "module": name.strip(),
+            "self_ms": self_us / 1000,
+            "cumulative_ms": int(cumulative_us) / 1000,
+            "depth": depth
+        })
+    return entries
+
+
+def run_scenario(name: str, top: int = 10) -> Dict:
+    """シナリオを新しいプロセスで1回実行して計測"""
+    env = dict(os.environ, CLIPERS_LOG_LEVEL="WARNING")
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", SCENARIOS[name] + REPORT_CODE],
+        cwd=backend_dir, env=env, capture_output=True, text=True, check=True
+    )
+    wall_seconds = time.perf_counter() - started
+    report = json.loads(completed.stdout.strip().splitlines()[-1])
+    entries = parse_importtime(completed.stderr)
+    top_level = sorted((e for e in entries if e["depth"] == 0), key=lambda e: e["cumulative_ms"], reverse=True)
+    return {
+        "scenario": name,
+        "wall_seconds": round(wall_seconds, 3),
+        "import_ms": round(sum(e["self_ms"] for e in entries), 1),
+        "peak_rss_mb": report["peak_rss_mb"],
+        "heavy_modules_loaded": report["loaded"],
+        "top_imports": [{"module": e["module"], "cumulative_ms": round(e["cumulative_ms"], 1)}
+                        for e in top_level[:top]]
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="起動時のモジュール読み込み時間の計測")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="計測するシナリオ（カンマ区切り）")
+    parser.add_argument("--repeat", type=int, default=3, help="各シナリオの繰り返し回数（中央値を出力）")
+    parser.add_argument("--top", type=int, default=10, help="出力する上位モジュール数")
+    parser.add_argument("--output", default=None, help="結果JSONの出力先")
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in [s for s in args.scenarios.split(",") if s]:
+        runs = [run_scenario(name, args.top) for _ in range(args.repeat)]
+        result = runs[-1]
+        result["wall_seconds"] = round(statistics.median(r["wall_seconds"] for r in runs), 3)
+        result["import_ms"] = round(statistics.median(r["import_ms"] for r in runs), 1)
+        results.append(result)
+        print(f"{name}: import {result['import_ms']} ms / wall {result['wall_seconds']} s / "
+              f"RSS {result['peak_rss_mb']} MB / 読み込み済み: {', '.join(result['heavy_modules_loaded']) or 'なし'}")
+        for entry in result["top_imports"]:
+            print(f"    {entry['cumulative_ms']:>9.1f} ms  {entry['module']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, ensure_ascii=False, indent=2)
+        print(f"結果を保存しました: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
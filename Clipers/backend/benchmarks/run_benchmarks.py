@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+分析パイプラインのエンドツーエンド・ベンチマーク
+
+合成音声・YouTube APIの固定応答・Geminiの代替モデルを使い、
+各分析ステージの実行時間（wall / CPU）とピークメモリをJSONに出力する。
+
+使い方:
+    python benchmarks/run_benchmarks.py --durations 1,10 --output bench.json
+    python benchmarks/run_benchmarks.py --compare baseline.json --output bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+from unittest import mock
+
+# backendディレクトリをPythonパスに追加
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+from benchmarks import fixtures  # noqa: E402
+from benchmarks.import_time import SCENARIOS  # noqa: E402
+
+# ベンチマーク定義: 引数を受け取り計測ケースの一覧を返す関数
+BENCHMARKS: List[Callable] = []
+
+
+def benchmark(*case_names: str) -> Callable:
+    """
+    ベンチマークケース生成関数を登録するデコレータ
+
+    生成するケースの名前を宣言しておき、--filter に合わない生成関数は
+    合成音声の生成や事前の分析を行う前に除外する。
+    """
+    def decorator(func: Callable) -> Callable:
+        func.case_names = case_names
+        BENCHMARKS.append(func)
+        return func
+    return decorator
+
+
+class Case:
+    """1つの計測ケース"""
+
+    def __init__(self, name: str, run: Callable[[], object], params: Optional[Dict] = None,
+                 setup: Optional[Callable[[], None]] = None):
+        self.name = name
+        self.run = run
+        self.params = params or {}
+        self.setup = setup
+
+
+def measure(case: Case, repeat: int, warmup: int = 1) -> Dict:
+    """
+    ケースを繰り返し実行し、時間とピークメモリを集計（初回のJITコンパイル等はwarmupで除外）
+
+    tracemallocは割り当てごとにオーバーヘッドがあるため、時間はtracemallocを止めて計測し、
+    ピークメモリは別に1回だけ実行して計測する。
+    """
+    def run_once() -> object:
+        result = case.run()
+        if isinstance(result, dict) and 'error' in result:
+            raise RuntimeError(f"{case.name}: {result['error']}")
+        return result
+
+    for _ in range(warmup):
+        if case.setup:
+            case.setup()
+        run_once()
+
+    wall_times, cpu_times = [], []
+    for _ in range(repeat):
+        if case.setup:
+            case.setup()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        run_once()
+        cpu_times.append(time.process_time() - cpu_start)
+        wall_times.append(time.perf_counter() - wall_start)
+
+    if case.setup:
+        case.setup()
+    tracemalloc.start()
+    try:
+        run_once()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "name": case.name,
+        "params": case.params,
+        "repeat": repeat,
+        "wall_seconds": {
+            "min": round(min(wall_times), 4),
+            "median": round(statistics.median(wall_times), 4),
+            "mean": round(statistics.mean(wall_times), 4)
+        },
+        "cpu_seconds": round(statistics.median(cpu_times), 4),
+        "peak_memory_mb": round(peak / 1e6, 2)
+    }
+
+
+@benchmark("ImprovedAudioAnalyzer.analyze_audio_accurate")
+def audio_analysis_cases(args) -> List[Case]:
+    from improved_audio_analyzer import ImprovedAudioAnalyzer
+    analyzer = ImprovedAudioAnalyzer()
+    cases = []
+    for kind in args.kinds:
+        for minutes in args.durations:
+            path = fixtures.synthetic_audio(kind, minutes, args.fixture_dir)
+            cases.append(Case(
+                "ImprovedAudioAnalyzer.analyze_audio_accurate",
+                lambda path=path: analyzer.analyze_audio_accurate(path),
+                {"fixture": kind, "minutes": minutes}
+            ))
+    return cases
+
+
+@benchmark("ImprovedAudioAnalyzer.analyze_audio_accurate[profile]")
+def analysis_profile_cases(args) -> List[Case]:
+    """同じ44.1kHzステレオ音源を各分析プロファイルで分析（精度と速度のトレードオフ比較）"""
+    from improved_audio_analyzer import ImprovedAudioAnalyzer
+    analyzer = ImprovedAudioAnalyzer()
+    cases = []
+    for minutes in args.durations:
+        path = fixtures.synthetic_audio("tones", minutes, args.fixture_dir, sample_rate=44100, channels=2)
+        for profile in args.profiles:
+            cases.append(Case(
+                "ImprovedAudioAnalyzer.analyze_audio_accurate[profile]",
+                lambda path=path, profile=profile: analyzer.analyze_audio_accurate(path, profile=profile),
+                {"profile": profile, "fixture": "tones_44100hz_2ch", "minutes": minutes}
+            ))
+    return cases
+
+
+@benchmark("ImprovedAudioAnalyzer.analyze_audio_accurate[parallel]")
+def chunked_dsp_cases(args) -> List[Case]:
+    """同じ音声を逐次処理とチャンク並列（プロセスプール）で分析"""
+    from improved_audio_analyzer import ImprovedAudioAnalyzer
+    workers = args.dsp_workers or os.cpu_count() or 1
+    modes = {
+        "serial": ImprovedAudioAnalyzer(dsp_workers=1),
+        "chunked": ImprovedAudioAnalyzer(dsp_workers=workers, parallel_min_seconds=0),
+    }
+    cases = []
+    for minutes in args.durations:
+        path = fixtures.synthetic_audio("speech", minutes, args.fixture_dir)
+        for mode, analyzer in modes.items():
+            cases.append(Case(
+                "ImprovedAudioAnalyzer.analyze_audio_accurate[parallel]",
+                lambda path=path, analyzer=analyzer: analyzer.analyze_audio_accurate(path),
+                {"mode": mode, "workers": 1 if mode == "serial" else workers, "fixture": "speech", "minutes": minutes}
+            ))
+    return cases
+
+
+@benchmark("VideoEvaluationFramework.evaluate_video_comprehensive",
+           "VideoEvaluationFramework.evaluate_video_comprehensive[rescore]")
+def evaluation_framework_cases(args) -> List[Case]:
+    from video_evaluation_framework import VideoEvaluationFramework
+    from pillar_cache import pillar_cache
+    framework = VideoEvaluationFramework()
+    metadata = {
+        "title": fixtures.canned_video_item()["snippet"]["title"],
+        "description": fixtures.canned_video_item()["snippet"]["description"],
+        "duration": 600,
+        "resolution": "1080x1920",
+        "aspect_ratio": "9:16",
+        "bitrate": 8000,
+        "framerate": 30
+    }
+    engagement = {"engagement_analysis": {"engagement_rate": 4.4}}
+    cases = []
+    for minutes in args.durations:
+        path = fixtures.synthetic_audio("speech", minutes, args.fixture_dir)
+        evaluate = (lambda path=path: framework.evaluate_video_comprehensive(
+            "https://www.youtube.com/watch?v=benchmark", path, metadata, engagement))
+        # 初回評価（柱キャッシュを毎回クリア）
+        cases.append(Case(
+            "VideoEvaluationFramework.evaluate_video_comprehensive",
+            evaluate,
+            {"fixture": "speech", "minutes": minutes},
+            setup=pillar_cache.clear
+        ))
+        # 再スコアリング（音声・メタデータは同じでエンゲージメントのみ変化）
+        cases.append(Case(
+            "VideoEvaluationFramework.evaluate_video_comprehensive[rescore]",
+            lambda path=path: framework.evaluate_video_comprehensive(
+                "https://www.youtube.com/watch?v=benchmark", path, metadata,
+                {"engagement_analysis": {"engagement_rate": time.time()}}),
+            {"fixture": "speech", "minutes": minutes},
+            setup=lambda: (pillar_cache.clear(), evaluate())
+        ))
+    return cases
+
+
+@benchmark("AudioVisualizer.create_excitement_timeline", "AudioVisualizer.create_summary_chart",
+           "AudioVisualizer.build_chart_data")
+def visualization_cases(args) -> List[Case]:
+    from improved_audio_analyzer import ImprovedAudioAnalyzer
+    from visualization import AudioVisualizer
+    from chart_renderer import chart_cache
+    visualizer = AudioVisualizer()
+    cases = []
+    for minutes in args.durations:
+        path = fixtures.synthetic_audio("speech", minutes, args.fixture_dir)
+        analysis = ImprovedAudioAnalyzer().analyze_audio_accurate(path)
+        points = analysis.get("excitement_points", [])
+
+        def clear_cache():
+            # 毎回描画させるためにキャッシュを空にする
+            chart_cache._entries.clear()
+
+        params = {"fixture": "speech", "minutes": minutes}
+        cases.append(Case("AudioVisualizer.create_excitement_timeline",
+                          lambda path=path, points=points: visualizer.create_excitement_timeline(path, points),
+                          params, setup=clear_cache))
+        cases.append(Case("AudioVisualizer.create_summary_chart",
+                          lambda analysis=analysis: visualizer.create_summary_chart(analysis),
+                          params, setup=clear_cache))
+        cases.append(Case("AudioVisualizer.build_chart_data",
+                          lambda path=path, analysis=analysis: visualizer.build_chart_data(path, analysis),
+                          params))
+    return cases
+
+
+@benchmark("YouTubeEngagementAnalyzer.comment_analytics", "YouTubeEngagementAnalyzer.get_video_engagement_data")
+def engagement_cases(args) -> List[Case]:
+    import youtube_engagement
+    from youtube_engagement import YouTubeEngagementAnalyzer
+    analyzer = YouTubeEngagementAnalyzer()
+    analyzer.youtube_api_key = "benchmark-api-key-000000000"
+    comments = fixtures.canned_comment_threads(args.comments)
+    params = {"comments": args.comments}
+
+    def comment_analytics():
+        analyzer._analyze_comments_detailed(comments)
+        analyzer._find_hot_timestamps(comments)
+        analyzer._analyze_comment_sentiment(comments)
+        analyzer._extract_popular_keywords(comments)
+
+    def engagement_data():
+        with mock.patch.object(youtube_engagement.requests, "get",
+                               fixtures.canned_youtube_get(args.comments)):
+            return analyzer.get_video_engagement_data("benchmark")
+
+    return [
+        Case("YouTubeEngagementAnalyzer.comment_analytics", comment_analytics, params),
+        Case("YouTubeEngagementAnalyzer.get_video_engagement_data", engagement_data, params),
+    ]
+
+
+@benchmark("UserAttributeAnalyzer.analyze")
+def user_attribute_cases(args) -> List[Case]:
+    from user_attribute_analyzer import UserAttributeAnalyzer
+    analyzer = UserAttributeAnalyzer()
+    texts = [c["snippet"]["topLevelComment"]["snippet"]["textDisplay"]
+             for c in fixtures.canned_comment_threads(args.comments)]
+    return [Case("UserAttributeAnalyzer.analyze", lambda: analyzer.analyze(texts), {"comments": args.comments})]
+
+
+@benchmark("GeminiAnalyzer.analyze_content_with_gemini")
+def gemini_cases(args) -> List[Case]:
+    from gemini_analyzer import GeminiAnalyzer
+    # 実APIに接続しないよう__init__を通さずに代替モデルを設定
+    analyzer = GeminiAnalyzer.__new__(GeminiAnalyzer)
+    analyzer.api_key = "benchmark-key"
+    analyzer.model = fixtures.FakeGeminiModel()
+    transcript = "これはベンチマーク用の字幕です。" * 500
+    texts = [c["snippet"]["topLevelComment"]["snippet"]["textDisplay"]
+             for c in fixtures.canned_comment_threads(50)]
+    return [Case("GeminiAnalyzer.analyze_content_with_gemini",
+                 lambda: analyzer.analyze_content_with_gemini(transcript, texts), {"model": "fake"})]
+
+
+@benchmark(*(f"startup.import[{name}]" for name in SCENARIOS))
+def startup_cases(args) -> List[Case]:
+    # 新しいプロセスでmain_enhancedを読み込む時間（詳細な内訳は benchmarks/import_time.py）
+    from benchmarks.import_time import run_scenario
+    return [Case(f"startup.import[{name}]", lambda name=name: run_scenario(name), {"scenario": name})
+            for name in SCENARIOS]
+
+
+def compare_results(current: Dict, baseline: Dict, threshold: float) -> List[Dict]:
+    """ベースラインと比較し、median wall時間がthreshold以上悪化したケースを返す"""
+    def key(result: Dict) -> str:
+        return result["name"] + json.dumps(result["params"], sort_keys=True)
+
+    baseline_by_key = {key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in current["results"]:
+        base = baseline_by_key.get(key(result))
+        if not base:
+            continue
+        before = base["wall_seconds"]["median"]
+        after = result["wall_seconds"]["median"]
+        if before > 0 and (after - before) / before > threshold:
+            regressions.append({
+                "name": result["name"],
+                "params": result["params"],
+                "baseline_seconds": before,
+                "current_seconds": after,
+                "change": round((after - before) / before, 3)
+            })
+    return regressions
+
+
+def parse_args(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Clipers分析パイプラインのベンチマーク")
+    parser.add_argument("--durations", default="1,10,60",
+                        help="合成音声の長さ（分、カンマ区切り）")
+    parser.add_argument("--kinds", default=",".join(fixtures.AUDIO_KINDS),
+                        help="音声分析で使う合成音声の種類（カンマ区切り）")
+    parser.add_argument("--profiles", default=None,
+                        help="比較する分析プロファイル（カンマ区切り、既定は全プロファイル）")
+    parser.add_argument("--dsp-workers", type=int, default=None,
+                        help="チャンク並列DSPのプロセス数（既定はCPU数）")
+    parser.add_argument("--comments", type=int, default=300, help="合成コメント数")
+    parser.add_argument("--repeat", type=int, default=3, help="各ケースの繰り返し回数")
+    parser.add_argument("--warmup", type=int, default=1, help="計測前に捨てる実行回数")
+    parser.add_argument("--filter", default=None, help="名前にこの文字列を含むケースのみ実行")
+    parser.add_argument("--fixture-dir", default=fixtures.DEFAULT_FIXTURE_DIR)
+    parser.add_argument("--output", default="benchmark_results.json", help="結果JSONの出力先")
+    parser.add_argument("--compare", default=None, help="比較対象のベースライン結果JSON")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="回帰とみなす悪化率（0.2 = 20%%）")
+    args = parser.parse_args(argv)
+    args.durations = [float(d) for d in args.durations.split(",") if d]
+    args.kinds = [k for k in args.kinds.split(",") if k]
+    if args.profiles:
+        args.profiles = [p for p in args.profiles.split(",") if p]
+    else:
+        from analysis_profiles import PROFILES
+        args.profiles = list(PROFILES)
+    return args
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+
+    import numpy as np
+    results = []
+    for factory in BENCHMARKS:
+        if args.filter and not any(args.filter in name for name in factory.case_names):
+            continue
+        for case in factory(args):
+            if args.filter and args.filter not in case.name:
+                continue
+            print(f"実行中: {case.name} {case.params}")
+            result = measure(case, args.repeat, args.warmup)
+            print(f"  median {result['wall_seconds']['median']}s / peak {result['peak_memory_mb']} MB")
+            results.append(result)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": np.__version__,
+            "cpu_count": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("compare", "output")}
+        },
+        "results": results
+    }
+
+    exit_code = 0
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["regressions"] = compare_results(report, baseline, args.threshold)
+        for regression in report["regressions"]:
+            print(f"⚠️  回帰: {regression['name']} {regression['params']} "
+                  f"{regression['baseline_seconds']}s -> {regression['current_seconds']}s")
+        exit_code = 1 if report["regressions"] else 0
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"結果を保存しました: {args.output}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
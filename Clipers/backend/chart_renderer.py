@@ -0,0 +1,177 @@
+"""
+ヘッドレスなチャート描画とPNGキャッシュ
+
+pyplotのグローバル状態を使わず、matplotlibのオブジェクト指向API（Figure + Agg）で描画するため
+ワーカースレッドから安全に呼び出せる。描画結果は分析内容のハッシュをキーにキャッシュし、
+GET /charts/{id}.png からETag付きで配信する。
+"""
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg  # type: ignore
+from matplotlib.figure import Figure  # type: ignore
+
+from tracing import span
+
+CHART_DPI = 100
+TIMELINE_FIGSIZE = (12, 8)
+SUMMARY_FIGSIZE = (12, 10)
+
+
+def _downsample(times: np.ndarray, values: np.ndarray, max_points: int) -> Tuple[np.ndarray, np.ndarray]:
+    """点数が多すぎる場合はブロックごとの最大値で間引く（ピークは保持）"""
+    n = len(values)
+    if n <= max_points:
+        return times, values
+    block = int(np.ceil(n / max_points))
+    n_blocks = n // block
+    trimmed = values[:n_blocks * block].reshape(n_blocks, block)
+    return times[:n_blocks * block:block], trimmed.max(axis=1)
+
+
+def render_timeline_png(times: np.ndarray, db: np.ndarray, excitement_points: List[Dict],
+                        dpi: int = CHART_DPI) -> bytes:
+    """盛り上がりポイントのタイムラインをPNGとして描画"""
+    width_px = int(TIMELINE_FIGSIZE[0] * dpi)
+    times, db = _downsample(np.asarray(times), np.asarray(db), width_px)
+
+    fig = Figure(figsize=TIMELINE_FIGSIZE, dpi=dpi)
+    FigureCanvasAgg(fig)
+    ax1, ax2 = fig.subplots(2, 1)
+
+    # 音量の時間変化
+    ax1.plot(times, db, alpha=0.7, color='blue', linewidth=0.8)
+    ax1.set_ylabel('音量 (dB)')
+    ax1.set_title('音声の音量変化と盛り上がりポイント')
+    ax1.grid(True, alpha=0.3)
+
+    # 盛り上がりポイントをマーク
+    y_top = ax1.get_ylim()[1]
+    for point in excitement_points:
+        color = 'red' if point.get('type', 'volume') == 'volume' else 'orange'
+        ax1.axvline(x=point['time'], color=color, alpha=0.8, linestyle='--', linewidth=2)
+        ax1.text(point['time'], y_top * 0.9, f"{point['time']}s\n({point['intensity']:.2f})",
+                 rotation=90, fontsize=8, ha='right', va='top')
+
+    # 盛り上がりポイントの強度グラフ
+    if excitement_points:
+        ax2.scatter([p['time'] for p in excitement_points],
+                    [p['intensity'] for p in excitement_points],
+                    c=['red' if p.get('type') == 'volume' else 'orange' for p in excitement_points],
+                    s=100, alpha=0.7)
+        ax2.set_xlabel('時間 (秒)')
+        ax2.set_ylabel('盛り上がり強度')
+        ax2.set_title('盛り上がりポイントの強度')
+        ax2.grid(True, alpha=0.3)
+        ax2.set_ylim(0, 1.1)
+
+    fig.tight_layout()
+    return _to_png(fig)
+
+
+def render_summary_png(summary: Dict, dpi: int = CHART_DPI) -> bytes:
+    """分析結果のサマリーチャートをPNGとして描画"""
+    fig = Figure(figsize=SUMMARY_FIGSIZE, dpi=dpi)
+    FigureCanvasAgg(fig)
+    (ax1, ax2), (ax3, ax4) = fig.subplots(2, 2)
+
+    # 盛り上がりスコア
+    ax1.bar(['盛り上がりスコア'], [summary['excitement_score']], color='red', alpha=0.7)
+    ax1.set_ylim(0, 100)
+    ax1.set_title('全体的な盛り上がりスコア')
+    ax1.set_ylabel('スコア (0-100)')
+
+    # 音量分析
+    ax2.bar(summary['volume_metrics']['labels'], summary['volume_metrics']['values'], color='blue', alpha=0.7)
+    ax2.set_title('音量分析')
+    ax2.set_ylabel('値')
+
+    # 盛り上がりポイントの分布
+    points = summary['excitement_points']
+    if points['time']:
+        ax3.scatter(points['time'], points['intensity'], alpha=0.7, s=50)
+        ax3.set_xlabel('時間 (秒)')
+        ax3.set_ylabel('強度')
+        ax3.set_title('盛り上がりポイントの分布')
+        ax3.grid(True, alpha=0.3)
+
+    # ポイントタイプの分布
+    point_types = summary['point_types']
+    if point_types:
+        ax4.pie(list(point_types.values()), labels=list(point_types.keys()), autopct='%1.1f%%')
+        ax4.set_title('盛り上がりポイントのタイプ分布')
+
+    fig.tight_layout()
+    return _to_png(fig)
+
+
+def _to_png(fig: Figure) -> bytes:
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+
+def analysis_hash(kind: str, payload: Dict) -> str:
+    """チャート種別と描画入力からキャッシュキー（ハッシュ）を生成"""
+    encoded = json.dumps({"kind": kind, "payload": payload}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class ChartCache:
+    """
+    チャートの描画仕様とPNGのLRUキャッシュ
+
+    分析時には描画仕様だけを登録し、PNGは最初の取得時に描画してキャッシュする。
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+
+    def register(self, kind: str, payload: Dict, renderer) -> str:
+        """描画仕様を登録してチャートIDを返す（同じ内容なら同じID）"""
+        digest = analysis_hash(kind, payload)
+        chart_id = f"{kind}-{digest[:16]}"
+        with self._lock:
+            if chart_id in self._entries:
+                self._entries.move_to_end(chart_id)
+            else:
+                self._entries[chart_id] = {
+                    "etag": f'"{digest}"',
+                    "renderer": renderer,
+                    "png": None,
+                    "lock": threading.Lock()
+                }
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return chart_id
+
+    def get(self, chart_id: str) -> Optional[Tuple[bytes, str]]:
+        """(PNG, ETag)を取得（未描画ならこの呼び出しで描画）"""
+        with self._lock:
+            entry = self._entries.get(chart_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(chart_id)
+
+        # 同じチャートの同時描画を防ぐ
+        with entry["lock"]:
+            if entry["png"] is None:
+                with span("chart.render"):
+                    entry["png"] = entry["renderer"]()
+                entry["renderer"] = None
+        return entry["png"], entry["etag"]
+
+    def etag(self, chart_id: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(chart_id)
+            return entry["etag"] if entry else None
+
+
+chart_cache = ChartCache()
@@ -0,0 +1,230 @@
+"""
+長い音声のチャンク並列DSP
+
+1本の長い音声（2時間の配信など）のフレーム特徴量（RMS・音調・スペクトル）を、
+波形を共有メモリに置いたプロセスプールでチャンクごとに並列計算し、フレーム配列を連結して返す。
+
+- チャンクの境界はフレーム単位で切り、各チャンクにはフレーム長の半分の前後の余白を付けて切り出す
+  （範囲外はゼロ埋め）。librosaの center=True（両端をゼロ埋め）と同じフレーム位置になるため、
+  連結した配列は1プロセスで計算した結果と一致する
+- 平均・標準偏差による閾値などの全体統計は、呼び出し側で連結後の配列に対して計算する
+- 音調・スペクトル（STFT）は指定したフレーム範囲（有音区間など）だけを計算できる
+"""
+import atexit
+import math
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import librosa
+import numpy as np
+
+FrameRange = Tuple[int, int]
+
+
+@dataclass(frozen=True)
+class FramePlan:
+    """フレーム特徴量の計算パラメータ（ワーカープロセスに渡す）"""
+    sr: int
+    frame_length: int   # RMS（dB）のフレーム長
+    hop_length: int     # RMS（dB）のホップ長
+    n_fft: int          # STFT（音調・スペクトル）のFFT長
+    stft_hop: int       # STFTのホップ長
+    spectral: bool      # スペクトル特徴量も計算するか
+    high_band_hz: float
+
+
+def frame_count(n_samples: int, frame_length: int, hop_length: int) -> int:
+    """center=True（両端をframe_length//2ゼロ埋め）のlibrosaと同じフレーム数"""
+    padded = n_samples + 2 * (frame_length // 2)
+    return 1 + max(0, padded - frame_length) // hop_length
+
+
+def frame_segment(y: np.ndarray, start_frame: int, end_frame: int,
+                  frame_length: int, hop_length: int) -> np.ndarray:
+    """フレーム[start_frame, end_frame)の計算に必要な区間を切り出す（範囲外はゼロ埋め）"""
+    begin = start_frame * hop_length - frame_length // 2
+    end = (end_frame - 1) * hop_length - frame_length // 2 + frame_length
+    segment = np.zeros(end - begin, dtype=y.dtype)
+    src_begin, src_end = max(begin, 0), min(end, len(y))
+    if src_end > src_begin:
+        segment[src_begin - begin:src_end - begin] = y[src_begin:src_end]
+    return segment
+
+
+def spectral_frame_features(spectrum: np.ndarray, sr: int, n_fft: int, high_band_hz: float) -> Dict[str, np.ndarray]:
+    """振幅スペクトルからフレームごとのスペクトル重心・ロールオフ・全帯域/高域エネルギーを計算"""
+    power = spectrum ** 2
+    freqs = librosa.fft_frequencies(sr=sr, n_fft=n_fft)
+    return {
+        "spectral_centroid": librosa.feature.spectral_centroid(S=spectrum, sr=sr)[0],
+        "spectral_rolloff": librosa.feature.spectral_rolloff(S=spectrum, sr=sr)[0],
+        "energy": np.sum(power, axis=0),
+        "high_band_energy": np.sum(power[freqs >= high_band_hz], axis=0)
+    }
+
+
+def rms_frames(y: np.ndarray, plan: FramePlan, frame_range: FrameRange) -> np.ndarray:
+    """RMSフレーム[start, end)を計算"""
+    segment = frame_segment(y, *frame_range, plan.frame_length, plan.hop_length)
+    return librosa.feature.rms(y=segment, frame_length=plan.frame_length,
+                               hop_length=plan.hop_length, center=False)[0]
+
+
+def stft_frame_features(y: np.ndarray, plan: FramePlan, frame_range: FrameRange) -> Dict[str, np.ndarray]:
+    """STFTフレーム[start, end)の音調（pitch_mean）と、spectral=Trueの場合はスペクトル特徴量を計算"""
+    segment = frame_segment(y, *frame_range, plan.n_fft, plan.stft_hop)
+    spectrum = np.abs(librosa.stft(segment, n_fft=plan.n_fft, hop_length=plan.stft_hop, center=False))
+    pitches, _ = librosa.piptrack(S=spectrum, sr=plan.sr)
+
+    features = {"pitch_mean": np.mean(pitches, axis=0)}
+    if plan.spectral:
+        features.update(spectral_frame_features(spectrum, plan.sr, plan.n_fft, plan.high_band_hz))
+    return features
+
+
+_RANGE_FUNCTIONS = {"rms": rms_frames, "stft": stft_frame_features}
+
+
+def split_ranges(ranges: List[FrameRange], max_frames: int) -> List[FrameRange]:
+    """フレーム範囲をmax_frames以下の範囲に分割"""
+    max_frames = max(1, max_frames)
+    return [(start, min(start + max_frames, end))
+            for range_start, end in ranges
+            for start in range(range_start, end, max_frames)]
+
+
+def _range_worker(shm_name: str, n_samples: int, dtype: str, plan: FramePlan,
+                  kind: str, frame_range: FrameRange):
+    """ワーカープロセス: 共有メモリ上の波形からフレーム範囲の特徴量を計算"""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        y = np.ndarray((n_samples,), dtype=np.dtype(dtype), buffer=shm.buf)
+        result = _RANGE_FUNCTIONS[kind](y, plan, frame_range)
+        del y
+        return result
+    finally:
+        shm.close()
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers: int) -> ProcessPoolExecutor:
+    """ワーカー数ごとのプロセスプール（初回使用時に作成し、プロセス終了まで使い回す）"""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False, cancel_futures=True)
+            # スレッドを持つサーバープロセスからのforkを避け、librosaを読み込み済みのforkserverから起動する
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                context = multiprocessing.get_context("forkserver")
+                context.set_forkserver_preload([__name__])
+            else:
+                context = multiprocessing.get_context("spawn")
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            _executor_workers = workers
+        return _executor
+
+
+def reset_executor():
+    """プロセスプールを破棄（ワーカーの異常終了後などに次回作り直す）"""
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+        _executor_workers = 0
+
+
+atexit.register(reset_executor)
+
+
+class FrameFeatureRunner:
+    """
+    フレーム範囲ごとの特徴量計算
+
+    workers > 1 の場合は波形を共有メモリに置き、チャンクをプロセスプールで並列計算する。
+    workers = 1 の場合も同じチャンク分割で同じプロセス内で計算する（全体のSTFTを一度に保持しない）。
+    どちらも結果はフレーム順に連結され、逐次処理と一致する。
+    """
+
+    def __init__(self, y: np.ndarray, plan: FramePlan, workers: int = 1, chunk_seconds: float = 120.0):
+        self.y = np.ascontiguousarray(y)
+        self.plan = plan
+        self.workers = max(1, workers)
+        self.chunk_seconds = chunk_seconds
+        self.n_rms = frame_count(len(self.y), plan.frame_length, plan.hop_length)
+        self.n_stft = frame_count(len(self.y), plan.n_fft, plan.stft_hop)
+        self.chunks = 0
+        self._shm: Optional[shared_memory.SharedMemory] = None
+
+    def __enter__(self) -> "FrameFeatureRunner":
+        if self.workers > 1:
+            self._shm = shared_memory.SharedMemory(create=True, size=max(1, self.y.nbytes))
+            shared = np.ndarray(self.y.shape, dtype=self.y.dtype, buffer=self._shm.buf)
+            shared[:] = self.y
+            del shared
+        return self
+
+    def __exit__(self, *exc_info):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+    def _chunk_frames(self, hop_length: int) -> int:
+        return int(math.ceil(self.chunk_seconds * self.plan.sr / hop_length))
+
+    def _map(self, kind: str, ranges: List[FrameRange]) -> list:
+        self.chunks += len(ranges)
+        if self._shm is None:
+            return [_RANGE_FUNCTIONS[kind](self.y, self.plan, frame_range) for frame_range in ranges]
+        executor = _get_executor(self.workers)
+        futures = [
+            executor.submit(_range_worker, self._shm.name, len(self.y), self.y.dtype.str, self.plan, kind, frame_range)
+            for frame_range in ranges
+        ]
+        try:
+            return [future.result() for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    def rms(self) -> np.ndarray:
+        """全体のRMSフレーム（librosa.feature.rms(center=True)と同じ）"""
+        ranges = split_ranges([(0, self.n_rms)], self._chunk_frames(self.plan.hop_length))
+        return np.concatenate(self._map("rms", ranges))
+
+    def stft_features(self, ranges: List[FrameRange]) -> Dict[str, np.ndarray]:
+        """
+        指定したSTFTフレーム範囲のみ特徴量を計算し、全フレーム長の配列（範囲外は0）で返す
+
+        "computed" には計算したフレームのマスクを入れる。
+        """
+        ranges = split_ranges(ranges, self._chunk_frames(self.plan.stft_hop))
+        keys = ["pitch_mean"] + (["spectral_centroid", "spectral_rolloff", "energy", "high_band_energy"]
+                                 if self.plan.spectral else [])
+        features = {key: np.zeros(self.n_stft, dtype=np.float32) for key in keys}
+        computed = np.zeros(self.n_stft, dtype=bool)
+        for (start, end), part in zip(ranges, self._map("stft", ranges)):
+            for key in keys:
+                features[key][start:end] = part[key]
+            computed[start:end] = True
+        features["computed"] = computed
+        return features
+
+    def execution_info(self) -> Dict:
+        return {
+            "mode": "chunked" if self.workers > 1 else "serial",
+            "workers": self.workers,
+            "chunks": self.chunks,
+            "chunk_seconds": self.chunk_seconds
+        }
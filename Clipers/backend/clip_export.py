@@ -0,0 +1,171 @@
+"""
+クリップの書き出し（ffmpegによる並列カット）
+
+取得済みの音声（FFmpegExtractAudioで抽出したWAV）から複数の区間を同時に切り出し、
+管理された出力ディレクトリ（CLIPERS_CLIP_DIR/<export_id>/）に保存する。
+
+- 入力側の -ss と -t でPCM（pcm_s16le）のWAVとして書き出すため、区間はサンプル単位で正確で、
+  区間外のデコードも不要（1本あたり数十ms〜）
+- 区間ごとのffmpegはスレッドプールで並列に実行する（ffmpegは別プロセスのためGILの影響を受けない）
+- 保持期間（CLIPERS_CLIP_RETENTION_HOURS）を過ぎた書き出しは次回の書き出し時に削除する
+"""
+import os
+import re
+import shutil
+import subprocess
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from config import get_clip_dir, get_clip_export_workers, get_clip_retention_hours
+from metrics import registry
+from tracing import span
+from logging_setup import get_logger
+
+# 1回の書き出しで指定できる区間の最大数
+MAX_SEGMENTS = 50
+
+EXPORT_ID_PATTERN = re.compile(r"^[0-9a-f]{12}$")
+CLIP_NAME_PATTERN = re.compile(r"^[\w.\-]+$")
+
+# 区間の終了位置がメディアの長さをこの秒数以内で超える場合は、取得し直さずに長さに丸める
+COVERAGE_TOLERANCE_SECONDS = 0.5
+
+CLIPS_EXPORTED = registry.counter(
+    "clipers_clips_exported_total", "Clips cut by the clip export API", ["status"])
+
+logger = get_logger("clips")
+
+
+@dataclass
+class ClipSegment:
+    """切り出す区間（秒）"""
+    start: float
+    end: float
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+def media_duration(path: str) -> Optional[float]:
+    """メディアの長さ（秒、音声デコードと同じsoundfile/ffprobeによる取得。取得できない場合はNone）"""
+    from audio_io import audio_duration
+    return audio_duration(path)
+
+
+def covers_segments(media_duration: Optional[float], segments: List[ClipSegment]) -> bool:
+    """メディアがすべての区間を含むか（部分ダウンロードの音声を再利用してよいかの判定）"""
+    if media_duration is None:
+        return False
+    return max(segment.end for segment in segments) <= media_duration + COVERAGE_TOLERANCE_SECONDS
+
+
+def validate_segments(segments: List[ClipSegment], media_duration: Optional[float] = None) -> List[ClipSegment]:
+    """
+    区間を検証し、メディアの長さが分かる場合は終了位置を長さに丸める
+
+    Raises:
+        ValueError: 区間が空・多すぎる・開始が終了以降・メディアの範囲外の場合
+    """
+    if not segments:
+        raise ValueError("segmentsを1つ以上指定してください")
+    if len(segments) > MAX_SEGMENTS:
+        raise ValueError(f"segmentsは最大{MAX_SEGMENTS}個までです")
+    validated = []
+    for index, segment in enumerate(segments):
+        end = segment.end
+        if media_duration is not None:
+            if segment.start >= media_duration:
+                raise ValueError(f"segments[{index}]の開始位置がメディアの長さ（{media_duration:.2f}秒）を超えています")
+            end = min(end, media_duration)
+        if segment.start < 0 or end <= segment.start:
+            raise ValueError(f"segments[{index}]は 0 <= start < end で指定してください")
+        validated.append(ClipSegment(start=segment.start, end=end))
+    return validated
+
+
+def build_cut_command(source_path: str, output_path: str, segment: ClipSegment) -> List[str]:
+    """1区間をPCMのWAVとして切り出すffmpegコマンド（入力側シークのため区間外のデコードは不要）"""
+    return ["ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
+            "-ss", f"{segment.start:.6f}", "-i", source_path, "-t", f"{segment.duration:.6f}",
+            "-map", "0:a:0", "-c:a", "pcm_s16le", output_path]
+
+
+def prune_exports(clip_dir: str, retention_hours: float, now: Optional[float] = None):
+    """保持期間を過ぎた書き出しディレクトリを削除"""
+    if not os.path.isdir(clip_dir):
+        return
+    cutoff = (now or time.time()) - retention_hours * 3600
+    for name in os.listdir(clip_dir):
+        path = os.path.join(clip_dir, name)
+        if EXPORT_ID_PATTERN.match(name) and os.path.isdir(path) and os.path.getmtime(path) < cutoff:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def clip_path(export_id: str, filename: str, clip_dir: Optional[str] = None) -> Optional[str]:
+    """書き出し済みクリップのパス（IDやファイル名が不正、または存在しない場合はNone）"""
+    if not EXPORT_ID_PATTERN.match(export_id) or not CLIP_NAME_PATTERN.match(filename):
+        return None
+    path = os.path.join(clip_dir or get_clip_dir(), export_id, filename)
+    return path if os.path.isfile(path) else None
+
+
+def _cut(source_path: str, output_path: str, segment: ClipSegment) -> Dict:
+    started = time.perf_counter()
+    result = subprocess.run(build_cut_command(source_path, output_path, segment), capture_output=True, text=True)
+    ok = result.returncode == 0 and os.path.exists(output_path) and os.path.getsize(output_path) > 0
+    CLIPS_EXPORTED.inc(status="ok" if ok else "error")
+    return {
+        "ok": ok,
+        "seconds": round(time.perf_counter() - started, 3),
+        "error": None if ok else (result.stderr.strip()[-500:] or f"ffmpeg exited with {result.returncode}")
+    }
+
+
+def export_clips(source_path: str, segments: List[ClipSegment], name_prefix: str = "clip", clip_dir: Optional[str] = None,
+                 workers: Optional[int] = None) -> Dict:
+    """
+    区間ごとのクリップを並列に切り出す
+
+    Returns:
+        {"export_id", "clips": [{"index", "start", "end", "filename", "bytes", "seconds"}|{..., "error"}], "seconds"}
+    """
+    clip_dir = clip_dir or get_clip_dir()
+    prune_exports(clip_dir, get_clip_retention_hours())
+    export_id = uuid.uuid4().hex[:12]
+    export_dir = os.path.join(clip_dir, export_id)
+    os.makedirs(export_dir, exist_ok=True)
+
+    prefix = re.sub(r"[^\w\-]", "_", name_prefix)
+    filenames = [f"{prefix}_{index + 1:02d}_{segment.start:.1f}-{segment.end:.1f}.wav"
+                 for index, segment in enumerate(segments)]
+
+    started = time.perf_counter()
+    with span("clips.export"):
+        with ThreadPoolExecutor(max_workers=max(1, min(workers or get_clip_export_workers(), len(segments)))) as pool:
+            outcomes = list(pool.map(
+                lambda args: _cut(source_path, os.path.join(export_dir, args[0]), args[1]),
+                zip(filenames, segments)))
+
+    clips = []
+    for index, (filename, segment, outcome) in enumerate(zip(filenames, segments, outcomes)):
+        clip = {"index": index, "start": segment.start, "end": segment.end, "seconds": outcome["seconds"]}
+        if outcome["ok"]:
+            clip["filename"] = filename
+            clip["bytes"] = os.path.getsize(os.path.join(export_dir, filename))
+        else:
+            clip["error"] = outcome["error"]
+        clips.append(clip)
+
+    elapsed = time.perf_counter() - started
+    logger.info("クリップを書き出しました", extra={
+        "export_id": export_id, "clips": len(clips), "failed": sum(1 for c in clips if "error" in c),
+        "seconds": round(elapsed, 3)})
+    return {
+        "export_id": export_id,
+        "clips": clips,
+        "seconds": round(elapsed, 3)
+    }
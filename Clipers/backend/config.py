@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv # type: ignore
 
 # .envファイルを読み込み
@@ -8,10 +9,225 @@ load_dotenv()
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 
+# 音声デコード設定
+AUDIO_BACKEND = os.getenv("CLIPERS_AUDIO_BACKEND", "auto")
+RESAMPLE_QUALITY = os.getenv("CLIPERS_RESAMPLE_QUALITY", "high")
+
+# 分析結果ストア（SQLite）
+RESULT_DB_PATH = os.getenv(
+    "CLIPERS_RESULT_DB",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "results.sqlite3")
+)
+
+# 音声から導出したファイル（エンベロープピラミッド・デコード済みPCM）のキャッシュ
+DERIVED_CACHE_DIR = os.getenv(
+    "CLIPERS_DERIVED_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cache")
+)
+
+# アドミッション制御（処理クラスごとの上限をJSONで上書き、例: {"dsp": {"max_concurrent": 4}}）
+ADMISSION_LIMITS = os.getenv("CLIPERS_ADMISSION_LIMITS", "")
+# 上限変更API（/admin/limits）のトークン（未設定の場合はローカルホストからのみ変更可）
+ADMIN_TOKEN = os.getenv("CLIPERS_ADMIN_TOKEN")
+
+# 本番起動（serve.py）のワーカー数と、起動時のウォームアップ（1で有効）
+# チャート・タイムライン・ダウンロードジョブ・合流・アドミッション制御・レート制限・ライブセッションは
+# プロセスごとの状態のため、既定は1ワーカー
+WORKERS = os.getenv("CLIPERS_WORKERS", "1")
+WARMUP = os.getenv("CLIPERS_WARMUP", "0")
+
+# 長い音声のチャンク並列DSP（ワーカー数: 0でCPU数、1で無効 / チャンク長と並列化する最短の長さは秒）
+DSP_WORKERS = os.getenv("CLIPERS_DSP_WORKERS", "0")
+DSP_CHUNK_SECONDS = os.getenv("CLIPERS_DSP_CHUNK_SECONDS", "120")
+DSP_PARALLEL_MIN_SECONDS = os.getenv("CLIPERS_DSP_PARALLEL_MIN_SECONDS", "600")
+# 無音区間のゲート（1で有効: 音調・スペクトルを有音区間のみで計算し、閾値の統計から無音を除く）
+ACTIVITY_GATING = os.getenv("CLIPERS_ACTIVITY_GATING", "1")
+# 盛り上がりポイントの最大件数と、ポイント間の最小間隔（秒）
+HIGHLIGHT_COUNT = os.getenv("CLIPERS_HIGHLIGHT_COUNT", "15")
+HIGHLIGHT_SEPARATION = os.getenv("CLIPERS_HIGHLIGHT_SEPARATION", "5")
+# クリップ候補の長さの範囲（秒、既定はShorts向けの15〜60秒）と件数
+CLIP_MIN_SECONDS = os.getenv("CLIPERS_CLIP_MIN_SECONDS", "15")
+CLIP_MAX_SECONDS = os.getenv("CLIPERS_CLIP_MAX_SECONDS", "60")
+CLIP_COUNT = os.getenv("CLIPERS_CLIP_COUNT", "5")
+
+# クリップの書き出し先・並列数・保持期間（時間）
+CLIP_DIR = os.getenv(
+    "CLIPERS_CLIP_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "clips")
+)
+CLIP_EXPORT_WORKERS = os.getenv("CLIPERS_CLIP_EXPORT_WORKERS", "4")
+CLIP_RETENTION_HOURS = os.getenv("CLIPERS_CLIP_RETENTION_HOURS", "24")
+
+# アップロード・ローカルファイル分析の作業領域、アップロードの最大サイズ（MB）と保持期間（時間）
+UPLOAD_DIR = os.getenv(
+    "CLIPERS_UPLOAD_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "uploads")
+)
+UPLOAD_MAX_MB = os.getenv("CLIPERS_UPLOAD_MAX_MB", "2048")
+UPLOAD_RETENTION_HOURS = os.getenv("CLIPERS_UPLOAD_RETENTION_HOURS", "24")
+# ローカルパス指定で分析できるディレクトリ（os.pathsep区切り、未設定の場合はローカルパス指定を無効化）
+LOCAL_MEDIA_ROOTS = os.getenv("CLIPERS_LOCAL_MEDIA_ROOTS", "")
+
+# ライブ分析の同時セッション数・イベントの最大遅延（秒）・イベントのスコア閾値・
+# ローリング統計の半減期（秒）・入力が途絶えてから終了するまでの秒数
+LIVE_MAX_SESSIONS = os.getenv("CLIPERS_LIVE_MAX_SESSIONS", "4")
+LIVE_LATENCY_SECONDS = os.getenv("CLIPERS_LIVE_LATENCY_SECONDS", "1.0")
+LIVE_EVENT_THRESHOLD = os.getenv("CLIPERS_LIVE_EVENT_THRESHOLD", "0.5")
+LIVE_HALF_LIFE_SECONDS = os.getenv("CLIPERS_LIVE_HALF_LIFE_SECONDS", "120")
+LIVE_IDLE_SECONDS = os.getenv("CLIPERS_LIVE_IDLE_SECONDS", "30")
+
+# アップロード・ローカルファイルの映像特徴量（0で無効）と、フレームの抽出方法
+# （keyframes: キーフレームのみ / interval: CLIPERS_VISUAL_INTERVAL_SECONDS秒ごとに1フレーム）
+VISUAL_FEATURES = os.getenv("CLIPERS_VISUAL_FEATURES", "1")
+VISUAL_SAMPLING = os.getenv("CLIPERS_VISUAL_SAMPLING", "keyframes")
+VISUAL_INTERVAL_SECONDS = os.getenv("CLIPERS_VISUAL_INTERVAL_SECONDS", "2")
+
+# DASH/HLSのフラグメントを同時にダウンロードする数
+CONCURRENT_FRAGMENTS = os.getenv("CLIPERS_CONCURRENT_FRAGMENTS", "4")
+
+# 音声分析プロファイル（speech-fast / default / music-hq）
+ANALYSIS_PROFILE = os.getenv("CLIPERS_ANALYSIS_PROFILE", "default")
+
 def get_youtube_api_key():
     """YouTube APIキーを取得（環境変数のみ）"""
     return YOUTUBE_API_KEY
 
 def get_gemini_api_key():
     """Gemini APIキーを取得（環境変数のみ）"""
-    return GEMINI_API_KEY 
\ No newline at end of file
+    return GEMINI_API_KEY
+
+def get_audio_backend():
+    """音声デコードバックエンドを取得（auto/soundfile/ffmpeg/memmap/librosa）"""
+    return AUDIO_BACKEND
+
+def get_resample_quality():
+    """リサンプル品質を取得（high/medium/fast）"""
+    return RESAMPLE_QUALITY
+
+def get_analysis_profile():
+    """既定の音声分析プロファイル名を取得（speech-fast/default/music-hq）"""
+    return ANALYSIS_PROFILE
+
+def get_result_db_path():
+    """分析結果ストア（SQLite）のパスを取得"""
+    return RESULT_DB_PATH
+
+def get_admission_overrides():
+    """処理クラスごとのアドミッション制御の上書き設定を取得"""
+    if not ADMISSION_LIMITS:
+        return {}
+    return json.loads(ADMISSION_LIMITS)
+
+def get_admin_token():
+    """管理API用トークンを取得（環境変数のみ）"""
+    return ADMIN_TOKEN
+
+def get_worker_count():
+    """本番起動時のワーカー数を取得"""
+    return max(1, int(WORKERS or 1))
+
+def get_warmup_enabled():
+    """起動時にウォームアップ（合成音声での試験分析）を行うか"""
+    return WARMUP.lower() in ("1", "true", "yes", "on")
+
+def get_dsp_workers():
+    """チャンク並列DSPのプロセス数を取得（0または未設定の場合はCPU数、1の場合は並列化しない）"""
+    workers = int(DSP_WORKERS or 0)
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+def get_dsp_chunk_seconds():
+    """チャンク並列DSPの1チャンクの長さ（秒）を取得"""
+    return float(DSP_CHUNK_SECONDS)
+
+def get_dsp_parallel_min_seconds():
+    """チャンク並列DSPを使う音声の最短の長さ（秒）を取得"""
+    return float(DSP_PARALLEL_MIN_SECONDS)
+
+def get_activity_gating():
+    """無音区間のゲートを使うか"""
+    return ACTIVITY_GATING.lower() in ("1", "true", "yes", "on")
+
+def get_highlight_count():
+    """盛り上がりポイントの最大件数を取得"""
+    return max(1, int(HIGHLIGHT_COUNT))
+
+def get_highlight_separation():
+    """盛り上がりポイント間の最小間隔（秒）を取得"""
+    return float(HIGHLIGHT_SEPARATION)
+
+def get_clip_seconds():
+    """クリップ候補の長さの範囲（最短, 最長 秒）を取得"""
+    min_seconds = float(CLIP_MIN_SECONDS)
+    return min_seconds, max(min_seconds, float(CLIP_MAX_SECONDS))
+
+def get_clip_count():
+    """クリップ候補の件数を取得"""
+    return max(1, int(CLIP_COUNT))
+
+def get_derived_cache_dir():
+    """エンベロープピラミッド・デコード済みPCMのキャッシュディレクトリを取得"""
+    return DERIVED_CACHE_DIR
+
+def get_clip_dir():
+    """クリップの書き出し先ディレクトリを取得"""
+    return CLIP_DIR
+
+def get_clip_export_workers():
+    """クリップを同時に切り出すffmpegプロセス数を取得"""
+    return max(1, int(CLIP_EXPORT_WORKERS))
+
+def get_clip_retention_hours():
+    """書き出したクリップの保持期間（時間）を取得"""
+    return float(CLIP_RETENTION_HOURS)
+
+def get_concurrent_fragments():
+    """フラグメントを同時にダウンロードする数を取得"""
+    return max(1, int(CONCURRENT_FRAGMENTS))
+
+def get_upload_dir():
+    """アップロード・ローカルファイル分析の作業ディレクトリを取得"""
+    return UPLOAD_DIR
+
+def get_upload_max_bytes():
+    """アップロードの最大サイズ（バイト）を取得"""
+    return int(float(UPLOAD_MAX_MB) * 1024 * 1024)
+
+def get_upload_retention_hours():
+    """アップロードした音声の保持期間（時間）を取得"""
+    return float(UPLOAD_RETENTION_HOURS)
+
+def get_local_media_roots():
+    """ローカルパス指定で分析できるディレクトリ（絶対パス）の一覧を取得"""
+    return [os.path.realpath(root) for root in LOCAL_MEDIA_ROOTS.split(os.pathsep) if root.strip()]
+
+def get_live_max_sessions():
+    """ライブ分析の同時セッション数の上限を取得"""
+    return max(1, int(LIVE_MAX_SESSIONS))
+
+def get_live_latency_seconds():
+    """ライブ分析で盛り上がりを確定するまでの最大遅延（秒）を取得"""
+    return max(0.0, float(LIVE_LATENCY_SECONDS))
+
+def get_live_event_threshold():
+    """ライブ分析で盛り上がりイベントとする最低スコア（0〜1）を取得"""
+    return float(LIVE_EVENT_THRESHOLD)
+
+def get_live_half_life_seconds():
+    """ライブ分析のローリング統計の半減期（秒）を取得"""
+    return max(1.0, float(LIVE_HALF_LIFE_SECONDS))
+
+def get_live_idle_seconds():
+    """ライブ分析で入力が途絶えてからセッションを終了するまでの秒数を取得"""
+    return max(1.0, float(LIVE_IDLE_SECONDS))
+
+def get_visual_features():
+    """アップロード・ローカルファイルの映像特徴量を計算するかを取得"""
+    return VISUAL_FEATURES.lower() in ("1", "true", "yes", "on")
+
+def get_visual_sampling():
+    """映像特徴量のフレームの抽出方法（keyframes / interval）を取得"""
+    return "interval" if VISUAL_SAMPLING.lower() == "interval" else "keyframes"
+
+def get_visual_interval_seconds():
+    """interval抽出のフレーム間隔（秒）を取得"""
+    return max(0.1, float(VISUAL_INTERVAL_SECONDS))
@@ -0,0 +1,45 @@
+"""
+音声から導出したファイル（エンベロープピラミッド・デコード済みPCM）のキャッシュ
+
+元の音声の隣には書き込まない（CLIPERS_LOCAL_MEDIA_ROOTS のディレクトリは読み取り専用の場合がある）。
+CLIPERS_DERIVED_CACHE_DIR の下に、元ファイルの実パス・更新時刻・サイズのハッシュをファイル名として保存するため、
+元ファイルが更新されると別のキャッシュになる。
+書き込みは同じディレクトリの一時ファイルに書いてから os.replace で置き換えるため、
+書き込み途中のファイルを読むことや、中断で壊れたファイルがキャッシュとして残ることはない。
+"""
+import hashlib
+import os
+import tempfile
+from contextlib import contextmanager
+
+from config import get_derived_cache_dir
+
+
+def derived_path(source_path: str, suffix: str) -> str:
+    """元ファイルに対応するキャッシュのパス（<cache_dir>/<ハッシュ先頭2文字>/<ハッシュ><suffix>）"""
+    real_path = os.path.realpath(source_path)
+    stat = os.stat(real_path)
+    key = hashlib.sha256(f"{real_path}\0{stat.st_mtime_ns}\0{stat.st_size}".encode("utf-8")).hexdigest()[:32]
+    return os.path.join(get_derived_cache_dir(), key[:2], key + suffix)
+
+
+@contextmanager
+def atomic_output(path: str):
+    """
+    一時ファイルのパスを渡し、ブロックが正常に終わった場合のみ path に置き換える
+
+    一時ファイルは path と同じ拡張子にする（np.save / np.savez が拡張子を付け足さないように）。
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=os.path.splitext(path)[1])
+    os.close(fd)
+    try:
+        yield temp_path
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,201 @@
+"""
+ダウンロードジョブの進捗
+
+yt-dlpの progress_hooks / postprocessor_hooks からダウンロード中のバイト数・速度・残り時間と、
+後処理（WAV変換など）後の最終的な出力パスを受け取り、ジョブごとに保持する。
+/jobs でダウンロード中・直近のジョブの状態を参照でき、fetch_media は出力パスとバイト数を
+ディレクトリを走査せずにジョブから取得する。
+
+選択されたフォーマットと、最高ビットレートの音声ストリームの推定サイズ（reference_bytes）も
+記録するため、分析用のフォーマット選択で削減できた転送量を確認できる。
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from metrics import registry
+
+# 保持する直近のジョブ数（古いものから破棄）
+MAX_JOBS = 200
+
+QUEUED = "queued"
+DOWNLOADING = "downloading"
+POSTPROCESSING = "postprocessing"
+FINISHED = "finished"
+ERROR = "error"
+
+DOWNLOAD_JOBS_ACTIVE = registry.gauge(
+    "clipers_download_jobs_active", "Download jobs currently downloading or post-processing")
+DOWNLOAD_BYTES = registry.counter(
+    "clipers_download_bytes_total", "Bytes transferred by yt-dlp downloads", ["endpoint"])
+
+
+def _format_size(fmt: Dict) -> Optional[int]:
+    size = fmt.get("filesize") or fmt.get("filesize_approx")
+    return int(size) if size else None
+
+
+def _is_audio_only(fmt: Dict) -> bool:
+    return fmt.get("vcodec") == "none" and fmt.get("acodec") not in (None, "none")
+
+
+class DownloadJob:
+    """1回のyt-dlp取得（extract_info）の進捗"""
+
+    def __init__(self, job_id: str, url: str, endpoint: str, video_id: Optional[str] = None):
+        self.job_id = job_id
+        self.url = url
+        self.endpoint = endpoint
+        self.video_id = video_id
+        self.status = QUEUED
+        self.downloaded_bytes = 0
+        self.total_bytes: Optional[int] = None
+        self.speed: Optional[float] = None
+        self.eta: Optional[float] = None
+        self.fragment_index: Optional[int] = None
+        self.fragment_count: Optional[int] = None
+        self.postprocessor: Optional[str] = None
+        # 選択されたフォーマットと、最高ビットレートの音声ストリームの推定サイズ
+        self.format: Optional[Dict] = None
+        self.reference_bytes: Optional[int] = None
+        # ダウンロードが完了したファイル（パス → バイト数）と、後処理後の最終的な出力パス
+        self.files: Dict[str, int] = {}
+        self.output_path: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self.status in (DOWNLOADING, POSTPROCESSING)
+
+    @property
+    def bytes_downloaded(self) -> int:
+        """完了したファイルとダウンロード中のファイルの合計バイト数"""
+        with self._lock:
+            return sum(self.files.values()) + (self.downloaded_bytes if self.status == DOWNLOADING else 0)
+
+    def _set_status(self, status: str):
+        if self.active and status not in (DOWNLOADING, POSTPROCESSING):
+            DOWNLOAD_JOBS_ACTIVE.dec()
+        elif not self.active and status in (DOWNLOADING, POSTPROCESSING):
+            DOWNLOAD_JOBS_ACTIVE.inc()
+        self.status = status
+        self.updated_at = time.time()
+
+    def on_progress(self, progress: Dict):
+        """yt-dlpの progress_hooks"""
+        with self._lock:
+            status = progress.get("status")
+            if status == "downloading":
+                self._set_status(DOWNLOADING)
+                self.downloaded_bytes = int(progress.get("downloaded_bytes") or 0)
+                self.total_bytes = progress.get("total_bytes") or progress.get("total_bytes_estimate")
+                self.speed = progress.get("speed")
+                self.eta = progress.get("eta")
+                self.fragment_index = progress.get("fragment_index")
+                self.fragment_count = progress.get("fragment_count")
+            elif status == "finished":
+                filename = progress.get("filename")
+                size = int(progress.get("total_bytes") or progress.get("downloaded_bytes") or 0)
+                if filename:
+                    self.files[filename] = size
+                    self.output_path = filename
+                self.downloaded_bytes = 0
+                self.updated_at = time.time()
+            elif status == "error":
+                self._set_status(ERROR)
+
+    def on_postprocess(self, progress: Dict):
+        """yt-dlpの postprocessor_hooks（後処理後のファイルパスを最終的な出力とする）"""
+        with self._lock:
+            self.postprocessor = progress.get("postprocessor")
+            if progress.get("status") in ("started", "processing"):
+                self._set_status(POSTPROCESSING)
+            elif progress.get("status") == "finished":
+                filepath = (progress.get("info_dict") or {}).get("filepath")
+                if filepath:
+                    self.output_path = filepath
+                self.updated_at = time.time()
+
+    def record_format(self, info: Dict):
+        """extract_infoの結果から選択されたフォーマットと比較用の推定サイズを記録"""
+        audio_formats = [fmt for fmt in info.get("formats") or [] if _is_audio_only(fmt)]
+        reference = max(audio_formats, key=lambda fmt: fmt.get("abr") or fmt.get("tbr") or 0, default=None)
+        with self._lock:
+            self.format = {
+                "format_id": info.get("format_id"),
+                "ext": info.get("ext"),
+                "acodec": info.get("acodec"),
+                "vcodec": info.get("vcodec"),
+                "abr": info.get("abr"),
+                "filesize": _format_size(info),
+            }
+            self.reference_bytes = _format_size(reference) if reference else None
+
+    def finish(self, error: Optional[str] = None):
+        """取得の終了（成功・失敗）を記録"""
+        transferred = self.bytes_downloaded
+        with self._lock:
+            self.error = error
+            self._set_status(ERROR if error else FINISHED)
+        if transferred:
+            DOWNLOAD_BYTES.inc(transferred, endpoint=self.endpoint)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            in_progress = self.downloaded_bytes if self.status == DOWNLOADING else 0
+            return {
+                "job_id": self.job_id,
+                "video_id": self.video_id,
+                "endpoint": self.endpoint,
+                "status": self.status,
+                "downloaded_bytes": sum(self.files.values()) + in_progress,
+                "total_bytes": self.total_bytes,
+                "progress": round(in_progress / self.total_bytes, 3)
+                if self.status == DOWNLOADING and self.total_bytes else None,
+                "speed": self.speed,
+                "eta": self.eta,
+                "fragments": [self.fragment_index, self.fragment_count] if self.fragment_count else None,
+                "postprocessor": self.postprocessor,
+                "format": self.format,
+                "reference_bytes": self.reference_bytes,
+                "files": len(self.files),
+                "error": self.error,
+                "created_at": self.created_at,
+                "updated_at": self.updated_at
+            }
+
+
+class DownloadJobRegistry:
+    """直近のダウンロードジョブ（スレッドセーフ）"""
+
+    def __init__(self, max_jobs: int = MAX_JOBS):
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, DownloadJob]" = OrderedDict()
+
+    def create(self, url: str, endpoint: str, video_id: Optional[str] = None) -> DownloadJob:
+        job = DownloadJob(uuid.uuid4().hex[:12], url, endpoint, video_id)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id: str) -> Optional[DownloadJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self, video_id: Optional[str] = None, active_only: bool = False) -> List[DownloadJob]:
+        """新しい順のジョブ一覧"""
+        with self._lock:
+            jobs = list(reversed(self._jobs.values()))
+        return [job for job in jobs
+                if (video_id is None or job.video_id == video_id) and (not active_only or job.active)]
+
+
+download_jobs = DownloadJobRegistry()
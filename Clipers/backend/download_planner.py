@@ -0,0 +1,192 @@
+"""
+ダウンロードプランナー
+
+エンドポイントとリクエストフラグから、yt-dlpで取得すべきアーティファクト
+（動画情報JSON・字幕・部分音声・全体音声）を決定する。
+
+分析のみに使う音声は、分析プロファイルに十分な最低ビットレート以上で最小の
+音声のみのストリーム（低ビットレートのopus / m4a等）を選択し、転送量を抑える。
+分析用の取得では、映像を含むフォーマットへのフォールバックは明示的に許可された場合のみ行う
+（書き出し・保存用の取得は音声のみのストリームがない動画でも取得できるよう常にフォールバックする）。
+"""
+import os
+from dataclasses import dataclass, asdict
+from typing import Dict, Optional
+
+from config import get_concurrent_fragments
+from logging_setup import YtDlpLogger
+
+AUDIO_NONE = "none"
+AUDIO_PARTIAL = "partial"
+AUDIO_FULL = "full"
+
+# 各エンドポイントが必要とするアーティファクト（既定値）
+# analysis: 音声を分析にのみ使う（Trueの場合は分析に十分な最小の音声ストリームを選択）
+ENDPOINT_REQUIREMENTS = {
+    "download-audio-enhanced": {"subtitles": True, "audio": True, "analysis": False},
+    "analyze-audio-accurate": {"subtitles": False, "audio": True, "analysis": True},
+    "analyze-engagement": {"subtitles": False, "audio": False, "analysis": True},
+    "analyze-comprehensive": {"subtitles": False, "audio": True, "analysis": True},
+    "analyze-gemini-enhanced": {"subtitles": True, "audio": True, "analysis": True},
+    "evaluate-video-framework": {"subtitles": False, "audio": True, "analysis": True},
+    "export-clips": {"subtitles": False, "audio": True, "analysis": False},
+}
+
+# 書き出し・保存用（分析以外）の音声フォーマット（最高音質の音声のみのストリーム、なければ映像を含むフォーマット）
+QUALITY_AUDIO_FORMAT = 'bestaudio[ext=m4a]/bestaudio[ext=mp3]/bestaudio[ext=webm]/bestaudio/best'
+
+SUBTITLE_LANGS = ['ja', 'en', 'en-US']  # 日本語と英語の字幕を優先
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+
+@dataclass
+class DownloadPlan:
+    """取得するアーティファクトの計画"""
+    endpoint: str
+    info: bool = True
+    subtitles: bool = False
+    audio: str = AUDIO_NONE
+    audio_seconds: Optional[float] = None
+    # 分析用の最低ビットレート（kbps、Noneの場合は最高音質を取得）
+    min_audio_kbps: Optional[int] = None
+    # 音声のみのストリームがない場合に映像を含むフォーマットを許可するか
+    allow_video: bool = False
+
+    @property
+    def needs_audio(self) -> bool:
+        return self.audio != AUDIO_NONE
+
+    @property
+    def needs_download(self) -> bool:
+        """メディアまたは字幕の書き込みが必要か（不要なら情報JSONのみ）"""
+        return self.subtitles or self.needs_audio
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def plan_downloads(endpoint: str, download_audio: bool = True,
+                   include_transcript: Optional[bool] = None,
+                   max_audio_seconds: Optional[float] = None,
+                   min_audio_kbps: Optional[int] = None,
+                   allow_video: bool = False) -> DownloadPlan:
+    """
+    エンドポイントとリクエストフラグから取得計画を作成
+
+    Args:
+        endpoint: エンドポイント名（先頭の'/'なし）
+        download_audio: Falseの場合は音声を一切取得しない
+        include_transcript: 字幕の要否（Noneの場合はエンドポイントの既定値）
+        max_audio_seconds: 指定された場合は先頭から指定秒数のみ音声を取得
+        min_audio_kbps: 分析プロファイルに十分な最低ビットレート（分析用エンドポイントのみ使用）
+        allow_video: 音声のみのストリームがない場合に映像を含むフォーマットを許可する
+    """
+    requirements = ENDPOINT_REQUIREMENTS.get(endpoint, {"subtitles": True, "audio": True, "analysis": False})
+
+    subtitles = requirements["subtitles"] if include_transcript is None else include_transcript
+
+    if not download_audio or not requirements["audio"]:
+        audio = AUDIO_NONE
+        max_audio_seconds = None
+    elif max_audio_seconds is not None and max_audio_seconds > 0:
+        audio = AUDIO_PARTIAL
+    else:
+        audio = AUDIO_FULL
+        max_audio_seconds = None
+
+    return DownloadPlan(
+        endpoint=endpoint,
+        subtitles=subtitles,
+        audio=audio,
+        audio_seconds=max_audio_seconds,
+        min_audio_kbps=min_audio_kbps if audio != AUDIO_NONE and requirements["analysis"] else None,
+        allow_video=allow_video
+    )
+
+
+def audio_format_options(plan: DownloadPlan) -> Dict:
+    """
+    音声ストリームの選択（yt-dlpの format / format_sort）
+
+    分析用はビットレートの昇順で並べ、最低ビットレート以上で最小の音声のみのストリーム
+    （なければ最小の音声のみのストリーム）を選ぶ。映像を含むフォーマット（best）は
+    allow_video の場合のみ最後の候補に加える。書き出し・保存用は最高音質を選び、常にbestを最後の候補にする。
+    """
+    if plan.min_audio_kbps:
+        options = {
+            'format': f'bestaudio[abr>={plan.min_audio_kbps}]/bestaudio',
+            'format_sort': ['+abr', '+size', 'acodec:opus'],
+        }
+        if plan.allow_video:
+            options['format'] += '/best'
+    else:
+        options = {
+            'format': QUALITY_AUDIO_FORMAT,
+            'format_sort': ['ext:m4a', 'ext:mp3', 'ext:webm', 'ext:ogg'],
+        }
+    options['format_sort_force'] = True
+    return options
+
+
+def build_ydl_options(plan: DownloadPlan, temp_dir: str) -> Dict:
+    """計画に必要なものだけを取得するyt-dlpオプションを生成"""
+    ydl_opts = {
+        'outtmpl': os.path.join(temp_dir, '%(title)s.%(ext)s'),
+        # 進捗表示を出さず、警告とエラーのみ構造化ログへ転送
+        'quiet': True,
+        'noprogress': True,
+        'logger': YtDlpLogger(),
+        # 403エラー回避のための設定
+        'nocheckcertificate': True,
+        'ignoreerrors': False,
+        'no_color': True,
+        'extractor_retries': 3,
+        'fragment_retries': 3,
+        'skip_unavailable_fragments': True,
+        'http_headers': {
+            'User-Agent': USER_AGENT
+        },
+        'writesubtitles': plan.subtitles,
+        'writeautomaticsub': plan.subtitles,
+        'writethumbnail': False,
+        'writeinfojson': False,
+        'writedescription': False,
+        'writeannotations': False,
+        'writestats': False,
+        'writecomments': False,
+        'getcomments': False,
+    }
+
+    if plan.subtitles:
+        ydl_opts['subtitleslangs'] = SUBTITLE_LANGS
+
+    if not plan.needs_audio:
+        # 字幕のみ（またはメタデータのみ）の場合はメディア本体を取得しない
+        ydl_opts['skip_download'] = True
+        return ydl_opts
+
+    ydl_opts.update(audio_format_options(plan))
+    ydl_opts.update({
+        'postprocessors': [{
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': 'wav',
+            'preferredquality': '192',
+        }],
+        # 音声抽出の改善設定
+        'extractaudio': True,
+        'audioformat': 'wav',
+        'audioquality': '192K',
+        # 追加の音声抽出設定
+        'prefer_ffmpeg': True,
+        'keepvideo': False,
+        'audio_only': True,
+        # DASHのフラグメントを並列にダウンロード
+        'concurrent_fragment_downloads': get_concurrent_fragments(),
+    })
+
+    if plan.audio == AUDIO_PARTIAL:
+        from yt_dlp.utils import download_range_func  # type: ignore
+        ydl_opts['download_ranges'] = download_range_func(None, [(0, plan.audio_seconds)])
+
+    return ydl_opts
@@ -0,0 +1,191 @@
+"""
+多解像度エンベロープピラミッド
+
+音声から10ms / 100ms / 1s / 10s 単位の min / max / RMS エンベロープを事前計算し、
+キャッシュディレクトリ（derived_cache）に .envelope.npz として保存する。
+タイムライン描画や区間クエリは、表示点数に見合った解像度のレベルだけを読むため
+サンプル数ではなく表示点数に比例したコストで済む。
+"""
+import os
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from derived_cache import derived_path, atomic_output
+
+# ピラミッドの各レベルの解像度（秒）。各レベルは前のレベルの10倍
+PYRAMID_LEVELS = (0.01, 0.1, 1.0, 10.0)
+PYRAMID_FACTOR = 10
+DEFAULT_MAX_POINTS = 2000
+MIN_DB = -60.0
+
+
+def _level_key(resolution: float) -> str:
+    return f"{int(round(resolution * 1000))}ms"
+
+
+class EnvelopePyramid:
+    """min / max / RMS エンベロープの多解像度ピラミッド"""
+
+    def __init__(self, levels: Dict[float, Dict[str, np.ndarray]], duration: float, sample_rate: int):
+        self.levels = levels
+        self.duration = duration
+        self.sample_rate = sample_rate
+
+    @classmethod
+    def build(cls, y: np.ndarray, sr: int) -> "EnvelopePyramid":
+        """波形からピラミッドを構築（O(サンプル数)を1回だけ）"""
+        if y.ndim > 1:
+            y = np.mean(y, axis=0)
+        block = max(1, int(round(PYRAMID_LEVELS[0] * sr)))
+        n_blocks = int(np.ceil(len(y) / block))
+        padded = np.zeros(n_blocks * block, dtype=np.float32)
+        padded[:len(y)] = y
+        frames = padded.reshape(n_blocks, block)
+
+        levels = {
+            PYRAMID_LEVELS[0]: {
+                "min": frames.min(axis=1),
+                "max": frames.max(axis=1),
+                "rms": np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1)).astype(np.float32)
+            }
+        }
+
+        # 上位レベルは下位レベルを10個ずつ集約して作成
+        previous = levels[PYRAMID_LEVELS[0]]
+        for resolution in PYRAMID_LEVELS[1:]:
+            n = len(previous["rms"])
+            n_groups = int(np.ceil(n / PYRAMID_FACTOR))
+            pad = n_groups * PYRAMID_FACTOR - n
+
+            def group(values: np.ndarray, fill: float) -> np.ndarray:
+                return np.concatenate([values, np.full(pad, fill, dtype=values.dtype)]).reshape(n_groups, PYRAMID_FACTOR)
+
+            counts = np.full(n_groups, PYRAMID_FACTOR, dtype=np.float64)
+            if pad:
+                counts[-1] = PYRAMID_FACTOR - pad
+            current = {
+                "min": group(previous["min"], np.inf).min(axis=1),
+                "max": group(previous["max"], -np.inf).max(axis=1),
+                "rms": np.sqrt(group(previous["rms"].astype(np.float64) ** 2, 0.0).sum(axis=1) / counts).astype(np.float32)
+            }
+            levels[resolution] = current
+            previous = current
+
+        return cls(levels, duration=len(y) / sr, sample_rate=sr)
+
+    @staticmethod
+    def path_for(audio_file_path: str) -> str:
+        """音声ファイル（の実パス・更新時刻・サイズ）に対応するピラミッドのパス"""
+        return derived_path(audio_file_path, ".envelope.npz")
+
+    def save(self, path: str):
+        arrays = {}
+        for resolution, level in self.levels.items():
+            for name, values in level.items():
+                arrays[f"{_level_key(resolution)}_{name}"] = values
+        with atomic_output(path) as temp_path:
+            np.savez(temp_path, duration=self.duration, sample_rate=self.sample_rate,
+                     resolutions=np.array(sorted(self.levels)), **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "EnvelopePyramid":
+        with np.load(path) as data:
+            levels = {}
+            for resolution in data["resolutions"]:
+                resolution = float(resolution)
+                key = _level_key(resolution)
+                levels[resolution] = {name: data[f"{key}_{name}"] for name in ("min", "max", "rms")}
+            return cls(levels, duration=float(data["duration"]), sample_rate=int(data["sample_rate"]))
+
+    @classmethod
+    def for_audio(cls, audio_file_path: str, y: Optional[np.ndarray] = None, sr: Optional[int] = None,
+                  backend: Optional[str] = None, quality: Optional[str] = "fast") -> "EnvelopePyramid":
+        """
+        音声ファイルに対応するピラミッドを取得（キャッシュがなければ構築して保存）
+        """
+        path = cls.path_for(audio_file_path)
+        if os.path.exists(path):
+            return cls.load(path)
+
+        if y is None:
+            from audio_io import load_audio
+            y, sr = load_audio(audio_file_path, sr=22050, backend=backend, quality=quality)
+        pyramid = cls.build(y, sr)
+        pyramid.save(path)
+        return pyramid
+
+    def pick_resolution(self, start: float, end: float, max_points: int = DEFAULT_MAX_POINTS) -> float:
+        """表示区間と最大点数から、点数を超えない最も細かいレベルを選ぶ"""
+        span = max(end - start, 0.0)
+        for resolution in sorted(self.levels):
+            if span / resolution <= max_points:
+                return resolution
+        return max(self.levels)
+
+    def query(self, start: float = 0.0, end: Optional[float] = None,
+              resolution: Optional[float] = None, max_points: int = DEFAULT_MAX_POINTS) -> Dict:
+        """
+        区間[start, end)のエンベロープを取得
+
+        Returns:
+            resolution, times, min, max, rms, db を含む辞書
+        """
+        end = self.duration if end is None else min(end, self.duration)
+        start = max(0.0, start)
+        if resolution is None:
+            resolution = self.pick_resolution(start, end, max_points)
+        elif resolution not in self.levels:
+            raise ValueError(f"利用可能な解像度は {sorted(self.levels)} です")
+
+        level = self.levels[resolution]
+        i0 = int(np.floor(start / resolution))
+        i1 = max(i0, int(np.ceil(end / resolution)))
+        rms = level["rms"][i0:i1]
+        db = np.clip(20 * np.log10(np.maximum(rms, 1e-10)), MIN_DB, 0.0)
+
+        return {
+            "resolution": resolution,
+            "start": start,
+            "end": end,
+            "times": (np.arange(i0, i0 + len(rms)) * resolution).round(3),
+            "min": level["min"][i0:i1],
+            "max": level["max"][i0:i1],
+            "rms": rms,
+            "db": db
+        }
+
+    def peak(self, start: float, end: float) -> Dict:
+        """区間内で最もRMSが大きい時刻とそのdB値"""
+        window = self.query(start, end)
+        if len(window["rms"]) == 0:
+            return {"time": start, "db": MIN_DB}
+        idx = int(np.argmax(window["rms"]))
+        return {"time": float(window["times"][idx]), "db": round(float(window["db"][idx]), 2)}
+
+
+class PyramidRegistry:
+    """動画IDごとのピラミッド（と直近の盛り上がりポイント）の所在を記録"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict] = {}
+
+    def register(self, video_id: str, audio_file_path: str, excitement_points: Optional[List[Dict]] = None,
+                 partial: bool = False):
+        with self._lock:
+            self._entries[video_id] = {
+                "audio_file_path": audio_file_path,
+                "pyramid_path": EnvelopePyramid.path_for(audio_file_path),
+                "excitement_points": excitement_points or [],
+                # 先頭のみ取得した音声か（動画全体を含まない）
+                "partial": partial
+            }
+
+    def get(self, video_id: str) -> Optional[Dict]:
+        with self._lock:
+            return self._entries.get(video_id)
+
+
+pyramid_registry = PyramidRegistry()
@@ -5,6 +5,40 @@ from typing import Dict, List, Optional
 import os
 import json
 import re
+import threading
+from contextlib import contextmanager
+from tracing import span
+
+
+class _GenaiKeyGate:
+    """
+    genai.configureはプロセス全体の設定のため、異なるAPIキーの呼び出しが同時に走らないようにする。
+    同じキーの呼び出しは並行して実行でき、別のキーへの切り替えは実行中の呼び出しの完了を待つ。
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._current_key: Optional[str] = None
+        self._active = 0
+
+    @contextmanager
+    def use(self, api_key: str):
+        with self._condition:
+            while self._active > 0 and self._current_key != api_key:
+                self._condition.wait()
+            if self._current_key != api_key:
+                genai.configure(api_key=api_key)
+                self._current_key = api_key
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                self._condition.notify_all()
+
+
+_key_gate = _GenaiKeyGate()
 
 class GeminiAnalyzer:
     """
@@ -21,7 +55,6 @@ class GeminiAnalyzer:
         if not self.api_key:
             raise ValueError("Gemini API Key is not provided in args or environment variable 'GEMINI_API_KEY'.")
         
-        genai.configure(api_key=self.api_key)
         self.model = genai.GenerativeModel('gemini-1.5-flash')
 
     def analyze_content_with_gemini(self, transcript, comments):
@@ -40,7 +73,8 @@ class GeminiAnalyzer:
         {', '.join(comments)[:8000]}
         """
         try:
-            response = self.model.generate_content(prompt)
+            with span("gemini.generate_content"), _key_gate.use(self.api_key):
+                response = self.model.generate_content(prompt)
             cleaned = response.text.strip().replace("```json", "").replace("```", "")
             return json.loads(cleaned)
         except Exception as e:
@@ -0,0 +1,326 @@
+"""
+盛り上がりポイントのスコアリングと上位K件の選択
+
+音量・音調・（あれば）コメントのタイムスタンプを、dB測定と同じフレーム列上の1本のスコアに統合し、
+ピーク検出 → 最小間隔による非最大値抑制（NMS） → np.argpartition による上位K件の選択を行う。
+いずれもフレーム数に対して線形（最大値フィルタ・移動平均・argpartition）で、
+数時間の配信でも候補を時間順に並べて先頭から切り捨てることはしない。
+
+- 音量・音調は有音区間の平均・標準偏差によるzスコア（0〜Z_CLIPでクリップして0〜1に正規化）
+- コメントは言及されたタイムスタンプを言及数で重み付けし、ガウス窓で平滑化したもの
+- 統合スコアは重み付き平均（コメントがない場合は音量・音調の重みのみで正規化）
+
+同じスコアから、指定した長さの範囲（Shorts向けの15〜60秒など）のすべての窓を累積和で1窓O(1)で評価し、
+重ならない上位のクリップ候補を選ぶ（clip_candidates）。
+"""
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy.ndimage import maximum_filter1d
+
+# 統合スコアの重み
+VOLUME_WEIGHT = 0.6
+PITCH_WEIGHT = 0.25
+COMMENT_WEIGHT = 0.15
+# zスコアの上限（これ以上は同じ強さとして扱う）
+Z_CLIP = 3.0
+# スコアの平滑化窓（秒）とコメントのガウス窓の標準偏差（秒）
+SMOOTHING_SECONDS = 0.25
+COMMENT_SIGMA_SECONDS = 3.0
+# これ未満のスコアのピークは盛り上がりとして扱わない
+MIN_PEAK_SCORE = 0.05
+# クリップ候補を評価する時間分解能（秒）と、冒頭（フック）として評価する長さ（秒）
+CLIP_RESOLUTION_SECONDS = 0.5
+HOOK_SECONDS = 3.0
+# クリップ窓の評価の基準値（中央値 + 中央絶対偏差 × この値）
+BASELINE_MAD_RATIO = 0.5
+# クリップ候補の理由（最も寄与の大きい要素ごと）
+CLIP_REASONS = {
+    "volume": "音量の盛り上がりが続く区間",
+    "pitch": "声の調子（音調）の変化が大きい区間",
+    "comments": "コメントで多く言及された区間"
+}
+COMPONENT_WEIGHTS = {"volume": VOLUME_WEIGHT, "pitch": PITCH_WEIGHT, "comments": COMMENT_WEIGHT}
+
+
+def normalized_z(values: np.ndarray, mask: Optional[np.ndarray] = None) -> np.ndarray:
+    """マスク内（有音区間）の平均・標準偏差によるzスコアを0〜1に正規化（平均以下は0）"""
+    values = np.asarray(values, dtype=np.float64)
+    reference = values[mask] if mask is not None and np.any(mask) else values
+    if len(reference) == 0:
+        return np.zeros(len(values))
+    std = float(np.std(reference))
+    if std == 0:
+        return np.zeros(len(values))
+    return np.clip((values - float(np.mean(reference))) / std, 0.0, Z_CLIP) / Z_CLIP
+
+
+def resample_frames(values: np.ndarray, src_hop_seconds: float, n_frames: int, dst_hop_seconds: float) -> np.ndarray:
+    """ホップ長の異なるフレーム列の値を、dst側のフレーム時刻に線形補間で写す"""
+    if len(values) == 0:
+        return np.zeros(n_frames)
+    src_times = np.arange(len(values)) * src_hop_seconds
+    return np.interp(np.arange(n_frames) * dst_hop_seconds, src_times, values)
+
+
+def moving_average(values: np.ndarray, width: int) -> np.ndarray:
+    """累積和による移動平均（中心合わせ、端は窓内のフレーム数で割る）"""
+    if width <= 1 or len(values) == 0:
+        return np.asarray(values, dtype=np.float64)
+    cumulative = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+    index = np.arange(len(values))
+    lo = np.maximum(index - width // 2, 0)
+    hi = np.minimum(index + (width - width // 2), len(values))
+    return (cumulative[hi] - cumulative[lo]) / (hi - lo)
+
+
+def comment_evidence(timestamps: List[Dict], n_frames: int, hop_seconds: float,
+                     sigma_seconds: float = COMMENT_SIGMA_SECONDS) -> Optional[np.ndarray]:
+    """
+    コメントのタイムスタンプ（{"time": 秒, "mention_count": 件数}）をフレームごとの0〜1のスコアにする
+
+    タイムスタンプが1件も範囲内にない場合はNone
+    """
+    counts = np.zeros(n_frames)
+    for timestamp in timestamps or []:
+        frame = int(round(float(timestamp.get("time", -1)) / hop_seconds))
+        if 0 <= frame < n_frames:
+            counts[frame] += float(timestamp.get("mention_count", 1))
+    if not np.any(counts):
+        return None
+    radius = max(1, int(round(3 * sigma_seconds / hop_seconds)))
+    offsets = np.arange(-radius, radius + 1) * hop_seconds
+    kernel = np.exp(-0.5 * (offsets / sigma_seconds) ** 2)
+    smoothed = np.convolve(counts, kernel, mode="same")
+    return smoothed / np.max(smoothed)
+
+
+def fuse_scores(volume: np.ndarray, pitch: Optional[np.ndarray],
+                comments: Optional[np.ndarray] = None) -> np.ndarray:
+    """音量・音調・コメントのスコアを重み付き平均で1本のスコアにする（ない要素の重みは除く）"""
+    weighted = VOLUME_WEIGHT * np.asarray(volume, dtype=np.float64)
+    total_weight = VOLUME_WEIGHT
+    if pitch is not None:
+        weighted = weighted + PITCH_WEIGHT * pitch
+        total_weight += PITCH_WEIGHT
+    if comments is not None:
+        weighted = weighted + COMMENT_WEIGHT * comments
+        total_weight += COMMENT_WEIGHT
+    return weighted / total_weight
+
+
+def excitement_curve(db: np.ndarray, hop_seconds: float, pitch: Optional[np.ndarray],
+                     pitch_hop_seconds: Optional[float],
+                     volume_mask: Optional[np.ndarray] = None, pitch_mask: Optional[np.ndarray] = None,
+                     comment_timestamps: Optional[List[Dict]] = None) -> Dict[str, np.ndarray]:
+    """
+    dBのフレーム列上の盛り上がりスコアを計算（pitchがNoneの場合は音量とコメントのみ）
+
+    Returns:
+        score（統合スコア）と要素ごとの平滑化したスコア volume / pitch / comments（ない要素はNone）
+    """
+    n_frames = len(db)
+    volume = normalized_z(db, volume_mask)
+    pitch_frames = None
+    if pitch is not None:
+        pitch_z = normalized_z(pitch, pitch_mask)
+        if pitch_mask is not None:
+            pitch_z = np.where(pitch_mask, pitch_z, 0.0)
+        pitch_frames = resample_frames(pitch_z, pitch_hop_seconds, n_frames, hop_seconds)
+    comments = comment_evidence(comment_timestamps, n_frames, hop_seconds) if comment_timestamps else None
+
+    # 要素ごとに平滑化してから統合する（統合は線形のため統合後の平滑化と同じで、要素の値が統合スコアと対応する）
+    width = max(1, int(round(SMOOTHING_SECONDS / hop_seconds)))
+    volume = moving_average(volume, width)
+    if pitch_frames is not None:
+        pitch_frames = moving_average(pitch_frames, width)
+    if comments is not None:
+        comments = moving_average(comments, width)
+    return {
+        "score": fuse_scores(volume, pitch_frames, comments),
+        "volume": volume,
+        "pitch": pitch_frames,
+        "comments": comments
+    }
+
+
+def select_peaks(score: np.ndarray, min_separation: int, top_k: int,
+                 min_score: float = MIN_PEAK_SCORE) -> np.ndarray:
+    """
+    スコアのピークを最小間隔min_separation（フレーム）で抑制し、スコアの高い順に最大top_k件のフレーム番号を返す
+
+    前後min_separationフレーム内の最大値（平坦な頂上は先頭のみ）をピークとし、
+    上位候補をnp.argpartitionで取り出してから、同値のピークが近接する場合に備えて間隔を確認する。
+    """
+    if len(score) == 0 or top_k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    min_separation = max(1, min_separation)
+    local_max = maximum_filter1d(score, size=2 * min_separation + 1, mode="constant", cval=-np.inf)
+    previous = np.concatenate(([-np.inf], score[:-1]))
+    candidates = np.flatnonzero((score == local_max) & (score > previous) & (score >= min_score))
+    if len(candidates) == 0:
+        return candidates
+
+    # 上位候補のみ並べ替える（同値ピークで間隔確認により落ちる分の余裕を持たせる）
+    pool = min(len(candidates), 2 * top_k)
+    if pool < len(candidates):
+        candidates = candidates[np.argpartition(-score[candidates], pool - 1)[:pool]]
+    candidates = candidates[np.argsort(-score[candidates], kind="stable")]
+
+    selected: List[int] = []
+    for index in candidates:
+        if all(abs(int(index) - other) > min_separation for other in selected):
+            selected.append(int(index))
+            if len(selected) == top_k:
+                break
+    return np.asarray(selected, dtype=np.int64)
+
+
+def peak_extent(score: np.ndarray, index: int, max_radius: int, ratio: float = 0.5) -> Tuple[int, int]:
+    """ピークの前後でスコアがピークのratio倍以上の連続区間（最大±max_radiusフレーム）"""
+    threshold = score[index] * ratio
+    lo = max(0, index - max_radius)
+    hi = min(len(score), index + max_radius + 1)
+    below_left = np.flatnonzero(score[lo:index] < threshold)
+    below_right = np.flatnonzero(score[index + 1:hi] < threshold)
+    start = lo + int(below_left[-1]) + 1 if len(below_left) else lo
+    end = index + 1 + int(below_right[0]) if len(below_right) else hi
+    return start, end
+
+
+def bin_means(values: np.ndarray, frames_per_bin: int) -> np.ndarray:
+    """frames_per_binフレームごとの平均（末尾の端数も1区間とする）"""
+    values = np.asarray(values, dtype=np.float64)
+    if frames_per_bin <= 1 or len(values) == 0:
+        return values
+    n_bins = -(-len(values) // frames_per_bin)
+    sums = np.add.reduceat(values, np.arange(0, len(values), frames_per_bin))
+    counts = np.full(n_bins, frames_per_bin)
+    counts[-1] = len(values) - frames_per_bin * (n_bins - 1)
+    return sums / counts
+
+
+def format_clip_time(seconds: float) -> str:
+    """秒を mm:ss（1時間以上は h:mm:ss）に整形"""
+    total = int(seconds)
+    hours, minutes, secs = total // 3600, (total % 3600) // 60, total % 60
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes:02d}:{secs:02d}"
+
+
+def best_windows(gain_prefix: np.ndarray, min_len: int, max_len: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    各開始位置について、長さmin_len〜max_lenの窓のうち合計（累積和の差）が最大の長さと値を返す
+
+    1つの窓の合計は累積和の差でO(1)、全体でO(区間数 × 長さの種類)
+    """
+    n = len(gain_prefix) - 1
+    best_gain = np.full(n, -np.inf)
+    best_len = np.zeros(n, dtype=np.int64)
+    for length in range(min_len, max_len + 1):
+        starts = n - length + 1
+        if starts <= 0:
+            break
+        gain = gain_prefix[length:length + starts] - gain_prefix[:starts]
+        better = gain > best_gain[:starts]
+        best_gain[:starts] = np.where(better, gain, best_gain[:starts])
+        best_len[:starts] = np.where(better, length, best_len[:starts])
+    return best_gain, best_len
+
+
+def feasible_window(gain_prefix: np.ndarray, start: int, min_len: int, max_len: int,
+                    selected: List[Tuple[int, int]]) -> Optional[Tuple[float, int]]:
+    """startから始まり選択済みの窓と重ならない長さのうち、合計が最大の(合計, 長さ)（ない場合はNone）"""
+    limit = min(max_len, len(gain_prefix) - 1 - start)
+    for other_start, other_end in selected:
+        if other_start <= start < other_end:
+            return None
+        if other_start > start:
+            limit = min(limit, other_start - start)
+    if limit < min_len:
+        return None
+    gains = gain_prefix[start + min_len:start + limit + 1] - gain_prefix[start]
+    best = int(np.argmax(gains))
+    return float(gains[best]), min_len + best
+
+
+def clip_candidates(curve: Dict[str, np.ndarray], hop_seconds: float, min_seconds: float, max_seconds: float,
+                    count: int, resolution: float = CLIP_RESOLUTION_SECONDS) -> List[Dict]:
+    """
+    盛り上がりスコアからクリップ候補（重ならない上位count件）を選ぶ
+
+    窓の評価値は「スコアが基準値（全体の中央値 + 散らばり）を上回る分」の合計（gain）。盛り上がりの前後の平凡な区間を含めるほど
+    値が下がるため、長さの範囲内で盛り上がりを過不足なく含む長さが選ばれる。音声が最短の長さより短い場合は全体を1つの候補とする。
+
+    Returns:
+        [{"start", "end", "duration", "time", "rank", "score", "reason", "breakdown": {...}}, ...]（scoreの高い順）
+    """
+    frames_per_bin = max(1, int(round(resolution / hop_seconds)))
+    bin_seconds = frames_per_bin * hop_seconds
+    score = bin_means(curve["score"], frames_per_bin)
+    n = len(score)
+    if n == 0 or count <= 0:
+        return []
+    min_len = max(1, min(n, int(round(min_seconds / bin_seconds))))
+    max_len = max(min_len, min(n, int(round(max_seconds / bin_seconds))))
+
+    # 中央値に散らばり（中央絶対偏差の半分）を足して、平凡な区間を含めて最長まで伸びるのを防ぐ
+    median = float(np.median(score))
+    baseline = median + BASELINE_MAD_RATIO * float(np.median(np.abs(score - median)))
+    gain_prefix = np.concatenate(([0.0], np.cumsum(score - baseline)))
+    best_gain, best_len = best_windows(gain_prefix, min_len, max_len)
+
+    # 評価値の高い順に、既に選んだ候補と重ならない窓を選ぶ（基準値を上回る窓がない場合は最良の1件のみ）。
+    # 最良の長さが選んだ候補と重なる開始位置は、重ならない範囲で最良の長さに評価し直して順番を待ち直す
+    heap = [(-float(best_gain[start]), start, int(best_len[start]))
+            for start in range(n) if np.isfinite(best_gain[start])]
+    heapq.heapify(heap)
+    selected: List[Tuple[int, int]] = []
+    gains: List[float] = []
+    while heap:
+        gain, start, length = heapq.heappop(heap)
+        gain = -gain
+        if selected and gain <= 0:
+            break
+        end = start + length
+        if all(end <= other_start or start >= other_end for other_start, other_end in selected):
+            selected.append((start, end))
+            gains.append(gain)
+            if len(selected) == count or gain <= 0:
+                break
+            continue
+        window = feasible_window(gain_prefix, start, min_len, max_len, selected)
+        if window is not None:
+            heapq.heappush(heap, (-window[0], start, window[1]))
+
+    components = {key: bin_means(curve[key], frames_per_bin)
+                  for key in ("volume", "pitch", "comments") if curve.get(key) is not None}
+    prefixes = {key: np.concatenate(([0.0], np.cumsum(values))) for key, values in components.items()}
+    score_prefix = np.concatenate(([0.0], np.cumsum(score)))
+    hook_len = max(1, int(round(HOOK_SECONDS / bin_seconds)))
+
+    candidates = []
+    for rank, ((start, end), gain) in enumerate(zip(selected, gains), start=1):
+        length = end - start
+        hook_end = min(end, start + hook_len)
+        breakdown = {
+            "mean_excitement": (score_prefix[end] - score_prefix[start]) / length,
+            "peak_excitement": float(np.max(score[start:end])),
+            "hook_excitement": (score_prefix[hook_end] - score_prefix[start]) / (hook_end - start),
+            "baseline": baseline
+        }
+        for key, prefix in prefixes.items():
+            breakdown[key] = (prefix[end] - prefix[start]) / length
+        dominant = max(prefixes, key=lambda key: COMPONENT_WEIGHTS[key] * breakdown[key], default="volume")
+        start_seconds, end_seconds = start * bin_seconds, min(end * bin_seconds, len(curve["score"]) * hop_seconds)
+        candidates.append({
+            "start": round(start_seconds, 2),
+            "end": round(end_seconds, 2),
+            "duration": round(end_seconds - start_seconds, 2),
+            "time": format_clip_time(start_seconds),
+            "rank": rank,
+            "score": round(gain * bin_seconds, 3),
+            "reason": CLIP_REASONS[dominant],
+            "breakdown": {key: round(float(value), 3) for key, value in breakdown.items()}
+        })
+    return candidates
@@ -2,76 +2,264 @@ import librosa
 import numpy as np
 from typing import Dict, List, Tuple, Optional
 import json
-import requests
 from datetime import datetime
-import re
+from audio_io import load_audio, resample
+from analysis_profiles import AnalysisProfile, get_profile, FEATURE_SPECTRAL, FEATURE_STEREO
+from envelope_pyramid import EnvelopePyramid, PYRAMID_LEVELS
+from tracing import span
+from pillar_cache import pillar_cache, audio_input_hash
+from youtube_engagement import YouTubeEngagementAnalyzer
+from chunked_dsp import FramePlan, FrameFeatureRunner, reset_executor
+from voice_activity import activity_mask, frames_to_frames, mask_to_runs, summarize_activity
+from highlights import (excitement_curve, select_peaks, peak_extent, clip_candidates,
+                        VOLUME_WEIGHT, PITCH_WEIGHT, COMMENT_WEIGHT)
+from config import (get_dsp_workers, get_dsp_chunk_seconds, get_dsp_parallel_min_seconds, get_activity_gating,
+                    get_highlight_count, get_highlight_separation, get_clip_seconds, get_clip_count)
+from logging_setup import get_logger
+
+logger = get_logger("audio")
+
+# 高域エネルギー比の境界周波数（Hz）
+HIGH_BAND_HZ = 8000
 
 class ImprovedAudioAnalyzer:
-    def __init__(self, sample_rate: int = 22050):
+    def __init__(self, sample_rate: int = 22050, audio_backend: Optional[str] = None,
+                 resample_quality: Optional[str] = None, profile: Optional[str] = None,
+                 dsp_workers: Optional[int] = None, chunk_seconds: Optional[float] = None,
+                 parallel_min_seconds: Optional[float] = None, activity_gating: Optional[bool] = None,
+                 highlight_count: Optional[int] = None, highlight_separation: Optional[float] = None,
+                 clip_seconds: Optional[Tuple[float, float]] = None, clip_count: Optional[int] = None):
         self.sample_rate = sample_rate
+        # 既定の分析プロファイル（Noneの場合はconfigの設定値）
+        self.profile = profile
+        # 音声デコード設定（Noneの場合はconfigの設定値を使用）
+        self.audio_backend = audio_backend
+        self.resample_quality = resample_quality
+        # 長い音声のチャンク並列DSP設定（Noneの場合はconfigの設定値、dsp_workers=1で無効）
+        self.dsp_workers = dsp_workers
+        self.chunk_seconds = chunk_seconds
+        self.parallel_min_seconds = parallel_min_seconds
+        # 無音区間のゲート（Noneの場合はconfigの設定値）
+        self.activity_gating = activity_gating
+        # 盛り上がりポイントの件数と最小間隔（秒）（Noneの場合はconfigの設定値）
+        self.highlight_count = highlight_count
+        self.highlight_separation = highlight_separation
+        # クリップ候補の長さの範囲（最短, 最長 秒）と件数（Noneの場合はconfigの設定値）
+        self.clip_seconds = clip_seconds
+        self.clip_count = clip_count
         # dB測定の基準値を設定（標準的な音声レベル）
         self.reference_level = 1.0  # 1.0 = 0 dBFS
         self.min_db = -60  # 最小dB値
         self.max_db = 0    # 最大dB値
         
-    def analyze_audio_accurate(self, audio_file_path: str) -> Dict:
+    def analyze_audio_accurate(self, audio_file_path: str, profile: Optional[str] = None,
+                               highlight_count: Optional[int] = None,
+                               comment_timestamps: Optional[List[Dict]] = None) -> Dict:
         """
         正確なdB測定による音声分析
+        
+        Args:
+            audio_file_path: 音声ファイルのパス
+            profile: 分析プロファイル名（speech-fast / default / music-hq、Noneの場合は既定値）
+            highlight_count: 盛り上がりポイントの最大件数（Noneの場合は既定値）
+            comment_timestamps: コメントで言及されたタイムスタンプ（hot_timestamps、盛り上がり検出の根拠に加える）
         """
         try:
-            # 音声ファイルを読み込み
-            y, sr = librosa.load(audio_file_path, sr=self.sample_rate)
+            analysis_profile = get_profile(profile or self.profile)
+            
+            # 音声ファイルを読み込み（プロファイルのサンプルレート・チャンネル構成で）
+            with span("audio.decode"):
+                y_channels, sr = self._load(audio_file_path, analysis_profile)
+            y = y_channels if y_channels.ndim == 1 else np.mean(y_channels, axis=0)
             duration = librosa.get_duration(y=y, sr=sr)
             
-            # 正確なdB測定
-            accurate_db = self._calculate_accurate_db(y, sr)
+            # タイムライン用のエンベロープピラミッドをキャッシュディレクトリに保存
+            try:
+                with span("audio.envelope_pyramid"):
+                    EnvelopePyramid.for_audio(audio_file_path, y=y, sr=sr)
+            except OSError:
+                pass
             
-            # 音調分析
-            pitches, magnitudes = librosa.piptrack(y=y, sr=sr)
-            pitch_mean = np.mean(pitches, axis=0)
+            hop_length = analysis_profile.hop_length(sr)
             
-            # 盛り上がりポイントの特定
-            excitement_points = self._find_excitement_points_accurate(accurate_db, pitch_mean, duration)
+            plan = self._frame_plan(analysis_profile, sr)
+            hop_seconds = hop_length / sr
             
-            return {
+            # 長い音声はフレーム特徴量をチャンクごとにプロセスプールで並列計算
+            workers = self._dsp_workers() if self._use_chunked(duration) else 1
+            try:
+                frames = self._compute_frames(y, plan, workers)
+            except Exception as e:
+                if workers == 1:
+                    raise
+                # プールの異常終了などは1プロセスでの計算にフォールバック
+                logger.warning("チャンク並列DSPに失敗したため逐次処理に切り替えます", extra={"error": str(e)})
+                reset_executor()
+                frames = self._compute_frames(y, plan, 1)
+                frames["execution"]["fallback_error"] = str(e)
+            
+            accurate_db = frames["db"]
+            active = frames["active"]
+            pitch_mean = frames["stft"]["pitch_mean"]
+            # 音調の統計は計算した（有音の）フレームのみで求める
+            pitch_computed = frames["stft"]["computed"]
+            pitch_values = pitch_mean[pitch_computed] if np.any(pitch_computed) else np.zeros(1)
+            # 音量の統計も有音フレームのみで求める（全フレームの値は *_all_frames）
+            active_db = accurate_db[active] if np.any(active) else accurate_db
+            
+            # 盛り上がりスコア（音量・音調・コメント）→ 盛り上がりポイントとクリップ候補
+            with span("audio.excitement_curve"):
+                curve = excitement_curve(accurate_db, hop_seconds, pitch_mean, plan.stft_hop / sr,
+                                         volume_mask=active, pitch_mask=pitch_computed,
+                                         comment_timestamps=comment_timestamps)
+            with span("audio.excitement_points"):
+                excitement_points = self._find_excitement_points_accurate(
+                    accurate_db, pitch_mean, curve, hop_seconds, plan.stft_hop / sr, top_k=highlight_count)
+            with span("audio.clip_candidates"):
+                min_seconds, max_seconds = self._clip_seconds()
+                candidates = clip_candidates(curve, hop_seconds, min_seconds, max_seconds, self._clip_count())
+            
+            result = {
                 "duration": duration,
                 "sample_rate": sr,
+                "channels": 1 if y_channels.ndim == 1 else int(y_channels.shape[0]),
                 "volume_analysis": {
-                    "mean_volume": float(np.mean(accurate_db)),
-                    "max_volume": float(np.max(accurate_db)),
-                    "min_volume": float(np.min(accurate_db)),
-                    "volume_variance": float(np.var(accurate_db)),
+                    "mean_volume": float(np.mean(active_db)),
+                    "max_volume": float(np.max(active_db)),
+                    "min_volume": float(np.min(active_db)),
+                    "volume_variance": float(np.var(active_db)),
+                    "mean_volume_all_frames": float(np.mean(accurate_db)),
+                    "min_volume_all_frames": float(np.min(accurate_db)),
+                    "volume_variance_all_frames": float(np.var(accurate_db)),
                     "peak_volume": float(np.max(np.abs(y))),
                     "rms_volume": float(np.sqrt(np.mean(y**2)))
                 },
                 "pitch_analysis": {
-                    "mean_pitch": float(np.mean(pitch_mean)),
-                    "pitch_variance": float(np.var(pitch_mean)),
-                    "pitch_range": float(np.max(pitch_mean) - np.min(pitch_mean))
+                    "mean_pitch": float(np.mean(pitch_values)),
+                    "pitch_variance": float(np.var(pitch_values)),
+                    "pitch_range": float(np.max(pitch_values) - np.min(pitch_values))
                 },
                 "excitement_points": excitement_points,
-                "overall_excitement_score": self._calculate_excitement_score_accurate(accurate_db, pitch_mean),
+                "clip_candidates": candidates,
+                # 無音区間を含めると動的範囲・分散が無音との差で大きくなるため、有音フレームのみで求める
+                "overall_excitement_score": self._calculate_excitement_score_accurate(active_db, pitch_values),
                 "analysis_metadata": {
                     "reference_level": self.reference_level,
                     "min_db": self.min_db,
                     "max_db": self.max_db,
-                    "analysis_method": "accurate_db_measurement"
+                    "analysis_method": "accurate_db_measurement",
+                    "analysis_profile": analysis_profile.name,
+                    "frame_length": analysis_profile.frame_length(sr),
+                    "hop_length": hop_length,
+                    "execution": frames["execution"]
                 }
             }
             
+            if frames["threshold_db"] is not None:
+                result["voice_activity"] = summarize_activity(active, hop_seconds, frames["threshold_db"])
+            
+            if analysis_profile.has(FEATURE_STEREO):
+                with span("audio.stereo"):
+                    result["stereo_analysis"] = self._analyze_stereo(y_channels)
+            
+            if analysis_profile.has(FEATURE_SPECTRAL):
+                with span("audio.spectral"):
+                    result["spectral_analysis"] = self._summarize_spectrum(
+                        {key: values[pitch_computed] for key, values in frames["stft"].items()})
+            
+            return result
+            
         except Exception as e:
             return {"error": str(e)}
     
-    def _calculate_accurate_db(self, y: np.ndarray, sr: int) -> np.ndarray:
-        """
-        正確なdB値を計算
+    def clip_candidates_from_envelope(self, audio_file_path: str,
+                                      comment_timestamps: Optional[List[Dict]] = None) -> List[Dict]:
         """
-        # RMS（二乗平均平方根）を計算
-        frame_length = int(0.025 * sr)  # 25msフレーム
-        hop_length = int(0.010 * sr)    # 10msホップ
+        クリップ候補のみを、エンベロープピラミッドの最小解像度のRMS（音量）とコメントから求める
         
-        rms = librosa.feature.rms(y=y, frame_length=frame_length, hop_length=hop_length)[0]
+        音調・スペクトル・盛り上がりポイントは計算しない（評価フレームワーク用）。
+        ピラミッドは /timeline と共有し、なければ構築してキャッシュディレクトリに保存する。
+        """
+        hop_seconds = PYRAMID_LEVELS[0]
+        with span("audio.envelope_pyramid"):
+            pyramid = EnvelopePyramid.for_audio(audio_file_path, backend=self.audio_backend)
+        db = self._rms_to_db(pyramid.levels[hop_seconds]["rms"])
+        active = activity_mask(db, hop_seconds)[0] if self._activity_gating() else None
+        with span("audio.excitement_curve"):
+            curve = excitement_curve(db, hop_seconds, None, None, volume_mask=active,
+                                     comment_timestamps=comment_timestamps)
+        with span("audio.clip_candidates"):
+            min_seconds, max_seconds = self._clip_seconds()
+            return clip_candidates(curve, hop_seconds, min_seconds, max_seconds, self._clip_count())
+    
+    def _load(self, audio_file_path: str, analysis_profile: AnalysisProfile) -> Tuple[np.ndarray, int]:
+        """プロファイルに従って音声を読み込む（native_ratesに含まれるレートはそのまま使用）"""
+        quality = self.resample_quality or analysis_profile.resample_quality
+        y, sr = load_audio(audio_file_path, sr=analysis_profile.decode_rate(), mono=analysis_profile.mono,
+                           backend=self.audio_backend, quality=quality)
+        if analysis_profile.native_rates and sr not in analysis_profile.native_rates:
+            y, sr = resample(np.asarray(y), sr, analysis_profile.sample_rate, quality)
+        return y, sr
+    
+    def _compute_frames(self, y: np.ndarray, plan: FramePlan, workers: int) -> Dict:
+        """
+        フレーム特徴量を計算: dB → 有音区間の検出 → 有音区間のみ音調・スペクトル
         
+        Returns:
+            db / active（有音マスク） / threshold_db（ゲート無効時はNone） / stft（特徴量とcomputedマスク） / execution
+        """
+        with FrameFeatureRunner(y, plan, workers, self.chunk_seconds or get_dsp_chunk_seconds()) as runner:
+            # 正確なdB測定
+            with span("audio.db"):
+                accurate_db = self._rms_to_db(runner.rms())
+            
+            # 無音・ほぼ無音の区間は重い特徴量の計算から除く
+            if self._activity_gating():
+                with span("audio.activity"):
+                    active, threshold_db = activity_mask(accurate_db, plan.hop_length / plan.sr)
+                stft_ranges = frames_to_frames(mask_to_runs(active), plan.hop_length, plan.stft_hop, runner.n_stft)
+            else:
+                active, threshold_db = np.ones(len(accurate_db), dtype=bool), None
+                stft_ranges = [(0, runner.n_stft)]
+            
+            # 音調分析（music-hqではスペクトル特徴量も同じSTFTから計算）
+            with span("audio.piptrack"):
+                stft = runner.stft_features(stft_ranges)
+            
+            return {
+                "db": accurate_db,
+                "active": active,
+                "threshold_db": threshold_db,
+                "stft": stft,
+                "execution": runner.execution_info()
+            }
+    
+    def _activity_gating(self) -> bool:
+        return self.activity_gating if self.activity_gating is not None else get_activity_gating()
+    
+    def _dsp_workers(self) -> int:
+        return self.dsp_workers if self.dsp_workers is not None else get_dsp_workers()
+    
+    def _use_chunked(self, duration: float) -> bool:
+        """チャンク並列DSPを使うか（ワーカーが2以上で、音声が十分に長い場合）"""
+        min_seconds = self.parallel_min_seconds
+        if min_seconds is None:
+            min_seconds = get_dsp_parallel_min_seconds()
+        return self._dsp_workers() > 1 and duration >= min_seconds
+    
+    def _frame_plan(self, analysis_profile: AnalysisProfile, sr: int) -> FramePlan:
+        return FramePlan(
+            sr=sr,
+            frame_length=analysis_profile.frame_length(sr),
+            hop_length=analysis_profile.hop_length(sr),
+            n_fft=analysis_profile.n_fft,
+            stft_hop=analysis_profile.stft_hop,
+            spectral=analysis_profile.has(FEATURE_SPECTRAL),
+            high_band_hz=HIGH_BAND_HZ
+        )
+    
+    def _rms_to_db(self, rms: np.ndarray) -> np.ndarray:
+        """RMSをdB値に変換"""
         # 正確なdB変換
         # 基準レベル（1.0）を0dBとして計算
         db = 20 * np.log10(np.maximum(rms, 1e-10))  # ゼロ除算を防ぐ
@@ -81,71 +269,101 @@ class ImprovedAudioAnalyzer:
         
         return db
     
-    def _find_excitement_points_accurate(self, db: np.ndarray, pitch_mean: np.ndarray, duration: float) -> List[Dict]:
+    def _analyze_stereo(self, y_channels: np.ndarray) -> Dict:
         """
-        正確なdB測定による盛り上がりポイント検出
+        ステレオ幅・左右バランス・チャンネル間相関を計算（モノラル音源の場合はチャンネル数のみ）
         """
-        excitement_points = []
+        if y_channels.ndim == 1 or y_channels.shape[0] < 2:
+            return {"channels": 1}
         
-        # 時間軸を計算
-        times = librosa.times_like(db, sr=self.sample_rate)
+        left = np.asarray(y_channels[0], dtype=np.float64)
+        right = np.asarray(y_channels[1], dtype=np.float64)
+        mid_rms = np.sqrt(np.mean(((left + right) / 2) ** 2))
+        side_rms = np.sqrt(np.mean(((left - right) / 2) ** 2))
+        left_rms = np.sqrt(np.mean(left ** 2))
+        right_rms = np.sqrt(np.mean(right ** 2))
+        denominator = np.sqrt(np.sum(left ** 2) * np.sum(right ** 2))
         
-        # 音量ベースの盛り上がりポイント検出
-        volume_threshold = np.mean(db) + 0.8 * np.std(db)
-        high_volume_indices = np.where(db > volume_threshold)[0]
+        return {
+            "channels": int(y_channels.shape[0]),
+            # サイド成分/ミッド成分のRMS比（0 = 完全なモノラル）
+            "stereo_width": float(side_rms / mid_rms) if mid_rms > 0 else 0.0,
+            # 左右バランス（-1 = 右のみ、+1 = 左のみ）
+            "balance": float((left_rms - right_rms) / (left_rms + right_rms)) if left_rms + right_rms > 0 else 0.0,
+            "correlation": float(np.sum(left * right) / denominator) if denominator > 0 else 1.0
+        }
+    
+    def _summarize_spectrum(self, features: Dict[str, np.ndarray]) -> Dict:
+        """フレームごとのスペクトル特徴量（スペクトル重心・ロールオフ・高域エネルギー比）を集計（逐次・チャンク並列で共通）"""
+        total_energy = float(np.sum(features["energy"]))
+        high_band_energy = float(np.sum(features["high_band_energy"]))
         
-        if len(high_volume_indices) > 0:
-            # 連続したポイントをグループ化
-            groups = []
-            current_group = [high_volume_indices[0]]
-            
-            for i in range(1, len(high_volume_indices)):
-                if high_volume_indices[i] - high_volume_indices[i-1] <= 5:  # 5フレーム以内
-                    current_group.append(high_volume_indices[i])
-                else:
-                    if len(current_group) >= 3:
-                        groups.append(current_group)
-                    current_group = [high_volume_indices[i]]
-            
-            if len(current_group) >= 3:
-                groups.append(current_group)
-            
-            # 各グループから盛り上がりポイントを抽出
-            for group in groups:
-                center_idx = group[len(group)//2]
-                center_time = times[center_idx]
-                intensity = min(1.0, len(group) / 10.0)
-                
-                excitement_points.append({
-                    "time": round(center_time, 2),
-                    "duration": round(times[group[-1]] - times[group[0]], 2),
-                    "intensity": round(intensity, 3),
-                    "type": "volume",
-                    "db_level": round(float(db[center_idx]), 2)
-                })
+        return {
+            "spectral_centroid_mean": float(np.mean(features["spectral_centroid"])) if len(features["spectral_centroid"]) else 0.0,
+            "spectral_rolloff_mean": float(np.mean(features["spectral_rolloff"])) if len(features["spectral_rolloff"]) else 0.0,
+            "high_band_energy_ratio": high_band_energy / total_energy if total_energy > 0 else 0.0,
+            "high_band_hz": HIGH_BAND_HZ
+        }
+    
+    def _find_excitement_points_accurate(self, db: np.ndarray, pitch_mean: np.ndarray, curve: Dict[str, np.ndarray],
+                                         hop_seconds: float, pitch_hop_seconds: float,
+                                         top_k: Optional[int] = None) -> List[Dict]:
+        """
+        正確なdB測定による盛り上がりポイント検出
+        
+        盛り上がりスコア（excitement_curve）から、最小間隔で抑制したピークをスコアの高い順に最大top_k件返す（rank: 1が最も強い）
+        """
+        if len(db) == 0:
+            return []
+        top_k = top_k or self._highlight_count()
+        score = curve["score"]
+        separation = max(1, int(round(self._highlight_separation() / hop_seconds)))
+        peaks = select_peaks(score, separation, top_k)
         
-        # 音調ベースの盛り上がりポイント検出
-        if len(pitch_mean) > 0:
-            pitch_threshold = np.mean(pitch_mean) + 0.6 * np.std(pitch_mean)
-            high_pitch_indices = np.where(pitch_mean > pitch_threshold)[0]
+        excitement_points = []
+        for rank, index in enumerate(peaks, start=1):
+            start, end = peak_extent(score, index, separation // 2)
+            evidence = {
+                "volume": float(curve["volume"][index]),
+                "pitch": float(curve["pitch"][index])
+            }
+            if curve["comments"] is not None:
+                evidence["comments"] = float(curve["comments"][index])
+            # 最も寄与の大きい要素を種類とする
+            contributions = {
+                "volume": VOLUME_WEIGHT * evidence["volume"],
+                "pitch": PITCH_WEIGHT * evidence["pitch"],
+                "comments": COMMENT_WEIGHT * evidence.get("comments", 0.0)
+            }
+            point_type = max(contributions, key=contributions.get)
             
-            if len(high_pitch_indices) > 0:
-                pitch_times = high_pitch_indices / len(pitch_mean) * duration
-                
-                # 音調の変化ポイントをサンプリング
-                for i in range(0, len(pitch_times), 30):  # 30フレームごと
-                    if i < len(pitch_times):
-                        excitement_points.append({
-                            "time": round(pitch_times[i], 2),
-                            "duration": 1.0,
-                            "intensity": 0.4,
-                            "type": "pitch",
-                            "pitch_value": round(float(pitch_mean[high_pitch_indices[i]]), 2)
-                        })
+            point = {
+                "time": round(float(index * hop_seconds), 2),
+                "duration": round(float((end - start) * hop_seconds), 2),
+                "intensity": round(float(min(1.0, score[index])), 3),
+                "type": point_type,
+                "rank": rank,
+                "db_level": round(float(db[index]), 2),
+                "evidence": {key: round(value, 3) for key, value in evidence.items()}
+            }
+            if point_type == "pitch" and len(pitch_mean):
+                pitch_index = min(len(pitch_mean) - 1, int(round(index * hop_seconds / pitch_hop_seconds)))
+                point["pitch_value"] = round(float(pitch_mean[pitch_index]), 2)
+            excitement_points.append(point)
         
-        # 時間順にソートして上位15個を返す
-        excitement_points.sort(key=lambda x: x["time"])
-        return excitement_points[:15]
+        return excitement_points
+    
+    def _highlight_count(self) -> int:
+        return self.highlight_count or get_highlight_count()
+    
+    def _highlight_separation(self) -> float:
+        return self.highlight_separation if self.highlight_separation is not None else get_highlight_separation()
+    
+    def _clip_seconds(self) -> Tuple[float, float]:
+        return self.clip_seconds or get_clip_seconds()
+    
+    def _clip_count(self) -> int:
+        return self.clip_count or get_clip_count()
     
     def _calculate_excitement_score_accurate(self, db: np.ndarray, pitch_mean: np.ndarray) -> float:
         """
@@ -167,304 +385,84 @@ class ImprovedAudioAnalyzer:
             (pitch_variance / 1000) * 25                      # 音調変動: 25点
         )
         
-        return min(100.0, max(0.0, score))
+        return float(min(100.0, max(0.0, score)))
 
-class YouTubeEngagementAnalyzer:
-    def __init__(self):
-        self.youtube_api_key = None  # YouTube Data API v3キー
-        
-    def set_api_key(self, api_key: str):
-        """YouTube Data API v3キーを設定（改善版）"""
-        # APIキーの検証を改善
-        if api_key and api_key.strip() and len(api_key) > 20:
-            self.youtube_api_key = api_key.strip()
-            print(f"YouTube APIキーが設定されました: {api_key[:10]}...")
-        else:
-            self.youtube_api_key = None
-            print(f"無効なAPIキーが提供されました: {api_key[:10] if api_key else 'None'}...")
-    
-    def extract_video_id(self, url: str) -> str:
-        """YouTube URLから動画IDを抽出"""
-        patterns = [
-            r'(?:youtube\.com\/watch\?v=|youtu\.be\/|youtube\.com\/embed\/)([^&\n?#]+)',
-            r'youtube\.com\/watch\?.*v=([^&\n?#]+)'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
-        return None
+def cached_audio_analysis(analyzer: ImprovedAudioAnalyzer, audio_file_path: str, profile: Optional[str] = None,
+                          highlight_count: Optional[int] = None,
+                          comment_timestamps: Optional[List[Dict]] = None) -> Tuple[Dict, bool]:
+    """
+    音声分析の結果を音声ハッシュ・プロファイル・デコード設定・コメント根拠をキーにキャッシュして返す
     
-    def get_video_engagement_data(self, video_id: str) -> Dict:
-        """
-        YouTube動画のエンゲージメントデータを取得（改善版）
-        """
-        if not self.youtube_api_key:
-            return {"error": "YouTube API key not set"}
-        
-        try:
-            print(f"動画ID {video_id} のエンゲージメントデータを取得中...")
-            
-            # 動画の基本情報を取得
-            video_url = f"https://www.googleapis.com/youtube/v3/videos"
-            params = {
-                'part': 'snippet,statistics,contentDetails',
-                'id': video_id,
-                'key': self.youtube_api_key
-            }
-            
-            response = requests.get(video_url, params=params)
-            print(f"動画情報API応答: {response.status_code}")
-            
-            if response.status_code != 200:
-                return {"error": f"YouTube API error: {response.status_code} - {response.text}"}
-            
-            video_data = response.json()
-            if not video_data.get('items'):
-                return {"error": "Video not found"}
-            
-            video_info = video_data['items'][0]
-            print(f"動画タイトル: {video_info['snippet']['title']}")
-            
-            # コメントを取得（複数ページ対応）
-            all_comments = []
-            next_page_token = None
-            max_pages = 3  # 最大3ページ（300件のコメント）
-            
-            for page in range(max_pages):
-                comments_url = f"https://www.googleapis.com/youtube/v3/commentThreads"
-                comment_params = {
-                    'part': 'snippet',
-                    'videoId': video_id,
-                    'maxResults': 100,
-                    'order': 'relevance',
-                    'key': self.youtube_api_key
-                }
-                
-                if next_page_token:
-                    comment_params['pageToken'] = next_page_token
-                
-                comments_response = requests.get(comments_url, params=comment_params)
-                print(f"コメント取得ページ {page + 1}: {comments_response.status_code}")
-                
-                if comments_response.status_code == 200:
-                    comments_data = comments_response.json()
-                    page_comments = comments_data.get('items', [])
-                    all_comments.extend(page_comments)
-                    
-                    # 次のページがあるかチェック
-                    next_page_token = comments_data.get('nextPageToken')
-                    if not next_page_token:
-                        break
-                else:
-                    print(f"コメント取得エラー: {comments_response.status_code}")
-                    break
-            
-            print(f"取得したコメント数: {len(all_comments)}")
-            
-            # 詳細なコメント分析
-            detailed_comments = self._analyze_comments_detailed(all_comments)
-            
-            return {
-                "video_info": {
-                    "title": video_info['snippet']['title'],
-                    "description": video_info['snippet'].get('description', ''),
-                    "duration": self._parse_duration(video_info['contentDetails']['duration']),
-                    "view_count": int(video_info['statistics'].get('viewCount', 0)),
-                    "like_count": int(video_info['statistics'].get('likeCount', 0)),
-                    "comment_count": int(video_info['statistics'].get('commentCount', 0)),
-                    "published_at": video_info['snippet'].get('publishedAt', ''),
-                    "channel_title": video_info['snippet'].get('channelTitle', '')
-                },
-                "engagement_analysis": {
-                    "engagement_rate": self._calculate_engagement_rate(video_info['statistics']),
-                    "comments": detailed_comments,
-                    "hot_timestamps": self._find_hot_timestamps(all_comments),
-                    "comment_sentiment": self._analyze_comment_sentiment(all_comments),
-                    "popular_keywords": self._extract_popular_keywords(all_comments)
-                },
-                "raw_comments": [comment['snippet']['topLevelComment']['snippet']['textDisplay'] 
-                               for comment in all_comments[:50]]  # 上位50件のコメントテキスト
-            }
-            
-        except Exception as e:
-            print(f"エンゲージメントデータ取得エラー: {str(e)}")
-            return {"error": f"Failed to get engagement data: {str(e)}"}
-    
-    def _parse_duration(self, duration_str: str) -> int:
-        """ISO 8601期間文字列を秒数に変換"""
-        import re
-        match = re.match(r'PT(\d+H)?(\d+M)?(\d+S)?', duration_str)
-        hours = int(match.group(1)[:-1]) if match.group(1) else 0
-        minutes = int(match.group(2)[:-1]) if match.group(2) else 0
-        seconds = int(match.group(3)[:-1]) if match.group(3) else 0
-        return hours * 3600 + minutes * 60 + seconds
-    
-    def _calculate_engagement_rate(self, statistics: Dict) -> float:
-        """エンゲージメント率を計算"""
-        view_count = int(statistics.get('viewCount', 1))
-        like_count = int(statistics.get('likeCount', 0))
-        comment_count = int(statistics.get('commentCount', 0))
-        
-        engagement_rate = ((like_count + comment_count) / view_count) * 100
-        return round(engagement_rate, 3)
-    
-    def _analyze_comments_detailed(self, comments: List[Dict]) -> Dict:
-        """詳細なコメント分析"""
-        if not comments:
-            return {"total_comments": 0, "average_length": 0, "comment_details": []}
-        
-        comment_details = []
-        total_length = 0
-        
-        for comment in comments:
-            comment_snippet = comment['snippet']['topLevelComment']['snippet']
-            text = comment_snippet['textDisplay']
-            like_count = comment_snippet.get('likeCount', 0)
-            
-            total_length += len(text)
-            
-            comment_details.append({
-                "text": text,
-                "like_count": like_count,
-                "length": len(text),
-                "author": comment_snippet.get('authorDisplayName', ''),
-                "published_at": comment_snippet.get('publishedAt', '')
-            })
-        
-        return {
-            "total_comments": len(comments),
-            "average_length": round(total_length / len(comments), 1),
-            "comment_details": comment_details,
-            "total_likes_on_comments": sum(c['like_count'] for c in comment_details)
-        }
-    
-    def _analyze_comments(self, comments: List[Dict]) -> Dict:
-        """コメント分析（後方互換性のため）"""
-        return self._analyze_comments_detailed(comments)
-    
-    def _find_hot_timestamps(self, comments: List[Dict]) -> List[Dict]:
-        """コメントからホットなタイムスタンプを抽出"""
-        timestamp_pattern = r'(\d{1,2}):(\d{2})(?::(\d{2}))?'
-        timestamps = []
-        
-        for comment in comments:
-            text = comment['snippet']['topLevelComment']['snippet']['textDisplay']
-            matches = re.findall(timestamp_pattern, text)
-            
-            for match in matches:
-                hours = int(match[0])
-                minutes = int(match[1])
-                seconds = int(match[2]) if match[2] else 0
-                
-                total_seconds = hours * 3600 + minutes * 60 + seconds
-                timestamps.append(total_seconds)
-        
-        # タイムスタンプの頻度をカウント
-        if timestamps:
-            from collections import Counter
-            timestamp_counts = Counter(timestamps)
-            
-            # 上位10個のホットタイムスタンプを返す
-            hot_timestamps = []
-            for timestamp, count in timestamp_counts.most_common(10):
-                hours = timestamp // 3600
-                minutes = (timestamp % 3600) // 60
-                seconds = timestamp % 60
-                
-                hot_timestamps.append({
-                    "time": timestamp,
-                    "formatted_time": f"{hours:02d}:{minutes:02d}:{seconds:02d}",
-                    "mention_count": count,
-                    "intensity": min(1.0, count / max(timestamp_counts.values()))
-                })
-            
-            return hot_timestamps
-        
-        return []
-    
-    def _analyze_comment_sentiment(self, comments: List[Dict]) -> Dict:
-        """コメントの感情分析（簡易版）"""
-        if not comments:
-            return {"positive": 0, "negative": 0, "neutral": 0}
-        
-        positive_words = ['いい', '良い', '素晴らしい', '最高', '面白い', '感動', '笑', '愛', '好き', '楽しい']
-        negative_words = ['悪い', 'つまらない', '嫌い', '最悪', 'ひどい', '退屈', 'つらい', '悲しい']
-        
-        positive_count = 0
-        negative_count = 0
-        neutral_count = 0
-        
-        for comment in comments:
-            text = comment['snippet']['topLevelComment']['snippet']['textDisplay'].lower()
-            
-            positive_matches = sum(1 for word in positive_words if word in text)
-            negative_matches = sum(1 for word in negative_words if word in text)
-            
-            if positive_matches > negative_matches:
-                positive_count += 1
-            elif negative_matches > positive_matches:
-                negative_count += 1
-            else:
-                neutral_count += 1
-        
-        total = len(comments)
-        return {
-            "positive": positive_count,
-            "negative": negative_count,
-            "neutral": neutral_count,
-            "positive_rate": round((positive_count / total) * 100, 1) if total > 0 else 0,
-            "negative_rate": round((negative_count / total) * 100, 1) if total > 0 else 0
-        }
+    Returns:
+        (分析結果, キャッシュから取得したか)
+    """
+    with span("audio.input_hash"):
+        audio_hash = audio_input_hash(audio_file_path)
+    profile_name = get_profile(profile or analyzer.profile).name
+    comment_timestamps = comment_timestamps or []
+    return pillar_cache.get_or_compute(
+        "audio_analysis",
+        pillar_cache.key(audio_hash, profile_name, analyzer.audio_backend, analyzer.resample_quality,
+                         highlight_count, [(t.get("time"), t.get("mention_count")) for t in comment_timestamps]),
+        lambda: analyzer.analyze_audio_accurate(audio_file_path, profile=profile, highlight_count=highlight_count,
+                                                comment_timestamps=comment_timestamps),
+        cacheable=lambda result: audio_hash is not None and 'error' not in result
+    )
+
+def cached_clip_candidates(analyzer: ImprovedAudioAnalyzer, audio_file_path: str,
+                           comment_timestamps: Optional[List[Dict]] = None) -> Tuple[List[Dict], bool]:
+    """
+    音量エンベロープとコメントによるクリップ候補を音声ハッシュ・コメント根拠をキーにキャッシュして返す
     
-    def _extract_popular_keywords(self, comments: List[Dict]) -> List[Dict]:
-        """人気キーワードの抽出"""
-        if not comments:
-            return []
-        
-        import re
-        all_text = ' '.join([comment['snippet']['topLevelComment']['snippet']['textDisplay'] 
-                           for comment in comments])
-        
-        words = re.findall(r'[\u3040-\u309F\u30A0-\u30FF\u4E00-\u9FAF]+', all_text)
-        word_counts = {}
-        
-        for word in words:
-            if len(word) > 1:  # 1文字の単語は除外
-                word_counts[word] = word_counts.get(word, 0) + 1
-        
-        # 上位10個のキーワードを返す
-        popular_keywords = sorted(word_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-        
-        return [{"word": word, "count": count} for word, count in popular_keywords]
+    Returns:
+        (クリップ候補, キャッシュから取得したか)
+    """
+    with span("audio.input_hash"):
+        audio_hash = audio_input_hash(audio_file_path)
+    comment_timestamps = comment_timestamps or []
+    return pillar_cache.get_or_compute(
+        "clip_candidates",
+        pillar_cache.key(audio_hash, analyzer.audio_backend,
+                         [(t.get("time"), t.get("mention_count")) for t in comment_timestamps]),
+        lambda: analyzer.clip_candidates_from_envelope(audio_file_path, comment_timestamps=comment_timestamps),
+        cacheable=lambda result: audio_hash is not None
+    )
 
 class ComprehensiveAnalyzer:
     def __init__(self):
         self.audio_analyzer = ImprovedAudioAnalyzer()
         self.engagement_analyzer = YouTubeEngagementAnalyzer()
     
-    def analyze_video_comprehensive(self, video_url: str, audio_file_path: str, api_key: str = None) -> Dict:
+    def analyze_video_comprehensive(self, video_url: str, audio_file_path: str, api_key: str = None,
+                                    profile: Optional[str] = None, highlight_count: Optional[int] = None) -> Dict:
         """
         包括的な動画分析（音声 + エンゲージメント）
-        """
-        # 音声分析
-        audio_analysis = self.audio_analyzer.analyze_audio_accurate(audio_file_path)
         
+        エンゲージメントを先に取得し、コメントで言及されたタイムスタンプを盛り上がり検出の根拠に加える
+        """
         # エンゲージメント分析
         if api_key:
-            self.engagement_analyzer.set_api_key(api_key)
-            video_id = self.engagement_analyzer.extract_video_id(video_url)
-            engagement_analysis = self.engagement_analyzer.get_video_engagement_data(video_id)
+            # 同時実行されるリクエスト間でAPIキーを共有しないよう、呼び出しごとの分析器を使う
+            engagement_analyzer = YouTubeEngagementAnalyzer()
+            engagement_analyzer.set_api_key(api_key)
+            video_id = engagement_analyzer.extract_video_id(video_url)
+            engagement_analysis = engagement_analyzer.get_video_engagement_data(video_id)
         else:
             engagement_analysis = {"error": "YouTube API key not provided"}
+        hot_timestamps = engagement_analysis.get("engagement_analysis", {}).get("hot_timestamps") or []
+        
+        # 音声分析（同じ音声・プロファイル・コメント根拠の結果があればキャッシュから取得）
+        audio_analysis, audio_from_cache = cached_audio_analysis(
+            self.audio_analyzer, audio_file_path, profile=profile,
+            highlight_count=highlight_count, comment_timestamps=hot_timestamps)
         
         # 結果を統合
         return {
             "audio_analysis": audio_analysis,
             "engagement_analysis": engagement_analysis,
             "comprehensive_score": self._calculate_comprehensive_score(audio_analysis, engagement_analysis),
-            "analysis_timestamp": datetime.now().isoformat()
+            "analysis_timestamp": datetime.now().isoformat(),
+            "cache": {"audio_analysis_from_cache": audio_from_cache}
         }
     
     def _calculate_comprehensive_score(self, audio_analysis: Dict, engagement_analysis: Dict) -> float:
@@ -0,0 +1,48 @@
+"""
+重い依存関係の遅延読み込み
+
+分析器のモジュール（librosa / scipy / matplotlib / numpy を読み込む）は、
+そのエンドポイントが初めて使われた時点で読み込む。エンゲージメント・ユーザー属性のみを扱う
+プロセスはDSPスタックを読み込まずに起動できる。
+"""
+import importlib
+import threading
+from typing import Any
+
+
+class LazyInstance:
+    """
+    初回の属性アクセス時にモジュールを読み込み、インスタンスを作成するプロキシ（スレッドセーフ）
+
+    Example:
+        visualizer = LazyInstance("visualization", "AudioVisualizer")
+        visualizer.build_chart_data(...)  # ここで初めて visualization（matplotlib）を読み込む
+    """
+
+    def __init__(self, module_name: str, class_name: str, *args, **kwargs):
+        self._module_name = module_name
+        self._class_name = class_name
+        self._args = args
+        self._kwargs = kwargs
+        self._lock = threading.Lock()
+        self._instance = None
+
+    def lazy_load(self) -> Any:
+        """モジュールを読み込んでインスタンスを返す（ウォームアップでの事前読み込みにも使う）"""
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    module = importlib.import_module(self._module_name)
+                    self._instance = getattr(module, self._class_name)(*self._args, **self._kwargs)
+        return self._instance
+
+    @property
+    def loaded(self) -> bool:
+        return self._instance is not None
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.lazy_load(), name)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<LazyInstance {self._module_name}.{self._class_name} ({state})>"
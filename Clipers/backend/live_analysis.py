@@ -0,0 +1,486 @@
+"""
+ライブ配信のリアルタイム盛り上がり検出
+
+配信の終了（アーカイブの公開）を待たずに、ffmpegのパイプから読んだ音声を一定長のブロックごとに処理し、
+盛り上がりイベントを一定の遅延以内に通知する。分析プロファイル・dB変換・盛り上がりの最小間隔は
+ImprovedAudioAnalyzer の設定をそのまま使う。
+
+- dB・音調のフレームはブロックをまたいで連続する（端数のサンプルだけを次のブロックに持ち越す）
+- 有音判定のノイズフロア（下位パーセンタイル）は指数減衰するヒストグラム、zスコアの平均・標準偏差は
+  有音フレームの指数加重平均・分散で求める（半減期 CLIPERS_LIVE_HALF_LIFE_SECONDS）。
+  いずれも固定長のため、配信が何時間続いてもメモリ使用量は一定
+- スコアは highlights と同じ重みで統合し、過去方向の移動平均で平滑化する
+- 閾値を超えたピークは、それより高いスコアが CLIPERS_LIVE_LATENCY_SECONDS 秒現れなければ確定して通知し、
+  以降は最小間隔の間は新しいピークを抑制する（オンラインの非最大値抑制）
+
+入力はライブ配信のURL（yt-dlpで配信URLを解決）、書き込み中のローカルファイル（ffmpegの -follow）、
+または標準入力（`python live_analysis.py -`）。
+"""
+import math
+import os
+import subprocess
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+import librosa
+import numpy as np
+
+from analysis_profiles import get_profile
+from config import (get_live_max_sessions, get_live_latency_seconds, get_live_event_threshold,
+                    get_live_half_life_seconds, get_live_idle_seconds)
+from highlights import Z_CLIP, SMOOTHING_SECONDS, COMPONENT_WEIGHTS, fuse_scores
+from voice_activity import FLOOR_PERCENTILE, MARGIN_DB, MIN_THRESHOLD_DB, MAX_THRESHOLD_DB
+from metrics import registry
+from logging_setup import get_logger, YtDlpLogger
+
+# 1回に処理するブロックの長さ（秒）
+BLOCK_SECONDS = 0.25
+# 統計が安定するまで（有音フレームの加重がこの秒数に達するまで）イベントを出さない
+WARMUP_SECONDS = 10.0
+# 統計イベントの間隔（秒）
+STATS_INTERVAL_SECONDS = 5.0
+# ノイズフロアを求めるdBヒストグラムのビン幅（dB）
+DB_BIN_WIDTH = 0.5
+# セッションごとに保持する直近のイベント数
+RECENT_EVENTS = 20
+
+LIVE_SESSIONS_ACTIVE = registry.gauge("clipers_live_sessions_active", "Live analysis sessions currently running")
+LIVE_EVENTS = registry.counter("clipers_live_events_total", "Events emitted by live analysis sessions", ["event"])
+
+logger = get_logger("live")
+
+
+class LiveSessionLimit(RuntimeError):
+    """同時セッション数の上限に達した場合の例外"""
+
+
+class RollingStats:
+    """
+    指数減衰する加重平均・分散と、（lo/hiを指定した場合は）固定ビンのヒストグラムによるローリング統計
+
+    古い値の重みは半減期ごとに半分になる。保持するのは合計値とビンの配列のみ（固定メモリ）。
+    """
+
+    def __init__(self, half_life_frames: float, lo: Optional[float] = None, hi: Optional[float] = None,
+                 bin_width: float = 1.0):
+        self.decay_per_frame = 0.5 ** (1.0 / half_life_frames)
+        self.weight = 0.0
+        self._sum = 0.0
+        self._sum_squares = 0.0
+        self.lo, self.bin_width = lo, bin_width
+        self._bins = np.zeros(int(math.ceil((hi - lo) / bin_width)) + 1) if lo is not None else None
+
+    def add(self, values: np.ndarray, elapsed_frames: int):
+        """elapsed_frames分だけ既存の重みを減衰させてから値を加える"""
+        decay = self.decay_per_frame ** elapsed_frames
+        self.weight *= decay
+        self._sum *= decay
+        self._sum_squares *= decay
+        if self._bins is not None:
+            self._bins *= decay
+        if len(values) == 0:
+            return
+        values = np.asarray(values, dtype=np.float64)
+        self.weight += len(values)
+        self._sum += float(np.sum(values))
+        self._sum_squares += float(np.sum(values ** 2))
+        if self._bins is not None:
+            index = np.clip(((values - self.lo) / self.bin_width).astype(int), 0, len(self._bins) - 1)
+            self._bins += np.bincount(index, minlength=len(self._bins))
+
+    @property
+    def mean(self) -> float:
+        return self._sum / self.weight if self.weight else 0.0
+
+    @property
+    def std(self) -> float:
+        if not self.weight:
+            return 0.0
+        return math.sqrt(max(0.0, self._sum_squares / self.weight - self.mean ** 2))
+
+    def percentile(self, q: float) -> Optional[float]:
+        """ヒストグラムのパーセンタイル（ビンの中央値、値がない場合はNone）"""
+        if self._bins is None or not self.weight:
+            return None
+        cumulative = np.cumsum(self._bins)
+        index = int(np.searchsorted(cumulative, cumulative[-1] * q / 100.0))
+        return self.lo + (index + 0.5) * self.bin_width
+
+    def normalized_z(self, values: np.ndarray) -> np.ndarray:
+        """highlights.normalized_z と同じ0〜1のzスコア（ローリングの平均・標準偏差による）"""
+        std = self.std
+        if std == 0:
+            return np.zeros(len(values))
+        return np.clip((values - self.mean) / std, 0.0, Z_CLIP) / Z_CLIP
+
+
+class LiveExcitementDetector:
+    """
+    音声ブロックを順に受け取り、盛り上がりイベントを返す（状態はすべて固定長）
+
+    Args:
+        analyzer: ImprovedAudioAnalyzer（プロファイル・dB変換・盛り上がりの最小間隔を使う）
+        profile: 分析プロファイル名（Noneの場合はanalyzerの既定値）
+    """
+
+    def __init__(self, analyzer, profile: Optional[str] = None, latency_seconds: Optional[float] = None,
+                 threshold: Optional[float] = None, half_life_seconds: Optional[float] = None,
+                 warmup_seconds: float = WARMUP_SECONDS):
+        self.analyzer = analyzer
+        self.profile = get_profile(profile or analyzer.profile)
+        self.sr = self.profile.sample_rate
+        self.frame_length = self.profile.frame_length(self.sr)
+        self.hop_length = self.profile.hop_length(self.sr)
+        self.n_fft = self.profile.n_fft
+        self.stft_hop = self.profile.stft_hop
+        self.hop_seconds = self.hop_length / self.sr
+        self.latency_seconds = get_live_latency_seconds() if latency_seconds is None else latency_seconds
+        self.threshold = get_live_event_threshold() if threshold is None else threshold
+        self.separation_seconds = analyzer._highlight_separation()
+        self.warmup_frames = warmup_seconds / self.hop_seconds
+
+        half_life_frames = (half_life_seconds or get_live_half_life_seconds()) / self.hop_seconds
+        # ノイズフロア用（全フレーム）、音量・音調のzスコア用（有音フレームのみ）
+        self.level_stats = RollingStats(half_life_frames, analyzer.min_db, analyzer.max_db, DB_BIN_WIDTH)
+        self.volume_stats = RollingStats(half_life_frames)
+        self.pitch_stats = RollingStats(half_life_frames)
+        self.activity_ratio = RollingStats(half_life_frames)
+
+        # 未処理のサンプル（buffer[0]の絶対サンプル位置）と次のフレームの開始位置
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._buffer_start = 0
+        self._next_rms = 0
+        self._next_stft = 0
+        # 平滑化（過去方向の移動平均）のために持ち越す直前のフレーム
+        self._smoothing_width = max(1, int(round(SMOOTHING_SECONDS / self.hop_seconds)))
+        self._tails = {"volume": np.zeros(0), "pitch": np.zeros(0)}
+        # 音調をdBフレームの時刻に補間するための直前の音調フレーム（時刻, zスコア）
+        self._last_pitch: Tuple[float, float] = (0.0, 0.0)
+        self._pending: Optional[Dict] = None
+        self._last_event_time = -math.inf
+        self._last_stats_time = 0.0
+        self.frames = 0
+        self.events = 0
+
+    @property
+    def stream_seconds(self) -> float:
+        return self.frames * self.hop_seconds
+
+    def activity_threshold(self) -> float:
+        """voice_activity.activity_mask と同じ規則の有音閾値（ローリングのノイズフロア + マージン）"""
+        floor = self.level_stats.percentile(FLOOR_PERCENTILE)
+        if floor is None:
+            return MIN_THRESHOLD_DB
+        return float(np.clip(floor + MARGIN_DB, MIN_THRESHOLD_DB, MAX_THRESHOLD_DB))
+
+    def _frames(self, next_start: int, frame_length: int, hop_length: int) -> Tuple[np.ndarray, int]:
+        """バッファ内で完結するフレームの区間を切り出す（区間, フレーム数）"""
+        end = self._buffer_start + len(self._buffer)
+        count = max(0, (end - next_start - frame_length) // hop_length + 1)
+        begin = next_start - self._buffer_start
+        return self._buffer[begin:begin + (count - 1) * hop_length + frame_length] if count else None, count
+
+    def _causal_mean(self, name: str, values: np.ndarray) -> np.ndarray:
+        """直前のフレームを含めた過去方向の移動平均"""
+        padded = np.concatenate((self._tails[name], values))
+        self._tails[name] = padded[-(self._smoothing_width - 1):] if self._smoothing_width > 1 else np.zeros(0)
+        cumulative = np.concatenate(([0.0], np.cumsum(padded)))
+        hi = np.arange(len(padded) - len(values), len(padded)) + 1
+        lo = np.maximum(hi - self._smoothing_width, 0)
+        return (cumulative[hi] - cumulative[lo]) / (hi - lo)
+
+    def feed(self, samples: np.ndarray) -> List[Dict]:
+        """モノラルの音声（sample_rate）を追加し、確定したイベントを返す"""
+        self._buffer = np.concatenate((self._buffer, np.asarray(samples, dtype=np.float32)))
+
+        segment, n_rms = self._frames(self._next_rms, self.frame_length, self.hop_length)
+        if not n_rms:
+            return []
+        rms = librosa.feature.rms(y=segment, frame_length=self.frame_length,
+                                  hop_length=self.hop_length, center=False)[0]
+        db_times = (self._next_rms + self.frame_length / 2 + np.arange(n_rms) * self.hop_length) / self.sr
+        self._next_rms += n_rms * self.hop_length
+
+        segment, n_stft = self._frames(self._next_stft, self.n_fft, self.stft_hop)
+        if n_stft:
+            spectrum = np.abs(librosa.stft(segment, n_fft=self.n_fft, hop_length=self.stft_hop, center=False))
+            pitches, _ = librosa.piptrack(S=spectrum, sr=self.sr)
+            pitch = np.mean(pitches, axis=0)
+            pitch_times = (self._next_stft + self.n_fft / 2 + np.arange(n_stft) * self.stft_hop) / self.sr
+            self._next_stft += n_stft * self.stft_hop
+        else:
+            pitch, pitch_times = np.zeros(0), np.zeros(0)
+
+        # 次のフレームに必要なサンプルだけを残す
+        keep_from = min(self._next_rms, self._next_stft) - self._buffer_start
+        self._buffer = self._buffer[keep_from:]
+        self._buffer_start += keep_from
+
+        db = self.analyzer._rms_to_db(rms)
+        active = db > self.activity_threshold()
+        pitch_active = np.interp(pitch_times, db_times, active.astype(float)) > 0.5 if n_stft else np.zeros(0, bool)
+
+        self.level_stats.add(db, n_rms)
+        self.activity_ratio.add(active.astype(float), n_rms)
+        self.volume_stats.add(db[active], n_rms)
+        self.pitch_stats.add(pitch[pitch_active], n_rms)
+
+        volume = self._causal_mean("volume", self.volume_stats.normalized_z(db))
+        pitch_z = np.where(pitch_active, self.pitch_stats.normalized_z(pitch), 0.0)
+        times = np.concatenate(([self._last_pitch[0]], pitch_times))
+        values = np.concatenate(([self._last_pitch[1]], pitch_z))
+        if n_stft:
+            self._last_pitch = (float(pitch_times[-1]), float(pitch_z[-1]))
+        pitch_frames = self._causal_mean("pitch", np.interp(db_times, times, values))
+        score = fuse_scores(volume, pitch_frames)
+
+        self.frames += n_rms
+        return self._track_peaks(db_times, db, score, volume, pitch_frames)
+
+    def _track_peaks(self, times: np.ndarray, db: np.ndarray, score: np.ndarray,
+                     volume: np.ndarray, pitch: np.ndarray) -> List[Dict]:
+        events = []
+        warmed_up = self.volume_stats.weight >= self.warmup_frames
+        for index in range(len(times)):
+            now = float(times[index])
+            if self._pending is not None and now - self._pending["time"] >= self.latency_seconds:
+                events.append(self._emit(now))
+            if (warmed_up and score[index] >= self.threshold
+                    and now - self._last_event_time >= self.separation_seconds
+                    and (self._pending is None or score[index] > self._pending["score"])):
+                self._pending = {
+                    "time": now,
+                    "score": float(score[index]),
+                    "db_level": float(db[index]),
+                    "evidence": {"volume": float(volume[index]), "pitch": float(pitch[index])}
+                }
+        now = float(times[-1])
+        if now - self._last_stats_time >= STATS_INTERVAL_SECONDS:
+            self._last_stats_time = now
+            events.append(self.stats())
+        return events
+
+    def _emit(self, now: float) -> Dict:
+        pending, self._pending = self._pending, None
+        self._last_event_time = pending["time"]
+        self.events += 1
+        evidence = pending["evidence"]
+        return {
+            "event": "excitement",
+            "time": round(pending["time"], 2),
+            "intensity": round(min(1.0, pending["score"]), 3),
+            "type": max(evidence, key=lambda name: COMPONENT_WEIGHTS[name] * evidence[name]),
+            "db_level": round(pending["db_level"], 2),
+            "evidence": {name: round(value, 3) for name, value in evidence.items()},
+            # ピークから確定までのストリーム上の遅延（秒）
+            "latency": round(now - pending["time"], 2)
+        }
+
+    def flush(self) -> List[Dict]:
+        """入力の終了時に、確定待ちのピークを通知する"""
+        return [self._emit(self.stream_seconds)] if self._pending is not None else []
+
+    def stats(self) -> Dict:
+        """ローリング統計"""
+        return {
+            "event": "stats",
+            "time": round(self.stream_seconds, 2),
+            "threshold_db": round(self.activity_threshold(), 2),
+            "volume_mean_db": round(self.volume_stats.mean, 2),
+            "volume_std_db": round(self.volume_stats.std, 2),
+            "pitch_mean": round(self.pitch_stats.mean, 2),
+            "speech_ratio": round(self.activity_ratio.mean, 3),
+            "warmed_up": self.volume_stats.weight >= self.warmup_frames,
+            "events": self.events
+        }
+
+
+def resolve_input(source: str) -> Tuple[str, bool]:
+    """
+    ffmpegの入力を決定する
+
+    Returns:
+        (ffmpegの入力, 書き込み中のファイルとして末尾を追従するか)
+
+    Raises:
+        LocalMediaNotAllowed / FileNotFoundError: ローカルパスが許可されていない・存在しない場合
+    """
+    if source == "-":
+        return "pipe:0", False
+    if source.startswith(("http://", "https://")):
+        # ライブ配信は配信URL（HLSマニフェスト等）を解決する（映像は読まないため最小の映像付きフォーマットでよい）
+        try:
+            import yt_dlp  # type: ignore
+            with yt_dlp.YoutubeDL({'quiet': True, 'noprogress': True, 'logger': YtDlpLogger(),
+                                   'format': 'bestaudio/worst[acodec!=none]'}) as ydl:
+                info = ydl.extract_info(source, download=False)
+            return info.get("url") or source, False
+        except Exception as e:
+            logger.warning("配信URLを解決できません（URLをそのまま使用します）", extra={"error": str(e)})
+            return source, False
+    from media_ingest import resolve_local_path
+    return resolve_local_path(source), True
+
+
+def ffmpeg_pcm_command(input_source: str, sample_rate: int, follow: bool = False, realtime: bool = False,
+                       idle_seconds: Optional[float] = None) -> List[str]:
+    """入力をモノラルのfloat32 PCMとして標準出力に書き出すffmpegコマンド（映像は読み飛ばす）"""
+    command = ["ffmpeg", "-hide_banner", "-loglevel", "error"]
+    if input_source != "pipe:0":
+        command += ["-nostdin", "-rw_timeout", str(int((idle_seconds or get_live_idle_seconds()) * 1e6))]
+    if follow:
+        command += ["-follow", "1"]
+    if realtime:
+        command += ["-re"]
+    return command + ["-i", input_source, "-vn", "-sn", "-dn", "-ac", "1", "-ar", str(sample_rate),
+                      "-f", "f32le", "pipe:1"]
+
+
+class LiveSession:
+    """1つの入力に対するffmpegのパイプと検出器"""
+
+    def __init__(self, session_id: str, source: str, detector: LiveExcitementDetector,
+                 input_source: str, follow: bool, realtime: bool = False):
+        self.session_id = session_id
+        self.source = source
+        self.detector = detector
+        self.command = ffmpeg_pcm_command(input_source, detector.sr, follow=follow, realtime=realtime)
+        self.recent_events = deque(maxlen=RECENT_EVENTS)
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self._process: Optional[subprocess.Popen] = None
+        self._stopped = threading.Event()
+
+    def run(self, emit: Callable[[Dict], None], stdin=None):
+        """ffmpegの出力をブロックごとに検出器に渡し、イベントをemitで通知する（ブロッキング）"""
+        block_bytes = int(BLOCK_SECONDS * self.detector.sr) * 4
+        self._process = subprocess.Popen(self.command, stdin=stdin, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        try:
+            while not self._stopped.is_set():
+                data = self._process.stdout.read(block_bytes)
+                if not data:
+                    break
+                samples = np.frombuffer(data[:len(data) - len(data) % 4], dtype=np.float32)
+                for event in self.detector.feed(samples):
+                    self._publish(event, emit)
+            for event in self.detector.flush():
+                self._publish(event, emit)
+        finally:
+            self._process.stdout.close()
+            returncode = self._process.wait()
+            stderr = self._process.stderr.read().decode("utf-8", "replace").strip()
+            self._process.stderr.close()
+            # 追従中のファイルが途絶えた場合（rw_timeout）は正常終了として扱う
+            if returncode and not self._stopped.is_set() and not self.detector.frames:
+                self.error = stderr[-500:] or f"ffmpeg exited with {returncode}"
+            self.finished_at = time.time()
+            end = {"event": "end", "time": round(self.detector.stream_seconds, 2),
+                   "events": self.detector.events, "error": self.error}
+            self._publish(end, emit)
+
+    def _publish(self, event: Dict, emit: Callable[[Dict], None]):
+        LIVE_EVENTS.inc(event=event["event"])
+        if event["event"] == "excitement":
+            self.recent_events.append(event)
+        emit(event)
+
+    def stop(self):
+        """ffmpegを終了させて run を抜ける"""
+        self._stopped.set()
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+
+    def to_dict(self) -> Dict:
+        return {
+            "session_id": self.session_id,
+            "source": self.source,
+            "profile": self.detector.profile.name,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "stream_seconds": round(self.detector.stream_seconds, 2),
+            "stats": self.detector.stats(),
+            "recent_events": list(self.recent_events),
+            "error": self.error
+        }
+
+
+class LiveSessionRegistry:
+    """実行中のライブ分析セッション（同時実行数の上限つき）"""
+
+    def __init__(self, max_sessions: Optional[int] = None):
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, LiveSession] = {}
+
+    def start(self, analyzer, source: str, profile: Optional[str] = None, realtime: bool = False) -> LiveSession:
+        """
+        セッションを作成（ffmpegは run で起動する）
+
+        Raises:
+            LiveSessionLimit: 同時セッション数の上限に達している場合
+        """
+        with self._lock:
+            if len(self._sessions) >= (self.max_sessions or get_live_max_sessions()):
+                raise LiveSessionLimit("ライブ分析の同時セッション数の上限に達しています")
+            session_id = uuid.uuid4().hex[:12]
+            # 入力の解決中に上限を超えないよう先に枠を確保する
+            self._sessions[session_id] = None
+        try:
+            input_source, follow = resolve_input(source)
+            session = LiveSession(session_id, source, LiveExcitementDetector(analyzer, profile),
+                                  input_source, follow, realtime)
+        except Exception:
+            with self._lock:
+                self._sessions.pop(session_id, None)
+            raise
+        with self._lock:
+            self._sessions[session_id] = session
+        LIVE_SESSIONS_ACTIVE.inc()
+        logger.info("ライブ分析を開始しました", extra={"session_id": session_id, "profile": session.detector.profile.name})
+        return session
+
+    def finish(self, session: LiveSession):
+        session.stop()
+        with self._lock:
+            removed = self._sessions.pop(session.session_id, None)
+        if removed is not None:
+            LIVE_SESSIONS_ACTIVE.dec()
+            logger.info("ライブ分析を終了しました", extra={
+                "session_id": session.session_id, "stream_seconds": round(session.detector.stream_seconds, 2),
+                "events": session.detector.events})
+
+    def list(self) -> List[LiveSession]:
+        with self._lock:
+            return [session for session in self._sessions.values() if session is not None]
+
+
+live_sessions = LiveSessionRegistry()
+
+
+if __name__ == "__main__":
+    # 例: ffmpeg -i stream.flv -f wav - | python live_analysis.py -
+    import argparse
+    import json
+    import sys
+
+    from improved_audio_analyzer import ImprovedAudioAnalyzer
+
+    parser = argparse.ArgumentParser(description="ライブ音声の盛り上がりイベントをJSON Linesで出力")
+    parser.add_argument("source", help="ライブ配信のURL・書き込み中のファイル・'-'（標準入力）")
+    parser.add_argument("--profile", default=None)
+    parser.add_argument("--realtime", action="store_true", help="入力を実時間の速度で読む（ファイルで配信を再現する場合）")
+    args = parser.parse_args()
+
+    if args.source == "-" or args.source.startswith(("http://", "https://")):
+        input_source, follow = resolve_input(args.source)
+    else:
+        # コマンドラインではローカルファイルの場所を制限しない
+        input_source, follow = os.path.abspath(args.source), True
+    session = LiveSession("cli", args.source, LiveExcitementDetector(ImprovedAudioAnalyzer(), args.profile),
+                          input_source, follow, args.realtime)
+    session.run(lambda event: print(json.dumps(event, ensure_ascii=False), flush=True),
+                stdin=sys.stdin.buffer if input_source == "pipe:0" else None)
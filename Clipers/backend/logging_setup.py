@@ -0,0 +1,145 @@
+"""
+構造化ログ（非同期・レベル制御・リクエストID相関）
+
+ログ出力はQueueHandlerでキューに積むだけにし、実際のコンソールI/Oは
+QueueListenerの専用スレッドで行うため、リクエスト処理をブロックしない。
+各レコードには現在のリクエストIDが付与される。
+
+環境変数:
+    CLIPERS_LOG_LEVEL        ログレベル（既定: INFO）
+    CLIPERS_LOG_FORMAT       json / text（既定: json）
+    CLIPERS_YTDLP_LOG_LEVEL  yt-dlpから転送するレベル（既定: WARNING）
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+LOGGER_NAMESPACE = "clipers"
+
+request_id_var: contextvars.ContextVar[str] = contextvars.ContextVar("clipers_request_id", default="-")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+# ログのextraとして渡された値のうち、JSONに含めないLogRecordの標準属性
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+
+class RequestIdFilter(logging.Filter):
+    """呼び出し元コンテキストのリクエストIDをレコードに付与"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """1行1JSONのフォーマッタ（extraで渡したフィールドも出力）"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None) -> logging.Logger:
+    """
+    clipers名前空間のロガーを非同期ハンドラで構成（複数回呼んでも1回だけ構成）
+    """
+    global _listener
+    logger = logging.getLogger(LOGGER_NAMESPACE)
+    if _listener is not None:
+        return logger
+
+    level = (level or os.getenv("CLIPERS_LOG_LEVEL", "INFO")).upper()
+    fmt = (fmt or os.getenv("CLIPERS_LOG_FORMAT", "json")).lower()
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    if fmt == "text":
+        stream_handler.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+    else:
+        stream_handler.setFormatter(JsonFormatter())
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+
+    logger.handlers = [queue_handler]
+    logger.setLevel(level)
+    logger.propagate = False
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return logger
+
+
+def shutdown_logging():
+    """キューに残ったログを書き出してリスナーを停止"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """clipers名前空間の子ロガーを取得"""
+    return logging.getLogger(f"{LOGGER_NAMESPACE}.{name}")
+
+
+def new_request_id(incoming: Optional[str] = None) -> str:
+    """リクエストIDを設定（受信ヘッダの値があればそれを使用）"""
+    request_id = incoming or uuid.uuid4().hex[:16]
+    request_id_var.set(request_id)
+    return request_id
+
+
+class YtDlpLogger:
+    """
+    yt-dlpのloggerオプション用アダプタ
+
+    yt-dlpはdebug/info/warning/errorを呼び出す。既定では警告とエラーのみ転送し、
+    進捗表示やデバッグ出力は捨てる。
+    """
+
+    def __init__(self, level: Optional[str] = None):
+        self.logger = get_logger("yt_dlp")
+        self.level = logging.getLevelName((level or os.getenv("CLIPERS_YTDLP_LOG_LEVEL", "WARNING")).upper())
+
+    def debug(self, msg: str):
+        # yt-dlpはinfoレベルのメッセージもdebug()で渡す（debugは"[debug] "で始まる）
+        if msg.startswith("[debug] "):
+            self._log(logging.DEBUG, msg)
+        else:
+            self.info(msg)
+
+    def info(self, msg: str):
+        self._log(logging.INFO, msg)
+
+    def warning(self, msg: str):
+        self._log(logging.WARNING, msg)
+
+    def error(self, msg: str):
+        self._log(logging.ERROR, msg)
+
+    def _log(self, level: int, msg: str):
+        if level >= self.level:
+            self.logger.log(level, msg)
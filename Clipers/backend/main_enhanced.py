@@ -1,26 +1,51 @@
 import os
 import sys
+import time
+
+# モジュール読み込み時間の計測開始（clipers_startup_seconds{phase="import"}）
+_import_started = time.perf_counter()
 
 # 現在のディレクトリをPythonパスに追加
 current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.insert(0, current_dir)
 
-from fastapi import FastAPI, HTTPException, Body # type: ignore
+from fastapi import FastAPI, HTTPException, Body, Request, Response, UploadFile, File, Form # type: ignore
 from fastapi.middleware.cors import CORSMiddleware # type: ignore
-from pydantic import BaseModel # type: ignore
-import yt_dlp # type: ignore
+from pydantic import BaseModel, PrivateAttr # type: ignore
 import tempfile
-from typing import Optional, List
+import shutil
+from typing import Optional, List, Literal
 import json
-from improved_audio_analyzer import ImprovedAudioAnalyzer, YouTubeEngagementAnalyzer, ComprehensiveAnalyzer
-from visualization import AudioVisualizer
-from video_evaluation_framework import VideoEvaluationFramework
-from gemini_analyzer import GeminiAnalyzer # GeminiAnalyzerをインポート
+from youtube_engagement import YouTubeEngagementAnalyzer
+from lazy import LazyInstance
 from datetime import datetime
 import re
-from config import get_youtube_api_key, get_gemini_api_key
+from config import get_youtube_api_key, get_gemini_api_key, get_admin_token, get_warmup_enabled
 from user_attribute_analyzer import UserAttributeAnalyzer
+from analysis_profiles import PROFILES, get_profile
+from fastapi.responses import PlainTextResponse, FileResponse, StreamingResponse, JSONResponse # type: ignore
+from fastapi.encoders import jsonable_encoder # type: ignore
+from result_store import result_store
+from singleflight import singleflight
+from admission import (admission, AdmissionRejected, client_address_var, client_id_for, api_key_digest,
+                       DOWNLOAD, DSP, LLM)
+import asyncio
+import sqlite3
+import threading
+from metrics import registry as metrics_registry
+from tracing import span, start_trace, current_trace, REQUEST_DURATION
+from logging_setup import configure_logging, get_logger, new_request_id
+import functools
+import hmac
+from download_planner import DownloadPlan, plan_downloads, build_ydl_options, AUDIO_PARTIAL
+from warmup import warm_up, record_startup_phase
+from download_jobs import download_jobs
+from media_ingest import (ingest_file, save_upload, check_upload_length, resolve_local_path, MediaIngestError,
+                          UploadTooLarge, UploadLengthRequired, LocalMediaNotAllowed)
+
+configure_logging()
+logger = get_logger("api")
 
 app = FastAPI(title="YouTube盛り上がり分析ツール (Enhanced)", version="2.1.0-gemini")
 
@@ -33,6 +58,54 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def guard_uploads(request: Request, call_next):
+    """
+    /analyze-upload の本体はフォームの解析時に全体が一時ファイルへ書き出されるため、
+    解析前にレート制限とContent-Lengthによる最大サイズを確認し、拒否するリクエストの本体は読み込まない
+    （trace_requestsの内側で実行するため先に登録する）
+    """
+    if request.method == "POST" and request.url.path == "/analyze-upload":
+        try:
+            admission.check_rate(DSP, client_id_for())
+            check_upload_length(request.headers.get("content-length"))
+        except AdmissionRejected as e:
+            rejected = too_many_requests(e)
+            return JSONResponse({"detail": rejected.detail}, status_code=429, headers=rejected.headers)
+        except UploadLengthRequired as e:
+            return JSONResponse({"detail": str(e)}, status_code=411)
+        except UploadTooLarge as e:
+            return JSONResponse({"detail": str(e)}, status_code=413)
+    return await call_next(request)
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """リクエストごとにリクエストIDとトレースを開始し、所要時間をメトリクスとログに記録"""
+    request_id = new_request_id(request.headers.get("x-request-id"))
+    client_address_var.set(request.client.host if request.client else "unknown")
+    start_trace()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["X-Request-ID"] = request_id
+        return response
+    finally:
+        logger.info("request", extra={
+            "method": request.method,
+            "path": request.url.path,
+            "status": status,
+            "duration_ms": round((time.perf_counter() - started) * 1000, 1)
+        })
+        route = request.scope.get("route")
+        REQUEST_DURATION.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status)
+        )
+
 class VideoRequest(BaseModel):
     url: str
 
@@ -42,12 +115,38 @@ class VideoInfo(BaseModel):
     description: Optional[str]
     view_count: Optional[int]
     like_count: Optional[int]
+    channel: Optional[str] = None
+
+# リクエストで指定できる盛り上がりポイントの最大件数
+MAX_HIGHLIGHT_COUNT = 100
 
 class AudioAnalysisRequest(BaseModel):
     url: str
     download_audio: bool = True
     youtube_api_key: Optional[str] = None
     gemini_api_key: Optional[str] = None # Gemini APIキーを追加
+    include_transcript: Optional[bool] = None # 字幕の要否（未指定時はエンドポイントの既定値）
+    max_audio_seconds: Optional[float] = None # 指定時は先頭から指定秒数のみ音声を取得
+    visualization: Literal["none", "data", "png"] = "png" # 視覚化の形式（なし / クライアント描画用データ / PNG）
+    include_timings: bool = False # Trueの場合はステージごとの計測結果(timings)をレスポンスに含める
+    analysis_profile: Optional[str] = None # 音声分析プロファイル（speech-fast / default / music-hq、未指定時は設定値）
+    highlight_count: Optional[int] = None # 盛り上がりポイントの最大件数（1〜MAX_HIGHLIGHT_COUNT、未指定時は設定値）
+    allow_video_fallback: bool = False # Trueの場合は音声のみのストリームがない動画で映像を含むフォーマットを取得する
+
+class ClipSegmentSpec(BaseModel):
+    start: float # 開始位置（秒）
+    end: float   # 終了位置（秒）
+
+class ClipExportRequest(AudioAnalysisRequest):
+    segments: List[ClipSegmentSpec] # 切り出す区間（clip_candidatesのstart/endをそのまま指定可）
+
+class LocalAnalysisRequest(AudioAnalysisRequest):
+    url: str = ""
+    path: Optional[str] = None # 分析するローカルファイル（CLIPERS_LOCAL_MEDIA_ROOTS配下）
+    pipeline: Literal["audio", "framework"] = "audio" # audio: 音声分析 / framework: 統合フレームワーク評価
+    # /analyze-upload で作業領域に書き出したファイル（クライアントからは指定できない）
+    _upload_path: Optional[str] = PrivateAttr(default=None)
+    _upload_name: Optional[str] = PrivateAttr(default=None)
 
 class AudioAnalysisResponse(BaseModel):
     video_info: VideoInfo
@@ -57,12 +156,24 @@ class AudioAnalysisResponse(BaseModel):
     sample_rate: Optional[int]
     debug_info: dict
 
-# 分析器のインスタンスを作成
-improved_analyzer = ImprovedAudioAnalyzer()
+# 分析器のインスタンスを作成（DSP・描画系はlibrosa / matplotlib等を読み込むため初回使用時に作成）
+improved_analyzer = LazyInstance("improved_audio_analyzer", "ImprovedAudioAnalyzer")
 engagement_analyzer = YouTubeEngagementAnalyzer()
-comprehensive_analyzer = ComprehensiveAnalyzer()
-visualizer = AudioVisualizer()
-evaluation_framework = VideoEvaluationFramework()
+comprehensive_analyzer = LazyInstance("improved_audio_analyzer", "ComprehensiveAnalyzer")
+visualizer = LazyInstance("visualization", "AudioVisualizer")
+evaluation_framework = LazyInstance("video_evaluation_framework", "VideoEvaluationFramework")
+
+record_startup_phase("import", time.perf_counter() - _import_started)
+
+@app.on_event("startup")
+async def warm_up_worker():
+    """CLIPERS_WARMUP=1の場合、リクエストを受け付ける前に合成音声で分析経路をウォームアップする"""
+    if get_warmup_enabled():
+        # ウォームアップするワーカーは遅延読み込みの分析器も事前に読み込んでおく
+        for instance in (improved_analyzer, comprehensive_analyzer, visualizer, evaluation_framework):
+            await asyncio.to_thread(instance.lazy_load)
+        timings = await asyncio.to_thread(warm_up)
+        logger.info("ウォームアップ完了", extra={"steps": {step: round(seconds, 3) for step, seconds in timings.items()}})
 
 def parse_vtt(file_path: str) -> str:
     """VTTファイルからテキストのみを抽出する"""
@@ -75,235 +186,411 @@ def parse_vtt(file_path: str) -> str:
     text_lines = [line.strip() for line in lines if not re.match(r'^\d{2}:\d{2}:\d{2}\.\d{3} --> \d{2}:\d{2}:\d{2}\.\d{3}', line) and 'WEBVTT' not in line and line.strip() != '']
     return ' '.join(text_lines)
 
+def validate_analysis_options(request: AudioAnalysisRequest):
+    """不明な分析プロファイル・範囲外のhighlight_countをダウンロード（アップロードの書き出し）前に弾く"""
+    try:
+        get_profile(request.analysis_profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if request.highlight_count is not None and not 1 <= request.highlight_count <= MAX_HIGHLIGHT_COUNT:
+        raise HTTPException(status_code=400, detail=f"highlight_countは1〜{MAX_HIGHLIGHT_COUNT}で指定してください")
+
+def with_timings(endpoint):
+    """include_timingsが指定された場合、ステージごとの計測結果をレスポンスに付与するデコレータ"""
+    @functools.wraps(endpoint)
+    async def wrapper(request: AudioAnalysisRequest):
+        validate_analysis_options(request)
+        result = await endpoint(request)
+        trace = current_trace()
+        if request.include_timings and trace is not None:
+            if isinstance(result, dict):
+                result["timings"] = trace.to_dict()
+            elif isinstance(result, AudioAnalysisResponse):
+                result.debug_info["timings"] = trace.to_dict()
+        return result
+    return wrapper
+
+def engagement_analyzer_for(api_key: Optional[str]) -> YouTubeEngagementAnalyzer:
+    """リクエストのAPIキーを設定したエンゲージメント分析器（共有インスタンスのキーを書き換えない）"""
+    analyzer = YouTubeEngagementAnalyzer()
+    analyzer.set_api_key(api_key)
+    return analyzer
+
+def coalescing_key(analysis_type: str, request: AudioAnalysisRequest) -> str:
+    """同じ計算になるリクエストを識別するキー（動画ID・分析種別・結果に影響するオプション）"""
+    video_id = engagement_analyzer.extract_video_id(request.url) or request.url
+    options = request.model_dump(exclude={"url", "youtube_api_key", "gemini_api_key", "include_timings"})
+    # APIキーそのものではなくハッシュで区別する（別のキーのリクエストは合流させない）
+    options["youtube_api_key"] = api_key_digest(request.youtube_api_key)
+    options["gemini_api_key"] = api_key_digest(request.gemini_api_key)
+    return json.dumps([video_id, analysis_type, options], sort_keys=True, default=str)
+
+def too_many_requests(e: AdmissionRejected) -> HTTPException:
+    """アドミッション制御の拒否を429 + Retry-Afterに変換"""
+    return HTTPException(
+        status_code=429,
+        detail={"error": "too_many_requests", "endpoint_class": e.endpoint_class, "reason": e.reason},
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+def check_rate_limit(endpoint_class: str, request: AudioAnalysisRequest):
+    """クライアント（APIキー、なければIPアドレス）ごとのトークンバケットを消費（超過時は429）"""
+    try:
+        admission.check_rate(endpoint_class, client_id_for(request.youtube_api_key or request.gemini_api_key))
+    except AdmissionRejected as e:
+        raise too_many_requests(e)
+
+def rate_limited(endpoint_class: str):
+    """クライアント（APIキー、なければIPアドレス）ごとのトークンバケットを適用するデコレータ"""
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(request: AudioAnalysisRequest):
+            check_rate_limit(endpoint_class, request)
+            return await endpoint(request)
+        return wrapper
+    return decorator
+
+def coalesced(analysis_type: str):
+    """同じ動画・分析種別・オプションの同時リクエストを1つの計算に合流させるデコレータ"""
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(request: AudioAnalysisRequest):
+            result, shared = await singleflight.do(
+                analysis_type,
+                coalescing_key(analysis_type, request),
+                lambda: endpoint(request)
+            )
+            if shared:
+                if isinstance(result, dict):
+                    result["coalesced"] = True
+                elif isinstance(result, AudioAnalysisResponse):
+                    result.debug_info["coalesced"] = True
+            return result
+        return wrapper
+    return decorator
+
+def admitted(endpoint_class: str):
+    """
+    処理クラスの実行枠を確保してから計算を始めるデコレータ
+    
+    coalescedの内側に置くため、枠を使うのは合流のリーダー（実際に計算するリクエスト）のみ。
+    """
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(request: AudioAnalysisRequest):
+            try:
+                admitted_at = await admission.acquire(endpoint_class)
+            except AdmissionRejected as e:
+                raise too_many_requests(e)
+            try:
+                return await endpoint(request)
+            finally:
+                admission.release(endpoint_class, admitted_at)
+        return wrapper
+    return decorator
+
+def offloaded(endpoint):
+    """計算（ダウンロード・DSP・外部API呼び出し）をワーカースレッドで実行し、イベントループを塞がないデコレータ"""
+    @functools.wraps(endpoint)
+    async def wrapper(request: AudioAnalysisRequest):
+        return await asyncio.to_thread(asyncio.run, endpoint(request))
+    return wrapper
+
+def stores_result(analysis_type: str):
+    """エンドポイントの結果を結果ストアに保存し、result_idを付与するデコレータ"""
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(request: AudioAnalysisRequest):
+            result = await endpoint(request)
+            video_id = engagement_analyzer.extract_video_id(request.url)
+            if isinstance(result, dict) and video_id:
+                video_info = result.get("video_info")
+                try:
+                    with span("result_store.save"):
+                        result["result_id"] = result_store.save(
+                            video_id,
+                            analysis_type,
+                            jsonable_encoder(result),
+                            channel=getattr(video_info, "channel", None),
+                            title=getattr(video_info, "title", None),
+                            options=request.model_dump(exclude={"url", "youtube_api_key", "gemini_api_key"})
+                        )
+                except sqlite3.Error as e:
+                    # 保存に失敗しても分析結果は返す
+                    logger.warning("分析結果の保存に失敗しました", extra={"video_id": video_id, "error": str(e)})
+            return result
+        return wrapper
+    return decorator
+
+def register_timeline(url: str, audio_file_path: Optional[str], excitement_points: Optional[List[dict]] = None,
+                      partial: bool = False):
+    """
+    タイムラインAPI用に動画IDと音声（エンベロープピラミッド）の対応を記録
+    
+    partial: max_audio_seconds による先頭のみの音声か（/export-clips が再利用できる範囲の判定に使う）
+    """
+    video_id = engagement_analyzer.extract_video_id(url)
+    if video_id and audio_file_path:
+        from envelope_pyramid import pyramid_registry
+        pyramid_registry.register(video_id, audio_file_path, excitement_points, partial=partial)
+
+def is_partial_audio(response: AudioAnalysisResponse) -> bool:
+    """取得計画が先頭のみの音声（AUDIO_PARTIAL）だったか"""
+    return response.debug_info.get('plan', {}).get('audio') == AUDIO_PARTIAL
+
+def video_metadata_for(video_info: VideoInfo, video: Optional[dict] = None) -> dict:
+    """
+    フレームワーク評価用の動画メタデータ
+
+    映像の仕様（video["stream"]）が取得できた場合は実際の値、取得できない場合は縦型動画の推定値を使う。
+    キーフレームの特徴量（video["visual"]）は visual として渡す。
+    """
+    from visual_features import aspect_ratio
+    stream = (video or {}).get("stream")
+    metadata = {
+        "title": video_info.title,
+        "description": video_info.description or "",
+        "duration": video_info.duration,
+        "resolution": "1080x1920",  # 推定値
+        "aspect_ratio": "9:16",     # 推定値
+        "bitrate": 8000,            # 推定値
+        "framerate": 30,            # 推定値
+        "metadata_source": "estimated"
+    }
+    if stream:
+        metadata.update({
+            "resolution": f"{stream['width']}x{stream['height']}",
+            "aspect_ratio": aspect_ratio(stream['width'], stream['height']),
+            "metadata_source": "stream"
+        })
+        if stream.get("bitrate_kbps"):
+            metadata["bitrate"] = stream["bitrate_kbps"]
+        if stream.get("fps"):
+            metadata["framerate"] = round(stream["fps"], 3)
+    if (video or {}).get("visual"):
+        metadata["visual"] = video["visual"]
+    return metadata
+
+def build_visualization(mode: str, audio_file_path: str, audio_analysis: dict) -> Optional[dict]:
+    """リクエストの visualization 指定に応じて視覚化ブロックを生成"""
+    if mode == "none" or 'error' in audio_analysis:
+        return None
+    if mode == "data":
+        return {"format": "data", "chart_data": visualizer.build_chart_data(audio_file_path, audio_analysis)}
+    
+    # チャートは描画仕様だけを登録し、PNGは /charts/{id}.png で初回取得時に描画
+    excitement_points = audio_analysis.get('excitement_points', [])
+    timeline_chart_id = visualizer.register_timeline_chart(audio_file_path, excitement_points)
+    summary_chart_id = visualizer.register_summary_chart(audio_analysis)
+    return {
+        "format": "png",
+        "timeline_image_url": f"/charts/{timeline_chart_id}.png",
+        "summary_image_url": f"/charts/{summary_chart_id}.png"
+    }
+
 @app.get("/")
 async def root():
     return {"message": "YouTube盛り上がり分析ツール API (Enhanced v2.1.0-gemini)"}
 
-@app.post("/download-audio-enhanced", response_model=AudioAnalysisResponse)
-async def download_audio_enhanced(request: AudioAnalysisRequest):
+def _find_subtitle_file(info: dict) -> Optional[str]:
+    """yt-dlpが書き出した字幕ファイル(.vtt)のパスを取得"""
+    for subtitle in (info.get('requested_subtitles') or {}).values():
+        filepath = subtitle.get('filepath')
+        if filepath and os.path.exists(filepath):
+            return filepath
+    return None
+
+def _convert_to_wav(audio_file_path: str) -> str:
+    """WAV以外の音声をWAVに変換（失敗した場合は元のファイルを返す）"""
+    try:
+        import subprocess
+        wav_file_path = f"{os.path.splitext(audio_file_path)[0]}.wav"
+        logger.debug("音声ファイルをWAVに変換中", extra={"source": os.path.basename(audio_file_path)})
+        
+        # FFmpegで変換
+        with span("ffmpeg.convert"):
+            result = subprocess.run([
+                'ffmpeg', '-i', audio_file_path, 
+                '-acodec', 'pcm_s16le', 
+                '-ac', '2', 
+                wav_file_path, '-y'
+            ], capture_output=True, text=True)
+        
+        if result.returncode == 0 and os.path.exists(wav_file_path):
+            logger.debug("WAV変換成功")
+            return wav_file_path
+        logger.warning("WAV変換失敗", extra={"stderr": result.stderr[-500:]})
+    except Exception as conv_error:
+        logger.warning("WAV変換エラー", extra={"error": str(conv_error)})
+    # 変換に失敗しても元のファイルを使用
+    return audio_file_path
+
+def _downloaded_audio_path(info: dict, job, debug_info: dict) -> Optional[str]:
     """
-    改善版：YouTube動画から音声をダウンロードする
+    ダウンロードした音声ファイルのパス（フックが記録した後処理後のパス、なければinfoのrequested_downloads）
+    """
+    candidates = [job.output_path] + [
+        download.get('filepath') for download in reversed(info.get('requested_downloads') or [])
+    ]
+    audio_file_path = next((path for path in candidates if path and os.path.exists(path)), None)
+    debug_info['downloaded_files'] = [
+        {'name': os.path.basename(path), 'bytes': size} for path, size in job.files.items()
+    ]
+    if audio_file_path is None:
+        debug_info['error'] = "音声ファイルが見つかりません"
+        logger.warning("音声ファイルが見つかりません（メタデータのみで分析を続行します）")
+        return None
+    
+    # 後処理（FFmpegExtractAudio）でWAVにならなかった場合は変換を試みる
+    if not audio_file_path.lower().endswith('.wav'):
+        audio_file_path = _convert_to_wav(audio_file_path)
+    
+    debug_info['audio_file_path'] = audio_file_path
+    logger.info("音声ファイルを取得しました", extra={"audio_file": os.path.basename(audio_file_path)})
+    return audio_file_path
+
+async def fetch_media(request: AudioAnalysisRequest, plan: DownloadPlan) -> AudioAnalysisResponse:
     """
-    debug_info = {}
+    取得計画に従い、必要なアーティファクトだけをYouTubeから取得する
+    
+    動画情報の取得とダウンロードは1回の extract_info(download=True) で行い、
+    出力パスとバイト数はyt-dlpのフック（ダウンロードジョブ）から取得する
+    """
+    debug_info = {'plan': plan.to_dict()}
+    job = download_jobs.create(request.url, plan.endpoint, engagement_analyzer.extract_video_id(request.url))
+    debug_info['job_id'] = job.job_id
     
     try:
         # 一時ディレクトリを作成
         temp_dir = tempfile.mkdtemp()
         debug_info['temp_dir'] = temp_dir
-        print(f"一時ディレクトリ作成: {temp_dir}")
         
-        # 最適化されたyt-dlpの設定（字幕取得機能付き）
-        ydl_opts = {
-            'format': 'bestaudio[ext=m4a]/bestaudio[ext=mp3]/bestaudio[ext=webm]/bestaudio/best',
-            'outtmpl': os.path.join(temp_dir, '%(title)s.%(ext)s'),
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'wav',
-                'preferredquality': '192',
-            }],
-            'quiet': False,
-            'no_warnings': False,
-            # 403エラー回避のための設定
-            'nocheckcertificate': True,
-            'ignoreerrors': False,
-            'no_color': True,
-            'extractor_retries': 3,
-            'fragment_retries': 3,
-            'skip_unavailable_fragments': True,
-            'http_headers': {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            },
-            # 音声抽出の改善設定
-            'extractaudio': True,
-            'audioformat': 'wav',
-            'audioquality': '192K',
-            'writesubtitles': True,
-            'writeautomaticsub': True,
-            'subtitleslangs': ['ja', 'en', 'en-US'], # 日本語と英語の字幕を優先
-            'writethumbnail': False,
-            'writeinfojson': False,
-            'writedescription': False,
-            'writeannotations': False,
-            'writestats': False,
-            'writecomments': False,
-            'getcomments': False,
-            # 追加の音声抽出設定
-            'prefer_ffmpeg': True,
-            'keepvideo': False,
-            'audio_only': True,
-            # より具体的な音声フォーマット指定
-            'format_sort': ['ext:m4a', 'ext:mp3', 'ext:webm', 'ext:ogg'],
-            'format_sort_force': True
-        }
+        ydl_opts = build_ydl_options(plan, temp_dir)
+        debug_info['ydl_opts'] = {k: v for k, v in ydl_opts.items() if k not in ('download_ranges', 'logger')}
+        ydl_opts['progress_hooks'] = [job.on_progress]
+        ydl_opts['postprocessor_hooks'] = [job.on_postprocess]
         
-        debug_info['ydl_opts'] = ydl_opts
+        audio_file_path = None
+        transcript_file_path = None
         
+        import yt_dlp # type: ignore
         with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            # 動画情報を取得
-            print("動画情報を取得中...")
-            info = ydl.extract_info(request.url, download=False)
+            logger.debug("動画情報を取得中", extra={"audio": plan.audio, "subtitles": plan.subtitles})
+            try:
+                with span("ytdlp.download" if plan.needs_download else "ytdlp.extract_info") as download_span:
+                    info = ydl.extract_info(request.url, download=plan.needs_download)
+                    download_span.add_bytes(job.bytes_downloaded)
+                if plan.needs_download:
+                    logger.info("ダウンロード完了", extra={"bytes": download_span.bytes, "job_id": job.job_id})
+            except yt_dlp.utils.DownloadError as download_error:
+                if not plan.needs_download:
+                    raise
+                # ダウンロードに失敗してもメタデータは利用可能（動画情報のみ取得し直す）
+                debug_info['download_error'] = str(download_error)
+                logger.warning("ダウンロードエラー（メタデータのみで分析を続行します）", extra={"error": str(download_error)})
+                with span("ytdlp.extract_info"):
+                    info = ydl.extract_info(request.url, download=False)
+            
+            if plan.needs_audio and 'download_error' not in debug_info:
+                job.record_format(info)
+                debug_info['format'] = job.format
+                debug_info['reference_bytes'] = job.reference_bytes
             
             debug_info['video_info'] = {
                 'title': info.get('title'),
                 'duration': info.get('duration'),
             }
+            # 音声のみを取得した場合も、元の動画の映像の仕様はフォーマット一覧から分かる
+            from visual_features import stream_from_info
+            debug_info['video_stream'] = stream_from_info(info)
             
-            # 音声をダウンロード
-            if request.download_audio:
-                print("音声ダウンロード開始...")
-                try:
-                    ydl.download([request.url])
-                    print("ダウンロード完了")
-                except Exception as download_error:
-                    debug_info['download_error'] = str(download_error)
-                    print(f"ダウンロードエラー: {download_error}")
-                    # ダウンロードエラーが発生してもメタデータは利用可能
-                    print("メタデータのみで分析を続行します")
-                
-                # ダウンロードされたファイルを探す
-                print(f"ダウンロード後のファイル一覧: {os.listdir(temp_dir)}")
-                all_files = os.listdir(temp_dir)
-                debug_info['all_files'] = all_files
-                
-                # 各ファイルの詳細情報を記録
-                file_details = []
-                for file in all_files:
-                    file_path = os.path.join(temp_dir, file)
-                    file_size = os.path.getsize(file_path) if os.path.exists(file_path) else 0
-                    file_details.append({
-                        'name': file,
-                        'size': file_size,
-                        'extension': os.path.splitext(file)[1].lower()
-                    })
-                debug_info['file_details'] = file_details
-                
-                # 音声ファイルを探す（複数のフォーマットをサポート）
-                audio_extensions = ['.wav', '.mp3', '.m4a', '.webm', '.ogg', '.flac', '.aac', '.opus']
-                audio_files = []
-                
-                for file in all_files:
-                    file_lower = file.lower()
-                    if any(file_lower.endswith(ext) for ext in audio_extensions):
-                        audio_files.append(file)
-                
-                debug_info['audio_files_found'] = audio_files
-                
-                if audio_files:
-                    # 最初に見つかった音声ファイルを使用
-                    audio_file = audio_files[0]
-                    audio_file_path = os.path.join(temp_dir, audio_file)
-                    
-                    # WAVファイルでない場合は変換を試みる
-                    if not audio_file.lower().endswith('.wav'):
-                        try:
-                            import subprocess
-                            wav_file_path = os.path.join(temp_dir, f"{os.path.splitext(audio_file)[0]}.wav")
-                            print(f"音声ファイルをWAVに変換中: {audio_file} -> {os.path.basename(wav_file_path)}")
-                            
-                            # FFmpegで変換
-                            result = subprocess.run([
-                                'ffmpeg', '-i', audio_file_path, 
-                                '-acodec', 'pcm_s16le', 
-                                '-ar', '44100', 
-                                '-ac', '2', 
-                                wav_file_path, '-y'
-                            ], capture_output=True, text=True, cwd=temp_dir)
-                            
-                            if result.returncode == 0 and os.path.exists(wav_file_path):
-                                audio_file_path = wav_file_path
-                                print(f"変換成功: {wav_file_path}")
-                            else:
-                                print(f"変換失敗: {result.stderr}")
-                        except Exception as conv_error:
-                            print(f"変換エラー: {conv_error}")
-                            # 変換に失敗しても元のファイルを使用
-                    
-                    debug_info['audio_file_path'] = audio_file_path
-                    print(f"音声ファイルが見つかりました: {audio_file_path}")
-                else:
-                    audio_file_path = None
-                    debug_info['error'] = "音声ファイルが見つかりません"
-                    print("音声ファイルが見つかりませんでした")
-                    
-                    # 代替手段として、yt-dlpの直接的な音声抽出を試みる
-                    print("代替手段として直接的な音声抽出を試みます...")
-                    try:
-                        # 音声専用の設定で再試行
-                        fallback_opts = {
-                            'format': 'bestaudio',
-                            'outtmpl': os.path.join(temp_dir, 'audio_only.%(ext)s'),
-                            'extractaudio': True,
-                            'audioformat': 'wav',
-                            'audioquality': '192K',
-                            'quiet': False,
-                            'no_warnings': False,
-                            'nocheckcertificate': True,
-                            'http_headers': {
-                                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-                            }
-                        }
-                        
-                        with yt_dlp.YoutubeDL(fallback_opts) as ydl_fallback:
-                            ydl_fallback.download([request.url])
-                        
-                        # 再試行後のファイルを確認
-                        fallback_files = os.listdir(temp_dir)
-                        debug_info['fallback_files'] = fallback_files
-                        
-                        # 音声ファイルを再検索
-                        fallback_audio_files = [f for f in fallback_files if any(f.lower().endswith(ext) for ext in ['.wav', '.mp3', '.m4a', '.webm', '.ogg', '.flac', '.aac', '.opus'])]
-                        
-                        if fallback_audio_files:
-                            audio_file_path = os.path.join(temp_dir, fallback_audio_files[0])
-                            debug_info['fallback_audio_file'] = audio_file_path
-                            print(f"代替手段で音声ファイルを取得しました: {audio_file_path}")
-                        else:
-                            print("代替手段でも音声ファイルの取得に失敗しました")
-                            
-                    except Exception as fallback_error:
-                        debug_info['fallback_error'] = str(fallback_error)
-                        print(f"代替手段エラー: {fallback_error}")
-                    
-                    # 最終手段として、メタデータのみで分析を続行
-                    print("メタデータのみで分析を続行します")
-            else:
-                audio_file_path = None
+            if plan.needs_audio and 'download_error' not in debug_info:
+                audio_file_path = _downloaded_audio_path(info, job, debug_info)
             
             # 字幕ファイルを探す (.vtt)
-            subtitle_file = next((f for f in all_files if f.endswith('.vtt')), None)
-            transcript_file_path = os.path.join(temp_dir, subtitle_file) if subtitle_file else None
+            if plan.subtitles:
+                transcript_file_path = _find_subtitle_file(info)
             
+            # 実際に取得した音声のサンプルレート（WAV変換はソースのレートを維持）
+            sample_rate = None
+            if audio_file_path:
+                try:
+                    from audio_io import audio_info
+                    channels, sample_rate = audio_info(audio_file_path)
+                    debug_info['audio_channels'] = channels
+                except Exception as probe_error:
+                    debug_info['audio_probe_error'] = str(probe_error)
+            
+            job.finish(debug_info.get('download_error'))
+            debug_info['downloaded_bytes'] = job.bytes_downloaded
             return AudioAnalysisResponse(
                 video_info=VideoInfo(
                     title=info.get('title', ''),
                     duration=info.get('duration'),
                     description=info.get('description', ''),
                     view_count=info.get('view_count'),
-                    like_count=info.get('like_count')
+                    like_count=info.get('like_count'),
+                    channel=info.get('channel') or info.get('uploader')
                 ),
                 audio_file_path=audio_file_path,
                 transcript_file_path=transcript_file_path,
-                audio_duration=info.get('duration'),
-                sample_rate=44100, # yt-dlpのデフォルトに合わせる
+                audio_duration=plan.audio_seconds if plan.audio == AUDIO_PARTIAL else info.get('duration'),
+                sample_rate=sample_rate,
                 debug_info=debug_info
             )
             
     except Exception as e:
         debug_info['error'] = str(e)
+        job.finish(str(e))
         raise HTTPException(status_code=400, detail=f"音声ダウンロードに失敗しました: {str(e)}")
 
+def plan_for(endpoint: str, request: AudioAnalysisRequest) -> DownloadPlan:
+    """リクエストフラグからエンドポイントの取得計画を作成"""
+    return plan_downloads(
+        endpoint,
+        download_audio=request.download_audio,
+        include_transcript=request.include_transcript,
+        max_audio_seconds=request.max_audio_seconds,
+        min_audio_kbps=get_profile(request.analysis_profile).min_audio_kbps,
+        allow_video=request.allow_video_fallback
+    )
+
+@app.post("/download-audio-enhanced", response_model=AudioAnalysisResponse)
+@with_timings
+@rate_limited(DOWNLOAD)
+@coalesced("download-audio-enhanced")
+@admitted(DOWNLOAD)
+@offloaded
+async def download_audio_enhanced(request: AudioAnalysisRequest):
+    """
+    改善版：YouTube動画から音声をダウンロードする
+    """
+    response = await fetch_media(request, plan_for("download-audio-enhanced", request))
+    # 取得した音声はタイムライン・クリップ書き出しで再利用する
+    register_timeline(request.url, response.audio_file_path, partial=is_partial_audio(response))
+    return response
+
 @app.post("/analyze-audio-accurate")
+@with_timings
+@rate_limited(DSP)
+@coalesced("analyze-audio-accurate")
+@admitted(DSP)
+@offloaded
 async def analyze_audio_accurate(request: AudioAnalysisRequest):
     """
     正確なdB測定による音声分析
     """
     try:
         # まず音声をダウンロード
-        audio_response = await download_audio_enhanced(request)
+        audio_response = await fetch_media(request, plan_for("analyze-audio-accurate", request))
         
         if audio_response.audio_file_path:
             # 正確な音声分析を実行
-            analysis_result = improved_analyzer.analyze_audio_accurate(audio_response.audio_file_path)
+            analysis_result = improved_analyzer.analyze_audio_accurate(
+                audio_response.audio_file_path, profile=request.analysis_profile,
+                highlight_count=request.highlight_count)
+            register_timeline(request.url, audio_response.audio_file_path, analysis_result.get('excitement_points'),
+                              partial=is_partial_audio(audio_response))
             
             return {
                 "video_info": audio_response.video_info,
@@ -312,7 +599,7 @@ async def analyze_audio_accurate(request: AudioAnalysisRequest):
             }
         else:
             # 音声ファイルがダウンロードできない場合、メタデータのみで結果を返す
-            print("音声ファイルがダウンロードできませんでした。メタデータのみで結果を返します。")
+            logger.warning("音声ファイルがダウンロードできませんでした。メタデータのみで結果を返します")
             
             return {
                 "video_info": audio_response.video_info,
@@ -335,6 +622,11 @@ async def analyze_audio_accurate(request: AudioAnalysisRequest):
         raise HTTPException(status_code=400, detail=f"音声分析に失敗しました: {str(e)}")
 
 @app.post("/analyze-engagement")
+@with_timings
+@rate_limited(DOWNLOAD)
+@coalesced("analyze-engagement")
+@admitted(DOWNLOAD)
+@offloaded
 async def analyze_engagement(request: AudioAnalysisRequest):
     """
     YouTube動画のエンゲージメント分析
@@ -343,16 +635,13 @@ async def analyze_engagement(request: AudioAnalysisRequest):
         if not request.youtube_api_key:
             raise HTTPException(status_code=400, detail="YouTube API keyが必要です")
         
-        # APIキーを設定
-        engagement_analyzer.set_api_key(request.youtube_api_key)
-        
         # 動画IDを抽出
         video_id = engagement_analyzer.extract_video_id(request.url)
         if not video_id:
             raise HTTPException(status_code=400, detail="有効なYouTube URLではありません")
         
         # エンゲージメント分析を実行
-        engagement_result = engagement_analyzer.get_video_engagement_data(video_id)
+        engagement_result = engagement_analyzer_for(request.youtube_api_key).get_video_engagement_data(video_id)
         
         return {
             "video_url": request.url,
@@ -364,51 +653,51 @@ async def analyze_engagement(request: AudioAnalysisRequest):
         raise HTTPException(status_code=400, detail=f"エンゲージメント分析に失敗しました: {str(e)}")
 
 @app.post("/analyze-comprehensive")
+@with_timings
+@rate_limited(DSP)
+@coalesced("analyze-comprehensive")
+@admitted(DSP)
+@offloaded
+@stores_result("analyze-comprehensive")
 async def analyze_comprehensive(request: AudioAnalysisRequest):
     """
     包括的な動画分析（音声 + エンゲージメント）
     """
     try:
         # まず音声をダウンロード
-        audio_response = await download_audio_enhanced(request)
+        audio_response = await fetch_media(request, plan_for("analyze-comprehensive", request))
         
         if audio_response.audio_file_path:
-            # APIキーを設定（comprehensive_analyzerのengagement_analyzerにも設定）
-            if request.youtube_api_key:
-                comprehensive_analyzer.engagement_analyzer.set_api_key(request.youtube_api_key)
-            
-            # 包括的分析を実行
+            # 包括的分析を実行（APIキーはリクエストごとに渡す）
             comprehensive_result = comprehensive_analyzer.analyze_video_comprehensive(
                 request.url, 
                 audio_response.audio_file_path, 
-                request.youtube_api_key
+                request.youtube_api_key,
+                profile=request.analysis_profile,
+                highlight_count=request.highlight_count
             )
             
             # 視覚化を生成
             audio_analysis = comprehensive_result.get('audio_analysis', {})
             excitement_points = audio_analysis.get('excitement_points', [])
+            register_timeline(request.url, audio_response.audio_file_path, excitement_points,
+                              partial=is_partial_audio(audio_response))
             
-            timeline_image = visualizer.create_excitement_timeline(audio_response.audio_file_path, excitement_points)
-            summary_image = visualizer.create_summary_chart(audio_analysis)
+            visualization = build_visualization(request.visualization, audio_response.audio_file_path, audio_analysis)
             
             return {
                 "video_info": audio_response.video_info,
                 "comprehensive_analysis": comprehensive_result,
-                "visualization": {
-                    "timeline_image": timeline_image,
-                    "summary_image": summary_image
-                },
+                "visualization": visualization,
                 "audio_file_path": audio_response.audio_file_path
             }
         else:
             # 音声ファイルがダウンロードできない場合、エンゲージメント分析のみを実行
-            print("音声ファイルがダウンロードできませんでした。エンゲージメント分析のみを実行します。")
+            logger.warning("音声ファイルがダウンロードできませんでした。エンゲージメント分析のみを実行します")
             
             if request.youtube_api_key:
-                # APIキーを設定
-                engagement_analyzer.set_api_key(request.youtube_api_key)
                 # エンゲージメント分析のみを実行
-                engagement_result = engagement_analyzer.get_video_engagement_data(
+                engagement_result = engagement_analyzer_for(request.youtube_api_key).get_video_engagement_data(
                     engagement_analyzer.extract_video_id(request.url)
                 )
                 
@@ -421,8 +710,9 @@ async def analyze_comprehensive(request: AudioAnalysisRequest):
                         "analysis_timestamp": datetime.now().isoformat()
                     },
                     "visualization": {
-                        "timeline_image": "音声分析が利用できません",
-                        "summary_image": "音声分析が利用できません"
+                        "timeline_image_url": None,
+                        "summary_image_url": None,
+                        "message": "音声分析が利用できません"
                     },
                     "audio_file_path": None,
                     "warning": "音声ファイルのダウンロードに失敗しました。エンゲージメント分析のみを表示しています。"
@@ -437,7 +727,315 @@ async def analyze_comprehensive(request: AudioAnalysisRequest):
 async def health_check():
     return {"status": "healthy", "version": "2.1.0-gemini"}
 
+@app.get("/timeline")
+async def timeline(video_id: str, start: float = 0.0, end: Optional[float] = None,
+                   resolution: Optional[float] = None, max_points: int = 2000):
+    """
+    エンベロープピラミッドから区間の音量推移をJSONで返す（表示点数に比例したコスト）
+    """
+    from envelope_pyramid import EnvelopePyramid, pyramid_registry
+    entry = pyramid_registry.get(video_id)
+    if not entry or not os.path.exists(entry['audio_file_path']):
+        raise HTTPException(status_code=404, detail="この動画のタイムラインはまだ生成されていません")
+    
+    def load_envelope():
+        pyramid = EnvelopePyramid.for_audio(entry['audio_file_path'])
+        return pyramid, pyramid.query(start, end, resolution=resolution, max_points=max_points)
+    
+    try:
+        # キャッシュがない場合は音声のデコードと保存を伴うため、イベントループを塞がないようスレッドで実行
+        pyramid, envelope = await asyncio.to_thread(load_envelope)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    window_end = envelope['end']
+    excitement_points = [
+        point for point in entry['excitement_points']
+        if start <= point.get('time', 0) < window_end
+    ]
+    
+    return {
+        "video_id": video_id,
+        "duration": pyramid.duration,
+        "start": envelope['start'],
+        "end": window_end,
+        "resolution": envelope['resolution'],
+        "times": envelope['times'].tolist(),
+        "db": envelope['db'].round(2).tolist(),
+        "min": envelope['min'].round(4).tolist(),
+        "max": envelope['max'].round(4).tolist(),
+        "peak": pyramid.peak(envelope['start'], window_end),
+        "excitement_points": excitement_points
+    }
+
+@app.get("/charts/{chart_id}.png")
+def get_chart(chart_id: str, request: Request):
+    """
+    キャッシュされたチャートPNGを返す（ETag対応。描画はワーカースレッドで実行）
+    """
+    from chart_renderer import chart_cache
+    etag = chart_cache.etag(chart_id)
+    if etag is None:
+        raise HTTPException(status_code=404, detail="チャートが見つかりません")
+    
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=86400"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    cached = chart_cache.get(chart_id)
+    if cached is None:
+        raise HTTPException(status_code=404, detail="チャートが見つかりません")
+    png, _ = cached
+    return Response(content=png, media_type="image/png", headers=headers)
+
+@app.post("/export-clips")
+@with_timings
+@rate_limited(DSP)
+@admitted(DSP)
+@offloaded
+async def export_clips(request: ClipExportRequest):
+    """
+    取得済みの音声（未取得の場合はダウンロード）から区間ごとのクリップを並列に切り出す
+    """
+    from clip_export import (ClipSegment, export_clips as cut_clips, validate_segments, media_duration,
+                             covers_segments)
+    from envelope_pyramid import pyramid_registry
+    try:
+        segments = validate_segments([ClipSegment(start=s.start, end=s.end) for s in request.segments])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # 同じ動画を分析・ダウンロード済みならそのメディアを使う
+    # （max_audio_seconds による部分ダウンロードの音声は、区間をすべて含む場合のみ）
+    video_id = engagement_analyzer.extract_video_id(request.url)
+    entry = pyramid_registry.get(video_id) if video_id else None
+    source_path = None
+    if entry and os.path.exists(entry['audio_file_path']):
+        duration = media_duration(entry['audio_file_path'])
+        if not entry.get('partial') or covers_segments(duration, segments):
+            source_path, source = entry['audio_file_path'], "cached"
+    if source_path is None:
+        media = await fetch_media(request, plan_for("export-clips", request))
+        if not media.audio_file_path:
+            raise HTTPException(status_code=400, detail="メディアの取得に失敗したためクリップを書き出せません")
+        register_timeline(request.url, media.audio_file_path, partial=is_partial_audio(media))
+        source_path, source = media.audio_file_path, "downloaded"
+        duration = media_duration(source_path) or media.audio_duration
+    
+    # メディアの長さで終了位置を丸め、範囲外の区間は400にする
+    try:
+        segments = validate_segments(segments, duration)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    result = cut_clips(source_path, segments, name_prefix=video_id or "clip")
+    for clip in result["clips"]:
+        if "filename" in clip:
+            clip["url"] = f"/clips/{result['export_id']}/{clip['filename']}"
+    result["source"] = source
+    return result
+
+@app.get("/clips/{export_id}/{filename}")
+def get_clip(export_id: str, filename: str):
+    """
+    書き出したクリップを返す
+    """
+    from clip_export import clip_path
+    path = clip_path(export_id, filename)
+    if path is None:
+        raise HTTPException(status_code=404, detail="クリップが見つかりません")
+    return FileResponse(path, filename=filename)
+
+# ライブ分析のイベントキューの長さ（クライアントの受信が遅れた場合は古いイベントから破棄）とキープアライブの間隔（秒）
+LIVE_QUEUE_SIZE = 100
+LIVE_KEEPALIVE_SECONDS = 15
+
+def sse_message(event: dict) -> str:
+    """Server-Sent Eventsの1メッセージ"""
+    return f"event: {event['event']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+@app.get("/live/events")
+async def live_events(source: str, analysis_profile: Optional[str] = None, realtime: bool = False):
+    """
+    ライブ配信（URL）・書き込み中のローカルファイルの盛り上がりイベントをServer-Sent Eventsで配信
+    
+    接続している間だけ分析し、切断するとffmpegを終了する。
+    """
+    try:
+        get_profile(analysis_profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    from live_analysis import live_sessions, LiveSessionLimit
+    try:
+        session = await asyncio.to_thread(live_sessions.start, improved_analyzer, source, analysis_profile, realtime)
+    except LiveSessionLimit as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except LocalMediaNotAllowed as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+    
+    def offer(event: Optional[dict]):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
+    
+    def emit(event: Optional[dict]):
+        try:
+            loop.call_soon_threadsafe(offer, event)
+        except RuntimeError:
+            pass  # イベントループが終了済み
+    
+    def run():
+        try:
+            session.run(emit)
+        except Exception as e:
+            logger.warning("ライブ分析に失敗しました", extra={"session_id": session.session_id, "error": str(e)})
+        finally:
+            emit(None)
+    
+    # 配信が続く間スレッドを占有するため、共有のスレッドプールではなく専用のスレッドで実行する
+    threading.Thread(target=run, name=f"live-{session.session_id}", daemon=True).start()
+    
+    async def stream():
+        try:
+            yield sse_message({"event": "session", "session_id": session.session_id,
+                               "profile": session.detector.profile.name})
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), LIVE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    break
+                yield sse_message(event)
+        finally:
+            live_sessions.finish(session)
+    
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/live/sessions")
+def list_live_sessions():
+    """
+    実行中のライブ分析セッション（ローリング統計と直近のイベント）
+    """
+    from live_analysis import live_sessions
+    return {"sessions": [session.to_dict() for session in live_sessions.list()]}
+
+@app.get("/jobs")
+def list_jobs(video_id: Optional[str] = None, active: bool = False, limit: int = 20):
+    """
+    ダウンロード中・直近のダウンロードジョブの進捗（新しい順）
+    """
+    jobs = download_jobs.list(video_id=video_id, active_only=active)[:max(1, limit)]
+    return {"jobs": [job.to_dict() for job in jobs]}
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    ダウンロードジョブの進捗（バイト数・速度・残り時間・後処理）
+    """
+    job = download_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="ジョブが見つかりません")
+    return job.to_dict()
+
+@app.get("/results/{video_id}")
+def get_results(video_id: str, analysis_type: Optional[str] = None, limit: int = 10):
+    """
+    動画IDの保存済み分析結果を新しい順に取得（パイプラインは再実行しない）
+    """
+    results = result_store.get_for_video(video_id, analysis_type=analysis_type, limit=limit)
+    if not results:
+        raise HTTPException(status_code=404, detail="保存済みの分析結果がありません")
+    return {"video_id": video_id, "results": results}
+
+@app.get("/results")
+def list_results(min_vvp: Optional[float] = None, min_total: Optional[float] = None,
+                 channel: Optional[str] = None, since: Optional[str] = None,
+                 viral_level: Optional[str] = None, analysis_type: Optional[str] = None,
+                 limit: int = 50, include_result: bool = False):
+    """
+    保存済み分析結果の検索（since はISO 8601の日時、既定では要約のみ返す）
+    """
+    if since:
+        try:
+            since = datetime.fromisoformat(since).isoformat()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="sinceはISO 8601形式で指定してください")
+    results = result_store.query(
+        min_vvp=min_vvp, min_total=min_total, channel=channel, since=since,
+        viral_level=viral_level, analysis_type=analysis_type,
+        limit=limit, include_result=include_result
+    )
+    return {"count": len(results), "results": results}
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus形式のメトリクス（ステージごとの所要時間・CPU時間・ダウンロード量・RSS増分）
+    """
+    return PlainTextResponse(metrics_registry.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/audio-backends")
+async def audio_backends():
+    """
+    音声デコードバックエンドの利用可否とスループット統計
+    """
+    from audio_io import available_backends, get_decode_stats
+    return {
+        "available": available_backends(),
+        "decode_stats": get_decode_stats()
+    }
+
+@app.get("/analysis-profiles")
+async def analysis_profiles():
+    """利用可能な音声分析プロファイルと既定値"""
+    return {
+        "default": get_profile().name,
+        "profiles": {name: profile.to_dict() for name, profile in PROFILES.items()}
+    }
+
+def require_admin(request: Request):
+    """管理APIの認可（トークン設定時はX-Admin-Tokenヘッダー、未設定時はローカルホストのみ）"""
+    token = get_admin_token()
+    if token:
+        if not hmac.compare_digest(request.headers.get("x-admin-token", ""), token):
+            raise HTTPException(status_code=403, detail="管理トークンが正しくありません")
+    elif not request.client or request.client.host not in ("127.0.0.1", "::1", "localhost"):
+        raise HTTPException(status_code=403, detail="管理APIはローカルホストからのみ利用できます")
+
+@app.get("/admin/limits")
+async def get_admission_limits(request: Request):
+    """処理クラスごとの同時実行数・待ち行列・レート制限の設定と現在の状態"""
+    require_admin(request)
+    return admission.snapshot()
+
+@app.put("/admin/limits")
+async def update_admission_limits(request: Request, updates: dict = Body(...)):
+    """
+    処理クラスごとの上限を実行時に変更（例: {"dsp": {"max_concurrent": 4, "rate": 0.5}}）
+    """
+    require_admin(request)
+    try:
+        snapshot = admission.update_limits(updates)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info("アドミッション制御の上限を変更しました", extra={"updates": updates})
+    return snapshot
+
 @app.post("/analyze-gemini-enhanced")
+@with_timings
+@rate_limited(LLM)
+@coalesced("analyze-gemini-enhanced")
+@admitted(LLM)
+@offloaded
+@stores_result("analyze-gemini-enhanced")
 async def analyze_gemini_enhanced(request: AudioAnalysisRequest):
     """
     Gemini AIによる質的分析を統合した最先端の動画分析
@@ -453,22 +1051,28 @@ async def analyze_gemini_enhanced(request: AudioAnalysisRequest):
 
     try:
         # 1. 音声、字幕、動画情報をダウンロード
-        download_result = await download_audio_enhanced(request)
+        download_result = await fetch_media(request, plan_for("analyze-gemini-enhanced", request))
         
         # 2. 既存の包括的分析を実行
         comprehensive_result = {}
         if download_result.audio_file_path:
-            comprehensive_analyzer.engagement_analyzer.set_api_key(youtube_api_key)
             comprehensive_result = comprehensive_analyzer.analyze_video_comprehensive(
                 request.url, 
                 download_result.audio_file_path, 
-                youtube_api_key
+                youtube_api_key,
+                profile=request.analysis_profile,
+                highlight_count=request.highlight_count
+            )
+            register_timeline(
+                request.url,
+                download_result.audio_file_path,
+                comprehensive_result.get('audio_analysis', {}).get('excitement_points'),
+                partial=is_partial_audio(download_result)
             )
         else:
             # 音声がない場合はエンゲージメント分析のみ
-            engagement_analyzer.set_api_key(youtube_api_key)
             video_id = engagement_analyzer.extract_video_id(request.url)
-            comprehensive_result['engagement_analysis'] = engagement_analyzer.get_video_engagement_data(video_id)
+            comprehensive_result['engagement_analysis'] = engagement_analyzer_for(youtube_api_key).get_video_engagement_data(video_id)
             comprehensive_result['audio_analysis'] = {'error': 'Audio file not available'}
 
         # 3. Gemini分析のためのデータを準備
@@ -488,6 +1092,8 @@ async def analyze_gemini_enhanced(request: AudioAnalysisRequest):
             comments_data = [comment['text'] for comment in comment_details[:50]]
 
         # 4. Gemini分析を実行（リアルタイム版→通常版に変更）
+        # google.generativeaiはこのエンドポイントでしか使わないため初回呼び出し時に読み込む
+        from gemini_analyzer import GeminiAnalyzer
         gemini_analyzer = GeminiAnalyzer(api_key=gemini_api_key)
         gemini_result = gemini_analyzer.analyze_content_with_gemini(
             transcript,
@@ -501,7 +1107,9 @@ async def analyze_gemini_enhanced(request: AudioAnalysisRequest):
         engagement = gemini_result.get("engagement_score") or gemini_result.get("emotional_engagement_score") or 0
         tech = gemini_result.get("tech_score") or gemini_result.get("technical_quality_score") or 0
         vvp_score = calculate_vvp_score(float(narrative), float(hook), float(engagement), float(tech))
-        golden_clip = gemini_result.get("golden_clip") or extract_golden_clip(gemini_result.get("semantic_hotspots", []))
+        golden_clip = gemini_result.get("golden_clip") or extract_golden_clip(
+            comprehensive_result.get("audio_analysis", {}).get("clip_candidates", []),
+            gemini_result.get("semantic_hotspots", []))
         executive_summary = gemini_result.get("summary") or gemini_result.get("executive_summary") or "AIによる自動要約は未生成です。"
 
         # 6. 既存の結果とGeminiの結果をマージして返す
@@ -516,39 +1124,35 @@ async def analyze_gemini_enhanced(request: AudioAnalysisRequest):
         }
 
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("Gemini拡張分析に失敗しました")
         raise HTTPException(status_code=500, detail=f"Gemini拡張分析に失敗しました: {str(e)}")
 
 @app.post("/evaluate-video-framework")
+@with_timings
+@rate_limited(DSP)
+@coalesced("evaluate-video-framework")
+@admitted(DSP)
+@offloaded
+@stores_result("evaluate-video-framework")
 async def evaluate_video_framework(request: AudioAnalysisRequest):
     """
     統合縦型動画最適化フレームワークによる動画評価
     """
     try:
         # まず音声をダウンロード
-        audio_response = await download_audio_enhanced(request)
+        audio_response = await fetch_media(request, plan_for("evaluate-video-framework", request))
         
         if audio_response.audio_file_path:
             # 動画メタデータを取得
-            video_metadata = {
-                "title": audio_response.video_info.title,
-                "description": audio_response.video_info.description or "",
-                "duration": audio_response.video_info.duration,
-                "resolution": "1080x1920",  # 推定値
-                "aspect_ratio": "9:16",     # 推定値
-                "bitrate": 8000,            # 推定値
-                "framerate": 30             # 推定値
-            }
+            video_metadata = video_metadata_for(
+                audio_response.video_info, {"stream": audio_response.debug_info.get('video_stream')})
             
             # エンゲージメントデータを取得（APIキーがある場合）
             engagement_data = None
             if request.youtube_api_key:
-                # APIキーを設定
-                engagement_analyzer.set_api_key(request.youtube_api_key)
                 video_id = engagement_analyzer.extract_video_id(request.url)
                 if video_id:
-                    engagement_result = engagement_analyzer.get_video_engagement_data(video_id)
+                    engagement_result = engagement_analyzer_for(request.youtube_api_key).get_video_engagement_data(video_id)
                     if 'error' not in engagement_result:
                         engagement_data = engagement_result
             
@@ -560,6 +1164,8 @@ async def evaluate_video_framework(request: AudioAnalysisRequest):
                 engagement_data
             )
             
+            register_timeline(request.url, audio_response.audio_file_path, partial=is_partial_audio(audio_response))
+            
             return {
                 "video_info": audio_response.video_info,
                 "evaluation_result": evaluation_result,
@@ -567,26 +1173,17 @@ async def evaluate_video_framework(request: AudioAnalysisRequest):
             }
         else:
             # 音声ファイルがダウンロードできない場合、メタデータのみで評価
-            print("音声ファイルがダウンロードできませんでした。メタデータのみで評価を実行します。")
+            logger.warning("音声ファイルがダウンロードできませんでした。メタデータのみで評価を実行します")
             
-            video_metadata = {
-                "title": audio_response.video_info.title,
-                "description": audio_response.video_info.description or "",
-                "duration": audio_response.video_info.duration,
-                "resolution": "1080x1920",  # 推定値
-                "aspect_ratio": "9:16",     # 推定値
-                "bitrate": 8000,            # 推定値
-                "framerate": 30             # 推定値
-            }
+            video_metadata = video_metadata_for(
+                audio_response.video_info, {"stream": audio_response.debug_info.get('video_stream')})
             
             # エンゲージメントデータを取得（APIキーがある場合）
             engagement_data = None
             if request.youtube_api_key:
-                # APIキーを設定
-                engagement_analyzer.set_api_key(request.youtube_api_key)
                 video_id = engagement_analyzer.extract_video_id(request.url)
                 if video_id:
-                    engagement_result = engagement_analyzer.get_video_engagement_data(video_id)
+                    engagement_result = engagement_analyzer_for(request.youtube_api_key).get_video_engagement_data(video_id)
                     if 'error' not in engagement_result:
                         engagement_data = engagement_result
             
@@ -608,6 +1205,104 @@ async def evaluate_video_framework(request: AudioAnalysisRequest):
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"動画評価に失敗しました: {str(e)}")
 
+@with_timings
+@admitted(DSP)
+@offloaded
+async def analyze_media_file(request: LocalAnalysisRequest):
+    """
+    アップロード・ローカルファイルの音声を抽出し、URLと同じ分析パイプラインで分析する（ネットワーク不要）
+    
+    レート制限は呼び出し側（アップロードの場合は書き出し前）で適用する。
+    """
+    try:
+        if request._upload_path:
+            media = ingest_file(request._upload_path, "upload", request._upload_name)
+            video_url = f"upload://{media.upload_id}"
+        else:
+            media = ingest_file(resolve_local_path(request.path), "local", os.path.basename(request.path))
+            video_url = f"file://{request.path}"
+    except LocalMediaNotAllowed as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except MediaIngestError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    video_info = VideoInfo(
+        title=media.name,
+        duration=round(media.duration) if media.duration is not None else None,
+        description="",
+        view_count=None,
+        like_count=None
+    )
+    try:
+        if request.pipeline == "framework":
+            # エンゲージメントデータなし（音声とメタデータのみ）で評価
+            result = {
+                "evaluation_result": evaluation_framework.evaluate_video_comprehensive(
+                    video_url, media.audio_path, video_metadata_for(video_info, media.video), None)
+            }
+        else:
+            result = {
+                "audio_analysis": improved_analyzer.analyze_audio_accurate(
+                    media.audio_path, profile=request.analysis_profile,
+                    highlight_count=request.highlight_count)
+            }
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"音声分析に失敗しました: {str(e)}")
+    
+    return {
+        "video_info": video_info,
+        **result,
+        "audio_file_path": media.audio_path,
+        "source": media.to_dict()
+    }
+
+@app.post("/analyze-upload")
+async def analyze_upload(file: UploadFile = File(...),
+                         pipeline: Literal["audio", "framework"] = Form("audio"),
+                         analysis_profile: Optional[str] = Form(None),
+                         highlight_count: Optional[int] = Form(None),
+                         include_timings: bool = Form(False)):
+    """
+    アップロードした音声・動画ファイルの分析（multipart/form-data の file）
+    
+    レート制限とContent-Lengthによる最大サイズの確認はフォームの解析前（guard_uploads）に行う。
+    オプションはフォームの項目のため解析後に検証し、作業領域への書き出しは検証後に行う。
+    分析が失敗した場合は作業ディレクトリを削除する。
+    """
+    request = LocalAnalysisRequest(
+        pipeline=pipeline,
+        analysis_profile=analysis_profile,
+        highlight_count=highlight_count,
+        include_timings=include_timings
+    )
+    try:
+        validate_analysis_options(request)
+        upload_path = await asyncio.to_thread(save_upload, file.file, file.filename)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    finally:
+        await file.close()
+    
+    request._upload_path = upload_path
+    request._upload_name = os.path.basename(file.filename or "upload")
+    try:
+        return await analyze_media_file(request)
+    except Exception:
+        shutil.rmtree(os.path.dirname(upload_path), ignore_errors=True)
+        raise
+
+@app.post("/analyze-local")
+@rate_limited(DSP)
+async def analyze_local(request: LocalAnalysisRequest):
+    """
+    サーバー上のローカルファイルの分析（CLIPERS_LOCAL_MEDIA_ROOTS配下のみ）
+    """
+    if not request.path:
+        raise HTTPException(status_code=400, detail="pathを指定してください")
+    return await analyze_media_file(request)
+
 @app.post("/analyze-user-attributes")
 async def analyze_user_attributes(comments: List[str] = Body(..., embed=True)):
     """
@@ -637,6 +1332,14 @@ async def api_info():
             "/analyze-engagement - エンゲージメント分析",
             "/analyze-comprehensive - 包括的分析",
             "/analyze-gemini-enhanced - Gemini AI拡張分析",
-            "/evaluate-video-framework - 動画評価フレームワーク"
+            "/evaluate-video-framework - 動画評価フレームワーク",
+            "/timeline - 音量タイムライン（JSON）",
+            "/export-clips - 区間ごとのクリップ書き出し（ストリームコピー）",
+            "/jobs - ダウンロードジョブの進捗",
+            "/analyze-upload - アップロードしたファイルの分析",
+            "/analyze-local - ローカルファイルの分析",
+            "/live/events - ライブ配信の盛り上がりイベント（Server-Sent Events）",
+            "/results - 保存済み分析結果の検索",
+            "/admin/limits - アドミッション制御の上限の参照・変更"
         ]
     } 
\ No newline at end of file
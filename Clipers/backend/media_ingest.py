@@ -0,0 +1,231 @@
+"""
+ローカルメディアの取り込み（アップロード・ローカルパス）
+
+YouTubeを経由せずに、手元の収録素材を同じ分析パイプラインに渡すための前処理。
+
+- アップロードは作業領域（CLIPERS_UPLOAD_DIR/<upload_id>/）に一定サイズのチャンクで書き出し、
+  本体全体をメモリに読み込まない（最大サイズを超えた時点で中断する）
+- ローカルパスは CLIPERS_LOCAL_MEDIA_ROOTS 配下のファイルのみ受け付ける（未設定の場合は無効）
+- 動画ファイルからはffmpegで音声トラックのみをWAVとして抽出する（-vn のため映像はデコード・再エンコードしない）
+- WAV/FLACはそのまま分析する
+- 映像がある場合は、元ファイルを削除する前に映像の仕様とキーフレームの特徴量を取得する（visual_features）
+- 保持期間（CLIPERS_UPLOAD_RETENTION_HOURS）を過ぎた作業ディレクトリは次回の取り込み時に削除する
+"""
+import os
+import re
+import shutil
+import subprocess
+import uuid
+from dataclasses import dataclass, asdict
+from typing import BinaryIO, Dict, List, Optional
+
+from clip_export import prune_exports
+from config import (get_upload_dir, get_upload_max_bytes, get_upload_retention_hours,
+                    get_local_media_roots, get_visual_features)
+from metrics import registry
+from tracing import span
+from logging_setup import get_logger
+
+# アップロードを作業領域に書き出す単位
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# multipartの境界・フォーム項目のためにファイル本体以外に許容するバイト数
+UPLOAD_FORM_OVERHEAD_BYTES = 64 * 1024
+
+# 変換せずにそのまま分析する形式
+DIRECT_AUDIO_EXTENSIONS = {'.wav', '.flac'}
+
+EXTENSION_PATTERN = re.compile(r"^\.[A-Za-z0-9]{1,8}$")
+
+MEDIA_INGESTED = registry.counter(
+    "clipers_media_ingested_total", "Local files and uploads prepared for analysis", ["source", "status"])
+
+logger = get_logger("ingest")
+
+
+class MediaIngestError(RuntimeError):
+    """音声の抽出に失敗した場合の例外"""
+
+
+class UploadTooLarge(ValueError):
+    """アップロードが最大サイズを超えた場合の例外"""
+
+
+class UploadLengthRequired(ValueError):
+    """アップロードのリクエストにContent-Lengthがない場合の例外"""
+
+
+class LocalMediaNotAllowed(PermissionError):
+    """ローカルパス指定が無効、または許可されたディレクトリ外の場合の例外"""
+
+
+@dataclass
+class IngestedMedia:
+    """分析に渡す取り込み済みのメディア"""
+    source: str  # "upload" / "local"
+    name: str
+    audio_path: str
+    source_bytes: int
+    duration: Optional[float] = None
+    extracted: bool = False
+    upload_id: Optional[str] = None
+    # 映像の仕様と特徴量（{"stream": ..., "visual": ...}、映像がない・無効の場合はNone）
+    video: Optional[Dict] = None
+
+    def to_dict(self) -> Dict:
+        result = asdict(self)
+        # 音声のパスはレスポンスの audio_file_path として返す
+        result.pop("audio_path")
+        return result
+
+
+def _scratch_dir(upload_dir: Optional[str] = None) -> str:
+    upload_dir = upload_dir or get_upload_dir()
+    prune_exports(upload_dir, get_upload_retention_hours())
+    scratch_dir = os.path.join(upload_dir, uuid.uuid4().hex[:12])
+    os.makedirs(scratch_dir, exist_ok=True)
+    return scratch_dir
+
+
+def _extension(filename: Optional[str]) -> str:
+    extension = os.path.splitext(filename or "")[1].lower()
+    return extension if EXTENSION_PATTERN.match(extension) else ""
+
+
+def check_upload_length(content_length: Optional[str], max_bytes: Optional[int] = None) -> None:
+    """
+    Content-Lengthからリクエスト本体がアップロードの最大サイズに収まるかを確認する
+
+    フォームの解析は本体全体を一時ファイルに書き出すため、解析前（ミドルウェア）で呼ぶ。
+
+    Raises:
+        UploadLengthRequired: Content-Lengthがない、または数値でない場合
+        UploadTooLarge: 最大サイズ＋フォームの余裕分を超える場合
+    """
+    max_bytes = max_bytes or get_upload_max_bytes()
+    if not content_length or not content_length.isdigit():
+        raise UploadLengthRequired("アップロードにはContent-Lengthが必要です")
+    if int(content_length) > max_bytes + UPLOAD_FORM_OVERHEAD_BYTES:
+        MEDIA_INGESTED.inc(source="upload", status="too_large")
+        raise UploadTooLarge(f"アップロードは最大{round(max_bytes / (1024 * 1024), 2):g}MBまでです")
+
+
+def save_upload(fileobj: BinaryIO, filename: Optional[str], max_bytes: Optional[int] = None,
+                upload_dir: Optional[str] = None) -> str:
+    """
+    アップロードをチャンク単位で作業領域に書き出す
+
+    Returns:
+        書き出したファイルのパス（<upload_dir>/<upload_id>/source<拡張子>）
+
+    Raises:
+        UploadTooLarge: 最大サイズを超えた場合（書き出し途中のファイルは削除する）
+    """
+    max_bytes = max_bytes or get_upload_max_bytes()
+    scratch_dir = _scratch_dir(upload_dir)
+    path = os.path.join(scratch_dir, "source" + _extension(filename))
+    written = 0
+    with span("ingest.save") as save_span:
+        with open(path, "wb") as output:
+            while True:
+                chunk = fileobj.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > max_bytes:
+                    break
+                output.write(chunk)
+        save_span.add_bytes(min(written, max_bytes))
+    if written > max_bytes:
+        shutil.rmtree(scratch_dir, ignore_errors=True)
+        MEDIA_INGESTED.inc(source="upload", status="too_large")
+        raise UploadTooLarge(f"アップロードは最大{round(max_bytes / (1024 * 1024), 2):g}MBまでです")
+    return path
+
+
+def resolve_local_path(path: str, roots: Optional[List[str]] = None) -> str:
+    """
+    ローカルパスを検証して実パスを返す
+
+    Raises:
+        LocalMediaNotAllowed: ローカルパス指定が無効、または許可されたディレクトリ外の場合
+        FileNotFoundError: ファイルが存在しない場合
+    """
+    roots = get_local_media_roots() if roots is None else roots
+    if not roots:
+        raise LocalMediaNotAllowed("ローカルパス指定は無効です（CLIPERS_LOCAL_MEDIA_ROOTSを設定してください）")
+    resolved = os.path.realpath(path)
+    if not any(os.path.commonpath([resolved, root]) == root for root in roots):
+        raise LocalMediaNotAllowed("許可されたディレクトリ外のファイルです")
+    if not os.path.isfile(resolved):
+        raise FileNotFoundError("ファイルが見つかりません")
+    return resolved
+
+
+def extract_audio(source_path: str, output_dir: str) -> str:
+    """
+    音声トラックをWAVとして抽出（映像・字幕・データストリームは読み飛ばす）
+
+    Raises:
+        MediaIngestError: 音声トラックがない・ffmpegが失敗した場合
+    """
+    output_path = os.path.join(output_dir, "audio.wav")
+    with span("ingest.extract_audio"):
+        result = subprocess.run([
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-nostdin", "-y",
+            "-i", source_path, "-map", "0:a:0", "-vn", "-sn", "-dn", "-c:a", "pcm_s16le", output_path
+        ], capture_output=True, text=True)
+    if result.returncode != 0 or not os.path.exists(output_path):
+        if "matches no streams" in result.stderr:
+            raise MediaIngestError("音声トラックがありません")
+        raise MediaIngestError(f"音声の抽出に失敗しました: {result.stderr.strip()[-500:] or result.returncode}")
+    return output_path
+
+
+def video_features(source_path: str) -> Optional[Dict]:
+    """映像の仕様と特徴量（失敗しても取り込みは続行する）"""
+    if not get_visual_features():
+        return None
+    from visual_features import analyze_video
+    try:
+        return analyze_video(source_path)
+    except Exception as error:
+        logger.warning("映像特徴量を計算できませんでした", extra={"error": str(error)})
+        return None
+
+
+def ingest_file(source_path: str, source: str, name: str) -> IngestedMedia:
+    """
+    取り込んだファイルから分析用の音声を用意する
+
+    アップロードの場合、音声を抽出した後の元ファイル（抽出に失敗した場合は作業ディレクトリ）を削除する。
+    """
+    from audio_io import audio_duration
+    is_upload = source == "upload"
+    source_bytes = os.path.getsize(source_path)
+    audio_path, extracted, video = source_path, False, None
+    try:
+        if _extension(source_path) not in DIRECT_AUDIO_EXTENSIONS:
+            output_dir = os.path.dirname(source_path) if is_upload else _scratch_dir()
+            audio_path, extracted = extract_audio(source_path, output_dir), True
+            video = video_features(source_path)
+            if is_upload:
+                os.remove(source_path)
+    except MediaIngestError:
+        MEDIA_INGESTED.inc(source=source, status="error")
+        if is_upload:
+            shutil.rmtree(os.path.dirname(source_path), ignore_errors=True)
+        raise
+    MEDIA_INGESTED.inc(source=source, status="ok")
+    media = IngestedMedia(
+        source=source,
+        name=name,
+        audio_path=audio_path,
+        source_bytes=source_bytes,
+        duration=audio_duration(audio_path),
+        extracted=extracted,
+        upload_id=os.path.basename(os.path.dirname(source_path)) if is_upload else None,
+        video=video
+    )
+    logger.info("メディアを取り込みました", extra={
+        "source": source, "bytes": source_bytes, "extracted": extracted, "duration": media.duration})
+    return media
@@ -0,0 +1,125 @@
+"""
+評価結果の入力ハッシュキャッシュ（インクリメンタル再分析）
+
+評価の各柱（および音声分析）の結果を、その柱が実際に読む入力のハッシュをキーにキャッシュする。
+- 音声: 音声ファイルの内容ハッシュ（フック・ナラティブ・音声分析）
+- メタデータ: タイトル・説明・解像度などのハッシュ（技術品質・プラットフォーム整合性）
+- エンゲージメント: 取得したエンゲージメントデータのスナップショットのハッシュ
+
+翌日の再スコアリングのように音声が変わっていない場合は、入力が変わった柱だけを再計算する。
+"""
+import copy
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from metrics import registry
+
+# 柱の計算ロジックを変更した場合はこの値を上げて既存のキャッシュを無効化する
+CACHE_VERSION = 6
+
+FILE_HASH_CHUNK = 1 << 20
+
+PILLAR_CACHE_REQUESTS = registry.counter(
+    "clipers_pillar_cache_requests_total", "Pillar cache lookups", ["pillar", "result"])
+
+
+def content_hash(payload) -> str:
+    """JSON化可能な値のハッシュ（キーの順序に依存しない）"""
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+
+
+class PillarCache:
+    """
+    柱ごとの計算結果のLRUキャッシュ（スレッドセーフ）
+    """
+
+    def __init__(self, max_entries: int = 1024, max_file_hashes: int = 256):
+        self.max_entries = max_entries
+        self.max_file_hashes = max_file_hashes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], object]" = OrderedDict()
+        # (パス, サイズ, 更新時刻) → 内容ハッシュ（同じリクエスト内での再読み込みを避ける）
+        self._file_hashes: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+
+    def file_hash(self, path: str) -> str:
+        """音声ファイルの内容ハッシュ（一時ディレクトリが変わっても同じ内容なら同じ値）"""
+        stat = os.stat(path)
+        file_key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            cached = self._file_hashes.get(file_key)
+            if cached is not None:
+                self._file_hashes.move_to_end(file_key)
+                return cached
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(FILE_HASH_CHUNK), b''):
+                digest.update(chunk)
+        file_digest = digest.hexdigest()
+
+        with self._lock:
+            self._file_hashes[file_key] = file_digest
+            while len(self._file_hashes) > self.max_file_hashes:
+                self._file_hashes.popitem(last=False)
+        return file_digest
+
+    def key(self, *parts) -> str:
+        """入力ハッシュ等からキャッシュキーを生成"""
+        return content_hash([CACHE_VERSION, *parts])
+
+    def get_or_compute(self, pillar: str, key: str, compute: Callable[[], object],
+                       cacheable: Optional[Callable[[object], bool]] = None) -> Tuple[object, bool]:
+        """
+        キャッシュ済みの結果を返すか、computeで計算して保存する
+
+        Args:
+            cacheable: 計算結果を保存してよいか判定する関数（エラー結果を保存しないため）
+
+        Returns:
+            (結果, キャッシュから取得したか)
+        """
+        with self._lock:
+            if (pillar, key) in self._entries:
+                self._entries.move_to_end((pillar, key))
+                PILLAR_CACHE_REQUESTS.inc(pillar=pillar, result="hit")
+                return copy.deepcopy(self._entries[(pillar, key)]), True
+
+        PILLAR_CACHE_REQUESTS.inc(pillar=pillar, result="miss")
+        result = compute()
+        if cacheable is None or cacheable(result):
+            self.put(pillar, key, result)
+        return result, False
+
+    def put(self, pillar: str, key: str, result: object):
+        with self._lock:
+            self._entries[(pillar, key)] = copy.deepcopy(result)
+            self._entries.move_to_end((pillar, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._file_hashes.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            pillars: Dict[str, int] = {}
+            for pillar, _ in self._entries:
+                pillars[pillar] = pillars.get(pillar, 0) + 1
+            return {"entries": len(self._entries), "max_entries": self.max_entries, "pillars": pillars}
+
+
+pillar_cache = PillarCache()
+
+
+def audio_input_hash(audio_file_path: Optional[str]) -> Optional[str]:
+    """音声ファイルの内容ハッシュ（音声なしの場合はNone）"""
+    if not audio_file_path or not os.path.exists(audio_file_path):
+        return None
+    return pillar_cache.file_hash(audio_file_path)
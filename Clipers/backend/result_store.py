@@ -0,0 +1,175 @@
+"""
+分析結果の永続ストア（SQLite）
+
+/analyze-comprehensive・/evaluate-video-framework・/analyze-gemini-enhanced の結果を
+JSON列として保存し、動画ID・チャンネル・分析日時・total_score・vvp_score・
+viral_potential.level にインデックスを張る。ダッシュボードの再表示は
+パイプラインの再実行ではなくインデックス検索で済む。
+
+環境変数:
+    CLIPERS_RESULT_DB  SQLiteファイルのパス（既定: backend/data/results.sqlite3）
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from config import get_result_db_path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analysis_results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    video_id TEXT NOT NULL,
+    analysis_type TEXT NOT NULL,
+    channel TEXT,
+    title TEXT,
+    analyzed_at TEXT NOT NULL,
+    total_score REAL,
+    vvp_score REAL,
+    viral_level TEXT,
+    options TEXT NOT NULL DEFAULT '{}' CHECK (json_valid(options)),
+    result TEXT NOT NULL CHECK (json_valid(result))
+);
+CREATE INDEX IF NOT EXISTS idx_results_video ON analysis_results (video_id, analyzed_at DESC);
+CREATE INDEX IF NOT EXISTS idx_results_channel ON analysis_results (channel, analyzed_at DESC);
+CREATE INDEX IF NOT EXISTS idx_results_analyzed_at ON analysis_results (analyzed_at);
+CREATE INDEX IF NOT EXISTS idx_results_total_score ON analysis_results (total_score);
+CREATE INDEX IF NOT EXISTS idx_results_vvp_score ON analysis_results (vvp_score);
+CREATE INDEX IF NOT EXISTS idx_results_viral_level ON analysis_results (viral_level);
+"""
+
+SUMMARY_COLUMNS = ("id", "video_id", "analysis_type", "channel", "title", "analyzed_at",
+                   "total_score", "vvp_score", "viral_level")
+
+DEFAULT_LIST_LIMIT = 50
+MAX_LIST_LIMIT = 500
+
+
+def extract_scores(analysis_type: str, result: Dict) -> Dict:
+    """エンドポイントごとの結果JSONからインデックス用のスコアを取り出す"""
+    total_score = vvp_score = viral_level = None
+    if analysis_type == "evaluate-video-framework":
+        evaluation = result.get("evaluation_result") or {}
+        total_score = evaluation.get("total_score")
+        vvp_score = evaluation.get("vvp_score")
+        viral_level = (evaluation.get("viral_potential") or {}).get("level")
+    elif analysis_type == "analyze-comprehensive":
+        total_score = (result.get("comprehensive_analysis") or {}).get("comprehensive_score")
+    elif analysis_type == "analyze-gemini-enhanced":
+        total_score = (result.get("original_analysis") or {}).get("comprehensive_score")
+        vvp_score = result.get("vvp_score")
+    return {"total_score": total_score, "vvp_score": vvp_score, "viral_level": viral_level}
+
+
+class ResultStore:
+    """
+    分析結果のSQLiteストア（スレッドごとに接続を持つ）
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or get_result_db_path()
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        with self._init_lock:
+            if not self._initialized:
+                connection.executescript(SCHEMA)
+                self._initialized = True
+        return connection
+
+    def save(self, video_id: str, analysis_type: str, result: Dict, channel: Optional[str] = None,
+             title: Optional[str] = None, options: Optional[Dict] = None,
+             analyzed_at: Optional[str] = None) -> int:
+        """結果を保存してIDを返す（resultはJSON化可能なdict）"""
+        scores = extract_scores(analysis_type, result)
+        connection = self._connection()
+        with connection:
+            cursor = connection.execute(
+                "INSERT INTO analysis_results (video_id, analysis_type, channel, title, analyzed_at,"
+                " total_score, vvp_score, viral_level, options, result)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    video_id, analysis_type, channel, title,
+                    analyzed_at or datetime.now().isoformat(),
+                    scores["total_score"], scores["vvp_score"], scores["viral_level"],
+                    json.dumps(options or {}, ensure_ascii=False, default=str),
+                    json.dumps(result, ensure_ascii=False, default=str)
+                )
+            )
+        return cursor.lastrowid
+
+    def get_for_video(self, video_id: str, analysis_type: Optional[str] = None,
+                      limit: int = 10) -> List[Dict]:
+        """動画IDの結果を新しい順に取得（結果JSONを含む）"""
+        query = "SELECT * FROM analysis_results WHERE video_id = ?"
+        params: List = [video_id]
+        if analysis_type:
+            query += " AND analysis_type = ?"
+            params.append(analysis_type)
+        query += " ORDER BY analyzed_at DESC LIMIT ?"
+        params.append(min(max(1, limit), MAX_LIST_LIMIT))
+        return [self._row_to_dict(row, include_result=True)
+                for row in self._connection().execute(query, params)]
+
+    def query(self, min_vvp: Optional[float] = None, min_total: Optional[float] = None,
+              channel: Optional[str] = None, since: Optional[str] = None,
+              viral_level: Optional[str] = None, analysis_type: Optional[str] = None,
+              limit: int = DEFAULT_LIST_LIMIT, include_result: bool = False) -> List[Dict]:
+        """条件に一致する結果を新しい順に取得（既定では結果JSONを含まない要約のみ）"""
+        conditions, params = [], []
+        if min_vvp is not None:
+            conditions.append("vvp_score >= ?")
+            params.append(min_vvp)
+        if min_total is not None:
+            conditions.append("total_score >= ?")
+            params.append(min_total)
+        if channel:
+            conditions.append("channel = ?")
+            params.append(channel)
+        if since:
+            conditions.append("analyzed_at >= ?")
+            params.append(since)
+        if viral_level:
+            conditions.append("viral_level = ?")
+            params.append(viral_level)
+        if analysis_type:
+            conditions.append("analysis_type = ?")
+            params.append(analysis_type)
+
+        columns = "*" if include_result else ", ".join(SUMMARY_COLUMNS)
+        query = f"SELECT {columns} FROM analysis_results"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY analyzed_at DESC LIMIT ?"
+        params.append(min(max(1, limit), MAX_LIST_LIMIT))
+        return [self._row_to_dict(row, include_result=include_result)
+                for row in self._connection().execute(query, params)]
+
+    def _row_to_dict(self, row: sqlite3.Row, include_result: bool) -> Dict:
+        record = {key: row[key] for key in SUMMARY_COLUMNS}
+        if include_result:
+            record["options"] = json.loads(row["options"])
+            record["result"] = json.loads(row["result"])
+        return record
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+result_store = ResultStore()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+本番用の起動スクリプト
+
+- 自動リロードなしでuvicornを起動する（開発時は run_server.py / start_server.py）
+- チャート・タイムライン・ダウンロードジョブ・アドミッション制御・レート制限・ライブセッションなどは
+  プロセスごとの状態のため、既定は1ワーカー。複数ワーカーにする場合は同じクライアントの
+  リクエストが同じワーカーに届くようにする（スティッキーセッション）こと
+- 各ワーカーはリクエストを受け付ける前に合成音声で分析経路をウォームアップする（warmup.py）
+
+使い方:
+    python serve.py --host 0.0.0.0 --port 8000
+"""
+import argparse
+import os
+import sys
+
+import uvicorn  # type: ignore
+
+# 現在のディレクトリをPythonパスに追加
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, current_dir)
+
+from config import get_worker_count  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clipersバックエンドの本番起動")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="ワーカー数（既定: CLIPERS_WORKERS、未設定の場合は1）")
+    parser.add_argument("--no-warmup", action="store_true", help="起動時のウォームアップを行わない")
+    args = parser.parse_args()
+
+    # ワーカープロセスは環境変数を引き継ぐ
+    os.environ["CLIPERS_WARMUP"] = "0" if args.no_warmup else "1"
+
+    uvicorn.run(
+        "main_enhanced:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers or get_worker_count(),
+        reload=False,
+        # リクエストログはアプリのミドルウェアが request_id 付きで出力する
+        access_log=False
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+同一リクエストの合流（single-flight）
+
+同じキー（動画ID・分析種別・オプション）のリクエストが処理中の場合、後続のリクエストは
+新たに計算を始めず、先行リクエスト（リーダー）の計算結果を待って共有する。
+計算はリーダーのリクエストから独立したタスクとして実行されるため、
+リーダーのクライアントが切断しても待機中のリクエストには結果が届く。
+"""
+import asyncio
+import copy
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from metrics import registry
+
+SINGLEFLIGHT_REQUESTS = registry.counter(
+    "clipers_singleflight_requests_total", "Requests by single-flight role (leader starts the work, waiter shares it)",
+    ["endpoint", "role"])
+SINGLEFLIGHT_INFLIGHT = registry.gauge(
+    "clipers_singleflight_inflight", "Computations currently in flight", ["endpoint"])
+SINGLEFLIGHT_WAITERS = registry.histogram(
+    "clipers_singleflight_waiters", "Number of waiters that shared each computation", ["endpoint"],
+    buckets=(0, 1, 2, 5, 10, 25, 50, 100))
+
+
+class _Call:
+    def __init__(self, task: "asyncio.Task"):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    キーごとに処理中の計算を1つに保つ（イベントループ上でのみ使用）
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, _Call] = {}
+
+    async def do(self, endpoint: str, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        キーの計算が処理中ならその結果を待ち、なければfnを実行する
+
+        Returns:
+            (結果のコピー, 他のリクエストの計算を共有したか)
+        """
+        call = self._calls.get(key)
+        shared = call is not None
+        if shared:
+            call.waiters += 1
+            SINGLEFLIGHT_REQUESTS.inc(endpoint=endpoint, role="waiter")
+        else:
+            SINGLEFLIGHT_REQUESTS.inc(endpoint=endpoint, role="leader")
+            task = asyncio.ensure_future(self._run(endpoint, key, fn))
+            # 全員がキャンセルされた場合に「例外が取得されなかった」警告を出さない
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            call = self._calls[key] = _Call(task)
+
+        # 待機側のキャンセルが共有の計算をキャンセルしないようにshieldする
+        result = await asyncio.shield(call.task)
+        # 呼び出し側で結果を書き換えても他のリクエストに影響しないようコピーを返す
+        return copy.deepcopy(result), shared
+
+    async def _run(self, endpoint: str, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        SINGLEFLIGHT_INFLIGHT.inc(endpoint=endpoint)
+        try:
+            return await fn()
+        finally:
+            call = self._calls.pop(key, None)
+            SINGLEFLIGHT_INFLIGHT.dec(endpoint=endpoint)
+            SINGLEFLIGHT_WAITERS.observe(call.waiters if call else 0, endpoint=endpoint)
+
+    def inflight(self) -> int:
+        return len(self._calls)
+
+
+singleflight = SingleFlight()
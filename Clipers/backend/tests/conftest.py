@@ -0,0 +1,19 @@
+import os
+import sys
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if backend_dir not in sys.path:
+    sys.path.insert(0, backend_dir)
+
+
+import pytest  # noqa: E402
+
+import config  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def derived_cache_dir(tmp_path, monkeypatch):
+    """エンベロープピラミッドなどのキャッシュをテストごとの一時ディレクトリに書き出す"""
+    path = tmp_path / "cache"
+    monkeypatch.setattr(config, "DERIVED_CACHE_DIR", str(path))
+    return path
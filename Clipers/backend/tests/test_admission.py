@@ -0,0 +1,93 @@
+"""
+アドミッション制御とレート制限のテスト
+"""
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, AdmissionRejected, client_id_for, DSP
+
+
+def controller(**limits):
+    values = {"max_concurrent": 1, "max_queue": 1, "queue_timeout": 5.0, "rate": 0, "burst": 1}
+    values.update(limits)
+    return AdmissionController({DSP: values})
+
+
+def test_concurrency_limit_queues_in_order_and_rejects_when_full():
+    admission = controller(max_concurrent=1, max_queue=2)
+    order = []
+
+    async def job(name):
+        admitted_at = await admission.acquire(DSP)
+        order.append(name)
+        await asyncio.sleep(0.01)
+        admission.release(DSP, admitted_at)
+
+    async def scenario():
+        jobs = [asyncio.ensure_future(job(name)) for name in ("a", "b", "c", "d")]
+        return await asyncio.gather(*jobs, return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert order == ["a", "b", "c"]
+    assert isinstance(results[3], AdmissionRejected)
+    assert results[3].reason == "queue_full"
+    assert results[3].retry_after >= 1
+    assert admission.snapshot()[DSP]["active"] == 0
+
+
+def test_queue_timeout_rejects_and_frees_the_queue():
+    admission = controller(queue_timeout=0.02)
+
+    async def scenario():
+        held = await admission.acquire(DSP)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire(DSP)
+        admission.release(DSP, held)
+        return rejected.value
+
+    assert asyncio.run(scenario()).reason == "queue_timeout"
+    assert admission.snapshot()[DSP]["queued"] == 0
+
+
+def test_raising_the_limit_wakes_waiters():
+    admission = controller()
+
+    async def scenario():
+        await admission.acquire(DSP)
+        waiter = asyncio.ensure_future(admission.acquire(DSP))
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        admission.update_limits({DSP: {"max_concurrent": 2}})
+        await asyncio.wait_for(waiter, timeout=1)
+        return admission.snapshot()[DSP]["active"]
+
+    assert asyncio.run(scenario()) == 2
+
+
+def test_invalid_limit_updates_are_not_applied():
+    admission = controller()
+    with pytest.raises(ValueError):
+        admission.update_limits({DSP: {"max_concurrent": 3}, "download": {"unknown": 1}})
+    with pytest.raises(ValueError):
+        admission.update_limits({DSP: {"max_queue": -1}})
+    assert admission.snapshot()[DSP]["limits"]["max_concurrent"] == 1
+
+
+def test_rate_limit_per_client():
+    admission = controller(rate=0.001, burst=2)
+    admission.check_rate(DSP, "ip:1")
+    admission.check_rate(DSP, "ip:1")
+    with pytest.raises(AdmissionRejected) as rejected:
+        admission.check_rate(DSP, "ip:1")
+    assert rejected.value.reason == "rate_limited"
+    assert rejected.value.retry_after > 1
+    # 別のクライアントは別のバケット
+    admission.check_rate(DSP, "ip:2")
+
+
+def test_client_id_hashes_api_keys():
+    client_id = client_id_for("secret-api-key", address="10.0.0.1")
+    assert client_id.startswith("key:") and "secret" not in client_id
+    assert client_id == client_id_for("secret-api-key", address="10.0.0.2")
+    assert client_id_for(None, address="10.0.0.1") == "ip:10.0.0.1"
@@ -0,0 +1,54 @@
+"""
+チャンク並列DSPのテスト（チャンクに分けて計算した結果が全体を一度に計算した結果と一致すること）
+"""
+import librosa
+import numpy as np
+import pytest
+
+from benchmarks.fixtures import synthetic_audio
+from chunked_dsp import FrameFeatureRunner, FramePlan
+from improved_audio_analyzer import ImprovedAudioAnalyzer
+
+SR = 22050
+PLAN = FramePlan(sr=SR, frame_length=551, hop_length=220, n_fft=2048, stft_hop=512,
+                 spectral=True, high_band_hz=8000)
+
+
+@pytest.fixture(scope="module")
+def signal():
+    rng = np.random.default_rng(0)
+    t = np.arange(SR * 7) / SR
+    return (0.3 * np.sin(2 * np.pi * 440 * t) * (1 + np.sin(2 * np.pi * 0.5 * t))
+            + 0.05 * rng.standard_normal(len(t))).astype(np.float32)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_chunked_frames_match_whole_signal(signal, workers):
+    # 1秒のチャンクに分け、チャンクの境界がフレームの途中にかかるようにする
+    with FrameFeatureRunner(signal, PLAN, workers=workers, chunk_seconds=1.0) as runner:
+        rms = runner.rms()
+        stft = runner.stft_features([(0, runner.n_stft)])
+        assert runner.chunks > 2
+    expected_rms = librosa.feature.rms(y=signal, frame_length=PLAN.frame_length, hop_length=PLAN.hop_length)[0]
+    np.testing.assert_allclose(rms, expected_rms, rtol=1e-5, atol=1e-7)
+
+    spectrum = np.abs(librosa.stft(signal, n_fft=PLAN.n_fft, hop_length=PLAN.stft_hop))
+    pitches, _ = librosa.piptrack(S=spectrum, sr=SR)
+    assert stft["computed"].all()
+    np.testing.assert_allclose(stft["pitch_mean"], np.mean(pitches, axis=0), rtol=1e-4, atol=1e-3)
+    np.testing.assert_allclose(stft["spectral_centroid"],
+                               librosa.feature.spectral_centroid(S=spectrum, sr=SR)[0], rtol=1e-4, atol=1e-2)
+
+
+def test_chunked_analysis_matches_serial(tmp_path):
+    path = synthetic_audio("speech", 0.2, fixture_dir=str(tmp_path))
+    serial = ImprovedAudioAnalyzer(dsp_workers=1).analyze_audio_accurate(path)
+    chunked = ImprovedAudioAnalyzer(dsp_workers=2, parallel_min_seconds=0, chunk_seconds=2.0).analyze_audio_accurate(path)
+    assert serial["analysis_metadata"]["execution"]["mode"] == "serial"
+    assert chunked["analysis_metadata"]["execution"]["mode"] == "chunked"
+    assert chunked["analysis_metadata"]["execution"]["chunks"] > 2
+    for key in ("volume_analysis", "pitch_analysis"):
+        assert chunked[key] == pytest.approx(serial[key], rel=1e-4)
+    assert [p["time"] for p in chunked["excitement_points"]] == [p["time"] for p in serial["excitement_points"]]
+    assert [(c["start"], c["end"]) for c in chunked["clip_candidates"]] == \
+        [(c["start"], c["end"]) for c in serial["clip_candidates"]]
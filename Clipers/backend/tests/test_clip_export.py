@@ -0,0 +1,28 @@
+"""
+クリップの書き出しのテスト（合成音声のWAVを使い、ネットワーク不要）
+"""
+import os
+
+import numpy as np
+import soundfile as sf
+
+from clip_export import ClipSegment, export_clips, media_duration
+
+
+def test_clips_are_sample_accurate(tmp_path):
+    sr = 16000
+    samples = (np.arange(sr * 4) % 1000 / 1000.0 - 0.5).astype(np.float32)
+    source = str(tmp_path / "source.wav")
+    sf.write(source, samples, sr, subtype="PCM_16")
+    assert media_duration(source) == 4.0
+
+    segments = [ClipSegment(start=0.5, end=1.25), ClipSegment(start=2.0, end=4.0)]
+    result = export_clips(source, segments, clip_dir=str(tmp_path / "clips"), workers=2)
+    source_pcm, _ = sf.read(source, dtype="int16")
+    for segment, clip in zip(segments, result["clips"]):
+        assert "error" not in clip
+        clip_pcm, clip_sr = sf.read(os.path.join(tmp_path, "clips", result["export_id"], clip["filename"]),
+                                    dtype="int16")
+        start, end = int(segment.start * sr), int(segment.end * sr)
+        assert clip_sr == sr
+        np.testing.assert_array_equal(clip_pcm, source_pcm[start:end])
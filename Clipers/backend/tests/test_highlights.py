@@ -0,0 +1,82 @@
+"""
+盛り上がりポイント・クリップ候補の選択のテスト（合成したスコア列を使用）
+"""
+import numpy as np
+
+from highlights import clip_candidates, select_peaks
+
+
+def curve_of(score):
+    return {"score": score, "volume": score, "pitch": None, "comments": None}
+
+
+def test_select_peaks_enforces_min_separation():
+    rng = np.random.default_rng(0)
+    score = rng.uniform(0.1, 1.0, 5000)
+    peaks = select_peaks(score, min_separation=50, top_k=20)
+    assert len(peaks) == 20
+    assert np.min(np.diff(np.sort(peaks))) > 50
+    # スコアの高い順
+    assert np.all(np.diff(score[peaks]) <= 0)
+
+
+def test_select_peaks_keeps_one_of_equal_adjacent_peaks():
+    # 同じ高さのピークが最小間隔以内に並ぶ場合は先に現れた1件のみ
+    score = np.zeros(100)
+    score[[20, 25, 60]] = 1.0
+    score[90] = 0.5
+    assert select_peaks(score, min_separation=10, top_k=5).tolist() == [20, 60, 90]
+
+
+def test_select_peaks_returns_the_strongest_peaks():
+    score = np.zeros(1000)
+    heights = {100: 0.3, 300: 0.9, 500: 0.6, 700: 0.8, 900: 0.04}
+    for index, height in heights.items():
+        score[index] = height
+    assert select_peaks(score, min_separation=20, top_k=3).tolist() == [300, 700, 500]
+    # 最低スコア未満のピークは選ばない
+    assert 900 not in select_peaks(score, min_separation=20, top_k=10).tolist()
+
+
+def test_overlapping_peak_falls_back_to_a_shorter_window():
+    # 背景（0 / 0.2の交互）の後に、近接する2つの盛り上がり（45〜55秒と60〜75秒）
+    score = np.tile([0.0, 0.2], 100)
+    score[90:110] = 0.8
+    score[120:150] = 1.0
+    candidates = clip_candidates(curve_of(score), 0.5, 7.5, 20, 3)
+    # 2つ目の盛り上がりの最良の窓（20秒）は1つ目の候補と重なるため、重ならない範囲で最良の長さにする
+    assert [(c["start"], c["end"]) for c in candidates] == [(60.0, 75.0), (45.0, 55.0)]
+
+
+def test_clip_windows_stay_within_length_range_and_do_not_overlap():
+    rng = np.random.default_rng(1)
+    score = rng.uniform(0.0, 0.3, 7200)  # 0.5秒ホップで1時間
+    for start in rng.choice(7000, 12, replace=False):
+        score[start:start + rng.integers(10, 200)] += rng.uniform(0.5, 1.0)
+    candidates = clip_candidates(curve_of(score), 0.5, 15, 60, 8)
+    assert len(candidates) == 8
+    for candidate in candidates:
+        assert 15 <= candidate["duration"] <= 60
+    windows = sorted((c["start"], c["end"]) for c in candidates)
+    assert all(end <= next_start for (_, end), (next_start, _) in zip(windows, windows[1:]))
+    assert [c["rank"] for c in candidates] == list(range(1, 9))
+    assert all(a["score"] >= b["score"] for a, b in zip(candidates, candidates[1:]))
+
+
+def test_clip_window_fits_the_peak_within_the_range():
+    # 背景より高い20秒の区間は、15〜60秒の範囲でその20秒だけを候補にする
+    score = np.tile([0.0, 0.2], 200)
+    score[200:240] = 1.0
+    candidates = clip_candidates(curve_of(score), 0.5, 15, 60, 3)
+    assert (candidates[0]["start"], candidates[0]["end"]) == (100.0, 120.0)
+    # 最短より短い盛り上がりは最短の長さに広げ、最長より長い盛り上がりは最長で切る
+    short = clip_candidates(curve_of(score), 0.5, 30, 60, 1)[0]
+    assert short["duration"] == 30 and short["start"] <= 100.0 and short["end"] >= 120.0
+    long = clip_candidates(curve_of(score), 0.5, 5, 10, 1)[0]
+    assert long["duration"] == 10 and 100.0 <= long["start"] and long["end"] <= 120.0
+
+
+def test_audio_shorter_than_min_length_is_a_single_candidate():
+    score = np.linspace(0.0, 1.0, 20)  # 10秒
+    candidates = clip_candidates(curve_of(score), 0.5, 15, 60, 3)
+    assert [(c["start"], c["end"]) for c in candidates] == [(0.0, 10.0)]
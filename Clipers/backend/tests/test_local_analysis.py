@@ -0,0 +1,119 @@
+"""
+/analyze-upload・/analyze-local のテスト（合成音声のWAVを使い、ネットワーク不要）
+"""
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import config
+import main_enhanced
+from admission import AdmissionController, DSP
+from benchmarks.fixtures import synthetic_audio
+
+
+@pytest.fixture
+def upload_dir(tmp_path, monkeypatch):
+    path = tmp_path / "uploads"
+    monkeypatch.setattr(config, "UPLOAD_DIR", str(path))
+    # 映像特徴量は動画ファイルのみが対象のため、WAVのテストでは無効化しても結果は変わらない
+    monkeypatch.setattr(config, "VISUAL_FEATURES", "0")
+    return path
+
+
+@pytest.fixture
+def media_dir(tmp_path, monkeypatch):
+    path = tmp_path / "media"
+    path.mkdir()
+    monkeypatch.setattr(config, "LOCAL_MEDIA_ROOTS", str(path))
+    return path
+
+
+@pytest.fixture
+def wav_path(tmp_path):
+    return synthetic_audio("speech", 0.1, fixture_dir=str(tmp_path / "fixtures"))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # テストごとにレート制限・実行枠をリセットする
+    monkeypatch.setattr(main_enhanced, "admission", AdmissionController())
+    return TestClient(main_enhanced.app)
+
+
+def scratch_dirs(upload_dir):
+    return sorted(os.listdir(upload_dir)) if upload_dir.exists() else []
+
+
+def upload(client, wav_path, **data):
+    with open(wav_path, "rb") as f:
+        return client.post("/analyze-upload", files={"file": ("speech.wav", f, "audio/wav")}, data=data)
+
+
+def test_analyze_upload_wav(client, upload_dir, wav_path):
+    response = upload(client, wav_path, analysis_profile="speech-fast", highlight_count="3")
+    assert response.status_code == 200
+    body = response.json()
+    assert body["source"]["source"] == "upload"
+    assert body["source"]["extracted"] is False
+    assert body["source"]["duration"] == pytest.approx(6.0, abs=0.01)
+    assert len(body["audio_analysis"]["excitement_points"]) <= 3
+    assert scratch_dirs(upload_dir) == [body["source"]["upload_id"]]
+
+
+def test_analyze_upload_framework(client, upload_dir, wav_path):
+    response = upload(client, wav_path, pipeline="framework")
+    assert response.status_code == 200
+    evaluation = response.json()["evaluation_result"]
+    assert "total_score" in evaluation
+
+
+def test_upload_with_invalid_options_is_not_written(client, upload_dir, wav_path):
+    assert upload(client, wav_path, analysis_profile="unknown").status_code == 400
+    assert upload(client, wav_path, highlight_count="0").status_code == 400
+    assert scratch_dirs(upload_dir) == []
+
+
+def test_rate_limited_upload_is_not_written(client, upload_dir, wav_path, monkeypatch):
+    monkeypatch.setattr(main_enhanced, "admission", AdmissionController({DSP: {"rate": 0.001, "burst": 1}}))
+    assert upload(client, wav_path).status_code == 200
+    response = upload(client, wav_path)
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+    assert len(scratch_dirs(upload_dir)) == 1
+
+
+def test_oversized_upload_is_rejected_before_parsing(client, upload_dir, wav_path, monkeypatch):
+    monkeypatch.setattr(config, "UPLOAD_MAX_MB", "0.01")
+    assert os.path.getsize(wav_path) > 0.01 * 1024 * 1024 + 64 * 1024
+    assert upload(client, wav_path).status_code == 413
+    assert scratch_dirs(upload_dir) == []
+
+
+def test_upload_without_content_length_is_rejected(client, upload_dir):
+    response = client.post("/analyze-upload", content=iter([b"--boundary--\r\n"]),
+                           headers={"Content-Type": "multipart/form-data; boundary=boundary"})
+    assert response.status_code == 411
+    assert scratch_dirs(upload_dir) == []
+
+
+def test_failed_analysis_removes_upload(client, upload_dir, wav_path, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("analysis failed")
+    monkeypatch.setattr(main_enhanced.improved_analyzer, "analyze_audio_accurate", fail)
+    assert upload(client, wav_path).status_code == 400
+    assert scratch_dirs(upload_dir) == []
+
+
+def test_analyze_local_path(client, upload_dir, media_dir, wav_path, tmp_path):
+    local_path = media_dir / "speech.wav"
+    local_path.write_bytes(open(wav_path, "rb").read())
+    response = client.post("/analyze-local", json={"path": str(local_path)})
+    assert response.status_code == 200
+    assert response.json()["source"]["source"] == "local"
+    # エンベロープピラミッドなどはメディアのディレクトリに書き込まない
+    assert os.listdir(media_dir) == ["speech.wav"]
+
+    assert client.post("/analyze-local", json={"path": str(media_dir / "missing.wav")}).status_code == 404
+    assert client.post("/analyze-local", json={"path": wav_path}).status_code == 403
+    assert client.post("/analyze-local", json={"path": str(media_dir / ".." / "fixtures" / "x.wav")}).status_code == 403
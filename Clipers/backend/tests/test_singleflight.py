@@ -0,0 +1,96 @@
+"""
+リクエストの合流（single-flight）のテスト
+"""
+import asyncio
+
+import main_enhanced
+from singleflight import SingleFlight
+
+
+def test_concurrent_requests_share_one_computation():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"value": [1, 2, 3]}
+
+    async def scenario():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("test", "key", compute) for _ in range(5)))
+        return flight, results
+
+    flight, results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert [shared for _, shared in results] == [False, True, True, True, True]
+    assert all(result == {"value": [1, 2, 3]} for result, _ in results)
+    # 呼び出し側で書き換えても他のリクエストの結果に影響しない
+    results[0][0]["value"].append(4)
+    assert results[1][0]["value"] == [1, 2, 3]
+    assert flight.inflight() == 0
+
+
+def test_different_keys_and_later_requests_compute_separately():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return len(calls)
+
+    async def scenario():
+        flight = SingleFlight()
+        await asyncio.gather(flight.do("test", "a", compute), flight.do("test", "b", compute))
+        # 完了後の同じキーのリクエストは新たに計算する
+        return await flight.do("test", "a", compute)
+
+    assert asyncio.run(scenario()) == (3, False)
+    assert len(calls) == 3
+
+
+def test_errors_reach_every_waiter_and_clear_the_key():
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def scenario():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("test", "key", fail) for _ in range(3)), return_exceptions=True)
+        return flight, results
+
+    flight, results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.inflight() == 0
+
+
+def test_cancelled_leader_does_not_cancel_the_shared_computation():
+    async def compute():
+        await asyncio.sleep(0.05)
+        return "done"
+
+    async def scenario():
+        flight = SingleFlight()
+        leader = asyncio.ensure_future(flight.do("test", "key", compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(flight.do("test", "key", compute))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await waiter, leader
+
+    (result, shared), leader = asyncio.run(scenario())
+    assert (result, shared) == ("done", True)
+    assert leader.cancelled()
+
+
+def test_coalescing_key_separates_api_keys_without_storing_them():
+    def key(**fields):
+        return main_enhanced.coalescing_key("analyze", main_enhanced.AudioAnalysisRequest(
+            url="https://www.youtube.com/watch?v=abcdefghijk", **fields))
+
+    assert key(youtube_api_key="key-one") == key(youtube_api_key="key-one")
+    assert key(youtube_api_key="key-one") != key(youtube_api_key="key-two")
+    assert key(youtube_api_key="key-one") != key()
+    assert "key-one" not in key(youtube_api_key="key-one")
+    # 結果に影響しないオプションは区別しない
+    assert key(include_timings=True) == key()
+    assert key(max_audio_seconds=30) != key()
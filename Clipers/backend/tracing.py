@@ -0,0 +1,146 @@
+"""
+パイプラインのステージ計測（スパン）
+
+各ステージをspan()で囲むと、wall時間・CPU時間・ダウンロードバイト数・ピークRSSの増分を記録し、
+Prometheusヒストグラム（/metrics）に反映する。リクエスト単位のトレースが開始されている場合は
+スパンの一覧をレスポンスの timings ブロックとして取り出せる。
+"""
+import contextvars
+import functools
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from metrics import registry
+
+STAGE_DURATION = registry.histogram(
+    "clipers_stage_duration_seconds", "Wall time of each pipeline stage", ["stage"])
+STAGE_CPU = registry.histogram(
+    "clipers_stage_cpu_seconds", "CPU time (calling thread) of each pipeline stage", ["stage"])
+STAGE_BYTES = registry.counter(
+    "clipers_stage_downloaded_bytes_total", "Bytes downloaded by each pipeline stage", ["stage"])
+STAGE_RSS = registry.histogram(
+    "clipers_stage_peak_rss_delta_bytes", "Increase of process peak RSS during each stage", ["stage"],
+    buckets=(1e6, 1e7, 5e7, 1e8, 2.5e8, 5e8, 1e9, 2e9))
+STAGE_ERRORS = registry.counter(
+    "clipers_stage_errors_total", "Exceptions raised inside each pipeline stage", ["stage"])
+REQUEST_DURATION = registry.histogram(
+    "clipers_http_request_duration_seconds", "Wall time of each HTTP request", ["method", "route", "status"])
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("clipers_trace", default=None)
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # LinuxはKB単位、macOSはバイト単位
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Span:
+    """1ステージの計測結果"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.bytes = 0
+        self.rss_delta_bytes = 0
+        self.error: Optional[str] = None
+
+    def add_bytes(self, amount: int):
+        self.bytes += int(amount)
+
+    def to_dict(self) -> Dict:
+        result = {
+            "stage": self.name,
+            "wall_seconds": round(self.wall_seconds, 4),
+            "cpu_seconds": round(self.cpu_seconds, 4),
+            "peak_rss_delta_mb": round(self.rss_delta_bytes / 1e6, 2)
+        }
+        if self.bytes:
+            result["bytes"] = self.bytes
+        if self.error:
+            result["error"] = self.error
+        return result
+
+
+class Trace:
+    """1リクエスト分のスパンの集まり"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.spans: List[Span] = []
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            spans = [span.to_dict() for span in self.spans]
+        return {
+            "total_seconds": round(time.perf_counter() - self.started, 4),
+            "stages": spans
+        }
+
+
+def start_trace() -> Trace:
+    """現在のコンテキスト（リクエスト）でトレースを開始"""
+    trace = Trace()
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str):
+    """
+    ステージを計測するコンテキストマネージャ
+
+    Example:
+        with span("ytdlp.download") as s:
+            ...
+            s.add_bytes(downloaded)
+    """
+    current = Span(name)
+    rss_before = _peak_rss_bytes()
+    cpu_start = time.thread_time()
+    wall_start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = type(e).__name__
+        STAGE_ERRORS.inc(stage=name)
+        raise
+    finally:
+        current.wall_seconds = time.perf_counter() - wall_start
+        current.cpu_seconds = time.thread_time() - cpu_start
+        current.rss_delta_bytes = max(0, _peak_rss_bytes() - rss_before)
+
+        STAGE_DURATION.observe(current.wall_seconds, stage=name)
+        STAGE_CPU.observe(current.cpu_seconds, stage=name)
+        STAGE_RSS.observe(current.rss_delta_bytes, stage=name)
+        if current.bytes:
+            STAGE_BYTES.inc(current.bytes, stage=name)
+
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.add(current)
+
+
+def traced(name: str) -> Callable:
+    """関数全体をスパンで囲むデコレータ"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
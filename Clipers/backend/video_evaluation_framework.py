@@ -8,6 +8,17 @@ import re
 from dataclasses import dataclass
 from enum import Enum
 import math
+from audio_io import load_audio
+from tracing import span
+from pillar_cache import pillar_cache, content_hash, audio_input_hash
+from voice_activity import activity_mask
+from improved_audio_analyzer import ImprovedAudioAnalyzer, cached_clip_candidates
+from config import get_activity_gating
+from visual_features import STATIC_CUT_RATE, STATIC_MOTION
+
+# 有音率がこれを下回る場合は無音区間（デッドエア）として減点する
+MIN_SPEECH_RATIO = 0.6
+DEAD_AIR_MAX_PENALTY = 10
 
 class EvaluationPillar(Enum):
     TECHNICAL_QUALITY = "technical_quality"
@@ -25,7 +36,14 @@ class EvaluationMetrics:
     recommendations: List[str]
 
 class VideoEvaluationFramework:
-    def __init__(self):
+    def __init__(self, audio_backend: Optional[str] = None, resample_quality: Optional[str] = None):
+        # 音声デコード設定（Noneの場合はconfigの設定値を使用）
+        self.audio_backend = audio_backend
+        self.resample_quality = resample_quality
+        # 柱ごとの評価結果のキャッシュ（入力が変わった柱だけを再計算）
+        self.pillar_cache = pillar_cache
+        # クリップ候補の算出に使う音声分析器（音量エンベロープのみ、ピラミッドは /timeline と共有）
+        self.audio_analyzer = ImprovedAudioAnalyzer(audio_backend=audio_backend, resample_quality=resample_quality)
         self.pillar_weights = {
             EvaluationPillar.TECHNICAL_QUALITY: 0.05,      # 5%
             EvaluationPillar.HOOK_EFFECTIVENESS: 0.25,     # 25%
@@ -40,12 +58,52 @@ class VideoEvaluationFramework:
         統合縦型動画最適化フレームワークによる包括的評価
         """
         try:
+            # 各柱が読む入力のハッシュ（変わっていない柱はキャッシュから取得）
+            with span("framework.input_hashes"):
+                input_hashes = {
+                    "audio": audio_input_hash(audio_file_path),
+                    "metadata": content_hash(video_metadata),
+                    "engagement": content_hash(engagement_data) if engagement_data else None
+                }
+            decode_settings = [self.audio_backend, self.resample_quality]
+            
+            pillar_inputs = {
+                EvaluationPillar.TECHNICAL_QUALITY: (
+                    [input_hashes["metadata"]],
+                    lambda: self._evaluate_technical_quality(video_metadata)),
+                EvaluationPillar.HOOK_EFFECTIVENESS: (
+                    [input_hashes["audio"], input_hashes["metadata"], decode_settings],
+                    lambda: self._evaluate_hook_effectiveness(audio_file_path, video_metadata)),
+                EvaluationPillar.NARRATIVE_RETENTION: (
+                    [input_hashes["audio"], input_hashes["metadata"], decode_settings],
+                    lambda: self._evaluate_narrative_retention(audio_file_path, video_metadata)),
+                EvaluationPillar.ENGAGEMENT_SIGNALS: (
+                    [input_hashes["engagement"], input_hashes["metadata"]],
+                    lambda: self._evaluate_engagement_signals(engagement_data, video_metadata)),
+                EvaluationPillar.PLATFORM_INTEGRITY: (
+                    [input_hashes["metadata"]],
+                    lambda: self._evaluate_platform_integrity(video_metadata, engagement_data)),
+            }
+            
             # 各柱の評価を実行
-            technical_quality = self._evaluate_technical_quality(video_metadata)
-            hook_effectiveness = self._evaluate_hook_effectiveness(audio_file_path, video_metadata)
-            narrative_retention = self._evaluate_narrative_retention(audio_file_path, video_metadata)
-            engagement_signals = self._evaluate_engagement_signals(engagement_data, video_metadata)
-            platform_integrity = self._evaluate_platform_integrity(video_metadata, engagement_data)
+            evaluations = {}
+            cached_pillars = []
+            for pillar, (inputs, evaluate) in pillar_inputs.items():
+                with span(f"framework.{pillar.value}"):
+                    evaluations[pillar], from_cache = self.pillar_cache.get_or_compute(
+                        pillar.value,
+                        self.pillar_cache.key(pillar.value, *inputs),
+                        evaluate,
+                        cacheable=lambda metrics: 'error' not in metrics.details
+                    )
+                if from_cache:
+                    cached_pillars.append(pillar.value)
+            
+            technical_quality = evaluations[EvaluationPillar.TECHNICAL_QUALITY]
+            hook_effectiveness = evaluations[EvaluationPillar.HOOK_EFFECTIVENESS]
+            narrative_retention = evaluations[EvaluationPillar.NARRATIVE_RETENTION]
+            engagement_signals = evaluations[EvaluationPillar.ENGAGEMENT_SIGNALS]
+            platform_integrity = evaluations[EvaluationPillar.PLATFORM_INTEGRITY]
             
             # 総合スコアを計算
             total_score = self._calculate_total_score([
@@ -61,8 +119,21 @@ class VideoEvaluationFramework:
                 technical_quality.score / technical_quality.max_score
             )
 
-            # Golden Clipを抽出
-            golden_clip = extract_golden_clip(engagement_data.get('hotspots', [])) if engagement_data else None
+            # クリップ候補（音量エンベロープとコメントの盛り上がりスコアの窓）からGolden Clipを抽出
+            # 音調・スペクトルを含む音声分析全体は実行しない
+            hot_timestamps = (engagement_data or {}).get('engagement_analysis', {}).get('hot_timestamps') or []
+            clip_candidates = []
+            if audio_file_path:
+                with span("framework.clip_candidates"):
+                    try:
+                        clip_candidates, _ = cached_clip_candidates(
+                            self.audio_analyzer, audio_file_path, comment_timestamps=hot_timestamps)
+                    except Exception:
+                        clip_candidates = []
+            golden_clip = extract_golden_clip(clip_candidates, [
+                {"time": timestamp["formatted_time"], "reason": f"コメントで{timestamp['mention_count']}回言及された時間"}
+                for timestamp in hot_timestamps
+            ])
             
             # バイラルポテンシャルを判定
             viral_potential = self._assess_viral_potential(total_score)
@@ -74,6 +145,7 @@ class VideoEvaluationFramework:
                 "total_score": total_score,
                 "vvp_score": vvp_score,
                 "golden_clip": golden_clip,
+                "clip_candidates": clip_candidates,
                 "viral_potential": viral_potential,
                 "pillar_evaluations": {
                     "technical_quality": technical_quality.__dict__,
@@ -86,7 +158,12 @@ class VideoEvaluationFramework:
                     technical_quality, hook_effectiveness, narrative_retention,
                     engagement_signals, platform_integrity
                 ]),
-                "platform_optimization": self._generate_platform_optimization(video_metadata)
+                "platform_optimization": self._generate_platform_optimization(video_metadata),
+                "cache": {
+                    "pillars_from_cache": cached_pillars,
+                    "pillars_recomputed": [p.value for p in pillar_inputs if p.value not in cached_pillars],
+                    "input_hashes": {name: value[:16] if value else None for name, value in input_hashes.items()}
+                }
             }
             
         except Exception as e:
@@ -136,6 +213,16 @@ class VideoEvaluationFramework:
             details['framerate'] = f"フレームレートが低い ({framerate} fps)"
             recommendations.append("フレームレートを30 fps以上に設定してください")
         
+        details['metadata_source'] = "ストリームの実測値" if video_metadata.get('metadata_source') == "stream" else "推定値"
+        
+        # 映像の変化（キーフレームの特徴量がある場合、採点には含めず推奨事項のみ）
+        visual = video_metadata.get('visual')
+        if visual and visual.get('frames'):
+            details['scene_cut_rate'] = f"{visual['scene_cut_rate_per_minute']} カット/分"
+            details['visual_motion'] = visual['motion_mean']
+            if visual['scene_cut_rate_per_minute'] < STATIC_CUT_RATE and visual['motion_mean'] < STATIC_MOTION:
+                recommendations.append("映像の変化が少ないため、カットや画面の切り替えで視覚的な変化を加えてください")
+        
         return EvaluationMetrics(
             pillar=EvaluationPillar.TECHNICAL_QUALITY,
             score=score,
@@ -189,7 +276,8 @@ class VideoEvaluationFramework:
         
         try:
             # 音声データを読み込み
-            y, sr = librosa.load(audio_file_path, sr=22050)
+            y, sr = load_audio(audio_file_path, sr=22050,
+                               backend=self.audio_backend, quality=self.resample_quality)
             duration = librosa.get_duration(y=y, sr=sr)
             
             # 最初の3秒の分析
@@ -307,11 +395,20 @@ class VideoEvaluationFramework:
         
         try:
             # 音声データを読み込み
-            y, sr = librosa.load(audio_file_path, sr=22050)
+            y, sr = load_audio(audio_file_path, sr=22050,
+                               backend=self.audio_backend, quality=self.resample_quality)
             duration = librosa.get_duration(y=y, sr=sr)
             
             # 平均視聴率の推定（音声の一貫性から）
             rms = librosa.feature.rms(y=y)[0]
+            if get_activity_gating():
+                # 一貫性は有音区間のみで評価し、無音区間は有音率として別に評価する
+                active, _ = activity_mask(20 * np.log10(np.maximum(rms, 1e-10)), 512 / sr)
+                speech_ratio = float(np.mean(active)) if len(active) else 0.0
+                if np.any(active):
+                    rms = rms[active]
+            else:
+                speech_ratio = None
             volume_consistency = 1 - (np.std(rms) / np.mean(rms))
             
             # 音量の一貫性から視聴維持率を推定
@@ -325,6 +422,15 @@ class VideoEvaluationFramework:
                 details['viewer_retention'] = "視聴維持率が低い可能性"
                 recommendations.append("音声の一貫性を向上させてください")
             
+            # 無音区間（デッドエア）の割合による減点
+            if speech_ratio is not None:
+                details['speech_ratio'] = round(speech_ratio, 3)
+                details['dead_air_ratio'] = round(1 - speech_ratio, 3)
+                if speech_ratio < MIN_SPEECH_RATIO:
+                    penalty = DEAD_AIR_MAX_PENALTY * (MIN_SPEECH_RATIO - speech_ratio) / MIN_SPEECH_RATIO
+                    score = max(0, score - penalty)
+                    recommendations.append("無音区間が長いため、無音部分をカットしてテンポを上げてください")
+            
             # 動画の長さによる評価
             if duration <= 60:  # 1分以下
                 score += 10
@@ -519,12 +625,14 @@ def calculate_vvp_score(narrative, hook, engagement, tech):
     return round(vvp, 1)
 
 
-def extract_golden_clip(hotspots):
+def extract_golden_clip(candidates, hotspots=None):
     """
-    セマンティック・ホットスポットから最重要区間（Golden Clip）を抽出
-    hotspots: [{"time": "03:12", "reason": "..."}, ...]
+    クリップ候補から最重要区間（Golden Clip）を抽出
+    candidates: highlights.clip_candidates の結果（スコアの高い順）
+    hotspots: 候補がない場合のフォールバック [{"time": "03:12", "reason": "..."}, ...]
     """
-    if not hotspots:
-        return None
-    # 最初のホットスポットをGolden Clipとする（改良可）
-    return hotspots[0] 
\ No newline at end of file
+    if candidates:
+        return candidates[0]
+    if hotspots:
+        return hotspots[0]
+    return None
@@ -0,0 +1,236 @@
+"""
+キーフレームによる映像特徴量
+
+映像は全フレームをデコードせず、ffmpegの -skip_frame nokey でキーフレームのみ
+（または一定間隔の1フレーム）を小さなグレースケール画像に縮小してパイプで受け取り、
+シーンの切り替わり（カット）の頻度・動き・明るさの変化をNumPyでまとめて計算する。
+デコードするのはキーフレームのみのため、処理時間は動画の長さの数%以下。
+
+ストリームの実際の仕様（解像度・フレームレート・ビットレート）は ffprobe、
+ffprobeがない場合は ffmpeg -i の出力から取得する。
+"""
+import json
+import math
+import re
+import shutil
+import subprocess
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import get_visual_sampling, get_visual_interval_seconds
+from tracing import span
+from logging_setup import get_logger
+
+# 縮小後の長辺（ピクセル）
+FRAME_LONG_SIDE = 64
+# 輝度ヒストグラムのビン数と、カットとみなすヒストグラム間の距離（0〜1）
+HISTOGRAM_BINS = 16
+SCENE_CUT_THRESHOLD = 0.3
+# 映像の変化が少ないとみなす基準（カット/分、フレーム間の平均輝度差）
+STATIC_CUT_RATE = 2.0
+STATIC_MOTION = 0.02
+# 返すカット時刻の最大数
+MAX_CUT_TIMES = 50
+
+SAMPLING_KEYFRAMES = "keyframes"
+SAMPLING_INTERVAL = "interval"
+
+# アスペクト比の表記（縦横比がこの誤差以内なら同じとみなす）
+COMMON_ASPECT_RATIOS = ("9:16", "16:9", "1:1", "4:5", "4:3", "3:4", "21:9")
+ASPECT_TOLERANCE = 0.02
+
+logger = get_logger("visual")
+
+
+def aspect_ratio(width: int, height: int) -> str:
+    """解像度からアスペクト比の表記を求める（一般的な比率に近い場合はその表記）"""
+    ratio = width / height
+    for name in COMMON_ASPECT_RATIOS:
+        w, h = (int(part) for part in name.split(":"))
+        if abs(ratio - w / h) <= ASPECT_TOLERANCE * (w / h):
+            return name
+    divisor = math.gcd(width, height)
+    return f"{width // divisor}:{height // divisor}"
+
+
+def _parse_fps(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    if "/" in value:
+        numerator, denominator = value.split("/")
+        return float(numerator) / float(denominator) if float(denominator) else None
+    return float(value)
+
+
+def _probe_with_ffprobe(path: str) -> Optional[Dict]:
+    result = subprocess.run([
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=codec_name,width,height,avg_frame_rate,bit_rate:format=duration,bit_rate",
+        "-of", "json", path
+    ], capture_output=True, text=True)
+    try:
+        probed = json.loads(result.stdout or "{}")
+    except ValueError:
+        return None
+    streams = probed.get("streams") or []
+    if not streams:
+        return None
+    stream, container = streams[0], probed.get("format") or {}
+    bitrate = stream.get("bit_rate") or container.get("bit_rate")
+    return {
+        "codec": stream.get("codec_name"),
+        "width": int(stream["width"]),
+        "height": int(stream["height"]),
+        "fps": _parse_fps(stream.get("avg_frame_rate")),
+        "bitrate_kbps": round(int(bitrate) / 1000) if bitrate else None,
+        "duration": float(container["duration"]) if container.get("duration") else None
+    }
+
+
+def _probe_with_ffmpeg(path: str) -> Optional[Dict]:
+    result = subprocess.run(["ffmpeg", "-hide_banner", "-nostdin", "-i", path], capture_output=True, text=True)
+    video = re.search(r"Stream #\d+:\d+.*?: Video: (\w+).*?, (\d{2,5})x(\d{2,5})[^\n]*", result.stderr)
+    if not video:
+        return None
+    line = video.group(0)
+    stream_bitrate = re.search(r"(\d+) kb/s", line)
+    container_bitrate = re.search(r"bitrate: (\d+) kb/s", result.stderr)
+    fps = re.search(r"([\d.]+) fps", line)
+    duration = re.search(r"Duration: (\d+):(\d+):([\d.]+)", result.stderr)
+    bitrate = stream_bitrate or container_bitrate
+    return {
+        "codec": video.group(1),
+        "width": int(video.group(2)),
+        "height": int(video.group(3)),
+        "fps": float(fps.group(1)) if fps else None,
+        "bitrate_kbps": int(bitrate.group(1)) if bitrate else None,
+        "duration": int(duration.group(1)) * 3600 + int(duration.group(2)) * 60 + float(duration.group(3))
+        if duration else None
+    }
+
+
+def probe_video(path: str) -> Optional[Dict]:
+    """映像ストリームの仕様（codec / width / height / fps / bitrate_kbps / duration）、映像がない場合はNone"""
+    if shutil.which("ffprobe"):
+        return _probe_with_ffprobe(path)
+    return _probe_with_ffmpeg(path)
+
+
+def stream_from_info(info: Dict) -> Optional[Dict]:
+    """yt-dlpの動画情報から最高画質の映像フォーマットの仕様を取得（音声のみを取得した場合も元の動画の仕様）"""
+    videos = [fmt for fmt in info.get("formats") or []
+              if fmt.get("vcodec") not in (None, "none") and fmt.get("width") and fmt.get("height")]
+    if not videos:
+        return None
+    best = max(videos, key=lambda fmt: (fmt["width"] * fmt["height"], fmt.get("tbr") or 0))
+    bitrate = best.get("vbr") or best.get("tbr")
+    return {
+        "codec": best.get("vcodec"),
+        "width": int(best["width"]),
+        "height": int(best["height"]),
+        "fps": best.get("fps"),
+        "bitrate_kbps": round(bitrate) if bitrate else None,
+        "duration": info.get("duration")
+    }
+
+
+def _scaled_size(width: int, height: int) -> Tuple[int, int]:
+    """長辺をFRAME_LONG_SIDEに縮小したサイズ（偶数）"""
+    scale = FRAME_LONG_SIDE / max(width, height)
+    return max(2, int(round(width * scale / 2)) * 2), max(2, int(round(height * scale / 2)) * 2)
+
+
+def sample_command(path: str, size: Tuple[int, int], sampling: str, interval_seconds: float) -> List[str]:
+    """キーフレーム（または一定間隔のフレーム）を縮小したグレースケールのrawvideoとして出力するffmpegコマンド"""
+    scale = f"scale={size[0]}:{size[1]}:flags=area,format=gray,showinfo"
+    command = ["ffmpeg", "-hide_banner", "-loglevel", "info", "-nostdin"]
+    if sampling == SAMPLING_KEYFRAMES:
+        command += ["-skip_frame", "nokey", "-i", path, "-fps_mode", "passthrough", "-vf", scale]
+    else:
+        command += ["-i", path, "-vf", f"fps=1/{interval_seconds:g}," + scale]
+    return command + ["-an", "-sn", "-dn", "-f", "rawvideo", "pipe:1"]
+
+
+def frame_features(frames: np.ndarray, times: np.ndarray, duration: float) -> Dict:
+    """
+    縮小したフレーム列（n, 高さ, 幅）のuint8からカット・動き・明るさの特徴量を計算
+
+    - カット: 隣接フレームの輝度ヒストグラムの距離（0〜1）がSCENE_CUT_THRESHOLD以上
+    - 動き: 隣接フレームの画素ごとの輝度差の平均（0〜1）
+    - 明るさ: フレームの平均輝度（0〜1）と、その隣接フレーム間の変化
+    """
+    n = len(frames)
+    pixels = frames.shape[1] * frames.shape[2] if n else 1
+    brightness = frames.reshape(n, -1).mean(axis=1) / 255.0 if n else np.zeros(0)
+    if n >= 2:
+        bins = (frames.reshape(n, -1) >> (8 - int(math.log2(HISTOGRAM_BINS)))).astype(np.int64)
+        offsets = np.arange(n)[:, None] * HISTOGRAM_BINS
+        histograms = np.bincount((bins + offsets).ravel(), minlength=n * HISTOGRAM_BINS)
+        histograms = histograms.reshape(n, HISTOGRAM_BINS) / pixels
+        distance = 0.5 * np.abs(np.diff(histograms, axis=0)).sum(axis=1)
+        motion = np.abs(np.diff(frames.astype(np.int16), axis=0)).reshape(n - 1, -1).mean(axis=1) / 255.0
+        cuts = np.flatnonzero(distance >= SCENE_CUT_THRESHOLD) + 1
+        brightness_change = np.abs(np.diff(brightness))
+        intervals = np.diff(times)
+    else:
+        motion = brightness_change = intervals = np.zeros(0)
+        cuts = np.zeros(0, dtype=int)
+
+    def stat(values: np.ndarray, function) -> float:
+        return round(float(function(values)), 4) if len(values) else 0.0
+
+    return {
+        "frames": n,
+        "sample_interval_seconds": stat(intervals, np.mean),
+        "scene_cuts": int(len(cuts)),
+        "scene_cut_rate_per_minute": round(len(cuts) / duration * 60, 2) if duration else 0.0,
+        "cut_times": [round(float(times[index]), 2) for index in cuts[:MAX_CUT_TIMES]],
+        "motion_mean": stat(motion, np.mean),
+        "motion_p90": stat(motion, lambda values: np.percentile(values, 90)),
+        "brightness_mean": stat(brightness, np.mean),
+        "brightness_change_mean": stat(brightness_change, np.mean)
+    }
+
+
+def analyze_video(path: str, sampling: Optional[str] = None,
+                  interval_seconds: Optional[float] = None) -> Optional[Dict]:
+    """
+    映像ストリームの仕様とキーフレームの特徴量
+
+    Returns:
+        {"stream": probe_videoの結果, "visual": frame_featuresの結果 + sampling / decode_seconds / realtime_ratio}
+        映像ストリームがない場合はNone
+    """
+    stream = probe_video(path)
+    if stream is None:
+        return None
+    sampling = sampling or get_visual_sampling()
+    interval_seconds = interval_seconds or get_visual_interval_seconds()
+    size = _scaled_size(stream["width"], stream["height"])
+
+    started = time.perf_counter()
+    with span("visual.keyframes") as sample_span:
+        result = subprocess.run(sample_command(path, size, sampling, interval_seconds), capture_output=True)
+        sample_span.add_bytes(len(result.stdout))
+    frame_bytes = size[0] * size[1]
+    n = len(result.stdout) // frame_bytes
+    times = np.array([float(value) for value in re.findall(rb"pts_time:\s*([-\d.]+)", result.stderr)])
+    n = min(n, len(times))
+    frames = np.frombuffer(result.stdout, dtype=np.uint8, count=n * frame_bytes).reshape(n, size[1], size[0])
+    elapsed = time.perf_counter() - started
+
+    duration = stream.get("duration") or (float(times[n - 1]) if n else 0.0)
+    with span("visual.features"):
+        visual = frame_features(frames, times[:n], duration)
+    visual.update({
+        "sampling": sampling,
+        "decode_seconds": round(elapsed, 3),
+        "realtime_ratio": round(elapsed / duration, 4) if duration else None
+    })
+    if result.returncode != 0 and n == 0:
+        visual["error"] = result.stderr.decode("utf-8", "replace").strip()[-500:]
+    logger.info("映像特徴量を計算しました", extra={
+        "frames": n, "sampling": sampling, "seconds": round(elapsed, 3), "scene_cuts": visual["scene_cuts"]})
+    return {"stream": stream, "visual": visual}
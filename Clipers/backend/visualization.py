@@ -1,134 +1,118 @@
-import matplotlib.pyplot as plt
-import numpy as np
-import librosa
-import io
+import os
 import base64
-from typing import Dict, List
-import json
+from typing import Dict, List, Optional
+from envelope_pyramid import EnvelopePyramid
+from chart_renderer import chart_cache, render_timeline_png, render_summary_png
 
 class AudioVisualizer:
-    def __init__(self):
+    def __init__(self, audio_backend: Optional[str] = None, resample_quality: Optional[str] = None):
         self.sample_rate = 22050
+        self.max_timeline_points = 2000  # タイムラインに描画する最大点数
+        # 音声デコード設定（Noneの場合はconfigの設定値を使用）
+        self.audio_backend = audio_backend
+        self.resample_quality = resample_quality
         
+    def _load_envelope(self, audio_file_path: str) -> Dict:
+        """音量の時間変化をエンベロープピラミッドから取得（表示点数に見合った解像度のみ読む）"""
+        pyramid = EnvelopePyramid.for_audio(audio_file_path, backend=self.audio_backend,
+                                             quality=self.resample_quality or "fast")
+        return pyramid.query(0, pyramid.duration, max_points=self.max_timeline_points)
+    
+    def _summary_payload(self, analysis_result: Dict) -> Dict:
+        """サマリーチャートの描画に必要な値だけを抽出"""
+        volume_analysis = analysis_result.get('volume_analysis', {})
+        excitement_points = analysis_result.get('excitement_points', [])
+        
+        point_types = {}
+        for point in excitement_points:
+            point_type = point.get('type', 'volume')
+            point_types[point_type] = point_types.get(point_type, 0) + 1
+        
+        return {
+            "excitement_score": float(analysis_result.get('overall_excitement_score', 0)),
+            "volume_metrics": {
+                "labels": ['平均音量', '最大音量', '音量変動'],
+                "values": [
+                    float(volume_analysis.get('mean_volume', 0)),
+                    float(volume_analysis.get('max_volume', 0)),
+                    float(volume_analysis.get('volume_variance', 0)) / 100  # スケール調整
+                ]
+            },
+            "excitement_points": {
+                "time": [float(p['time']) for p in excitement_points],
+                "intensity": [float(p['intensity']) for p in excitement_points]
+            },
+            "point_types": point_types
+        }
+    
+    def register_timeline_chart(self, audio_file_path: str, excitement_points: List[Dict]) -> str:
+        """
+        タイムラインチャートをキャッシュに登録し、チャートIDを返す（描画は初回取得時）
+        """
+        pyramid_path = EnvelopePyramid.path_for(audio_file_path)
+        payload = {
+            "audio": audio_file_path,
+            "pyramid_mtime": os.path.getmtime(pyramid_path) if os.path.exists(pyramid_path) else None,
+            "excitement_points": excitement_points
+        }
+        
+        def render() -> bytes:
+            envelope = self._load_envelope(audio_file_path)
+            return render_timeline_png(envelope['times'], envelope['db'], excitement_points)
+        
+        return chart_cache.register("timeline", payload, render)
+    
+    def register_summary_chart(self, analysis_result: Dict) -> str:
+        """
+        サマリーチャートをキャッシュに登録し、チャートIDを返す（描画は初回取得時）
+        """
+        payload = self._summary_payload(analysis_result)
+        return chart_cache.register("summary", payload, lambda: render_summary_png(payload))
+    
+    def build_chart_data(self, audio_file_path: str, analysis_result: Dict, max_points: int = 1000) -> Dict:
+        """
+        クライアント側で描画するための間引き済み系列データ（列指向JSON）を生成
+        """
+        pyramid = EnvelopePyramid.for_audio(audio_file_path, backend=self.audio_backend,
+                                             quality=self.resample_quality or "fast")
+        envelope = pyramid.query(0, pyramid.duration, max_points=max_points)
+        excitement_points = analysis_result.get('excitement_points', [])
+        
+        return {
+            "envelope": {
+                "resolution": float(envelope['resolution']),
+                "start": 0.0,
+                # times = start + i * resolution で復元できるため時刻列は送らない
+                "db": envelope['db'].round(1).tolist()
+            },
+            "excitement_points": {
+                "time": [float(p['time']) for p in excitement_points],
+                "intensity": [float(p['intensity']) for p in excitement_points],
+                "type": [p.get('type', 'volume') for p in excitement_points]
+            },
+            "summary": self._summary_payload(analysis_result)
+        }
+    
     def create_excitement_timeline(self, audio_file_path: str, excitement_points: List[Dict]) -> str:
         """
-        盛り上がりポイントのタイムラインを生成
+        盛り上がりポイントのタイムラインを生成（Base64）
         """
         try:
-            # 音声ファイルを読み込み
-            y, sr = librosa.load(audio_file_path, sr=self.sample_rate)
-            duration = librosa.get_duration(y=y, sr=sr)
-            
-            # 音量の時間変化を取得
-            rms = librosa.feature.rms(y=y)[0]
-            db = librosa.amplitude_to_db(rms)
-            times = librosa.times_like(db, sr=sr)
-            
-            # グラフを作成
-            fig, (ax1, ax2) = plt.subplots(2, 1, figsize=(12, 8))
-            
-            # 音量の時間変化
-            ax1.plot(times, db, alpha=0.7, color='blue', linewidth=0.5)
-            ax1.set_ylabel('音量 (dB)')
-            ax1.set_title('音声の音量変化と盛り上がりポイント')
-            ax1.grid(True, alpha=0.3)
-            
-            # 盛り上がりポイントをマーク
-            for point in excitement_points:
-                time = point['time']
-                intensity = point['intensity']
-                point_type = point.get('type', 'volume')
-                
-                color = 'red' if point_type == 'volume' else 'orange'
-                ax1.axvline(x=time, color=color, alpha=0.8, linestyle='--', linewidth=2)
-                ax1.text(time, ax1.get_ylim()[1] * 0.9, f'{time}s\n({intensity:.2f})', 
-                        rotation=90, fontsize=8, ha='right', va='top')
-            
-            # 盛り上がりポイントの強度グラフ
-            excitement_times = [p['time'] for p in excitement_points]
-            excitement_intensities = [p['intensity'] for p in excitement_points]
-            
-            if excitement_times:
-                ax2.scatter(excitement_times, excitement_intensities, 
-                           c=['red' if p.get('type') == 'volume' else 'orange' for p in excitement_points],
-                           s=100, alpha=0.7)
-                ax2.set_xlabel('時間 (秒)')
-                ax2.set_ylabel('盛り上がり強度')
-                ax2.set_title('盛り上がりポイントの強度')
-                ax2.grid(True, alpha=0.3)
-                ax2.set_ylim(0, 1.1)
-            
-            plt.tight_layout()
-            
-            # グラフをBase64エンコードして返す
-            buffer = io.BytesIO()
-            plt.savefig(buffer, format='png', dpi=150, bbox_inches='tight')
-            buffer.seek(0)
-            image_base64 = base64.b64encode(buffer.getvalue()).decode()
-            plt.close()
-            
-            return image_base64
+            chart_id = self.register_timeline_chart(audio_file_path, excitement_points)
+            png, _ = chart_cache.get(chart_id)
+            return base64.b64encode(png).decode()
             
         except Exception as e:
             return f"視覚化エラー: {str(e)}"
     
     def create_summary_chart(self, analysis_result: Dict) -> str:
         """
-        分析結果のサマリーチャートを生成
+        分析結果のサマリーチャートを生成（Base64）
         """
         try:
-            fig, ((ax1, ax2), (ax3, ax4)) = plt.subplots(2, 2, figsize=(12, 10))
-            
-            # 盛り上がりスコア
-            excitement_score = analysis_result.get('overall_excitement_score', 0)
-            ax1.bar(['盛り上がりスコア'], [excitement_score], color='red', alpha=0.7)
-            ax1.set_ylim(0, 100)
-            ax1.set_title('全体的な盛り上がりスコア')
-            ax1.set_ylabel('スコア (0-100)')
-            
-            # 音量分析
-            volume_analysis = analysis_result.get('volume_analysis', {})
-            volume_metrics = ['平均音量', '最大音量', '音量変動']
-            volume_values = [
-                volume_analysis.get('mean_volume', 0),
-                volume_analysis.get('max_volume', 0),
-                volume_analysis.get('volume_variance', 0) / 100  # スケール調整
-            ]
-            ax2.bar(volume_metrics, volume_values, color='blue', alpha=0.7)
-            ax2.set_title('音量分析')
-            ax2.set_ylabel('値')
-            
-            # 盛り上がりポイントの分布
-            excitement_points = analysis_result.get('excitement_points', [])
-            if excitement_points:
-                times = [p['time'] for p in excitement_points]
-                intensities = [p['intensity'] for p in excitement_points]
-                ax3.scatter(times, intensities, alpha=0.7, s=50)
-                ax3.set_xlabel('時間 (秒)')
-                ax3.set_ylabel('強度')
-                ax3.set_title('盛り上がりポイントの分布')
-                ax3.grid(True, alpha=0.3)
-            
-            # ポイントタイプの分布
-            point_types = {}
-            for point in excitement_points:
-                point_type = point.get('type', 'volume')
-                point_types[point_type] = point_types.get(point_type, 0) + 1
-            
-            if point_types:
-                ax4.pie(point_types.values(), labels=point_types.keys(), autopct='%1.1f%%')
-                ax4.set_title('盛り上がりポイントのタイプ分布')
-            
-            plt.tight_layout()
-            
-            # グラフをBase64エンコードして返す
-            buffer = io.BytesIO()
-            plt.savefig(buffer, format='png', dpi=150, bbox_inches='tight')
-            buffer.seek(0)
-            image_base64 = base64.b64encode(buffer.getvalue()).decode()
-            plt.close()
-            
-            return image_base64
+            chart_id = self.register_summary_chart(analysis_result)
+            png, _ = chart_cache.get(chart_id)
+            return base64.b64encode(png).decode()
             
         except Exception as e:
             return f"サマリーチャートエラー: {str(e)}"
@@ -148,7 +132,7 @@ class AudioVisualizer:
             report = {
                 "summary": {
                     "total_duration": analysis_result.get('duration', 0),
-                    "excitement_score": analysis_result.get('overall_excitement_score', 0),
+                    "excitement_score": float(analysis_result.get('overall_excitement_score', 0)),
                     "total_excitement_points": len(excitement_points),
                     "average_volume": volume_analysis.get('mean_volume', 0),
                     "max_volume": volume_analysis.get('max_volume', 0)
@@ -0,0 +1,92 @@
+"""
+エネルギーベースの音声区間検出（無音・ほぼ無音のゲート）
+
+RMSエンベロープ（dB）から有音フレームのマスクを作る。ノイズフロア（下位パーセンタイル）に
+マージンを足した値を閾値とし、-40dBFS以上は常に有音、-55dBFS未満は常に無音として扱う。
+短い途切れは埋め、短すぎる有音区間は除く。
+
+マスクは音調・スペクトルなどの重い特徴量を有音区間だけで計算するため、
+また盛り上がり検出の平均・標準偏差の閾値から無音区間を除くために使う。
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+FLOOR_PERCENTILE = 10
+MARGIN_DB = 12.0
+# 閾値の下限・上限（dBFS）
+MIN_THRESHOLD_DB = -55.0
+MAX_THRESHOLD_DB = -40.0
+# これより短い無音は有音区間に含め、これより短い有音区間は無音として扱う（秒）
+MAX_GAP_SECONDS = 0.3
+MIN_ACTIVE_SECONDS = 0.1
+
+
+def mask_to_runs(mask: np.ndarray) -> List[Tuple[int, int]]:
+    """Trueが連続する区間を[開始, 終了)のフレーム番号の一覧にする"""
+    padded = np.concatenate(([False], np.asarray(mask, dtype=bool), [False]))
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    return [(int(start), int(end)) for start, end in zip(edges[::2], edges[1::2])]
+
+
+def activity_mask(db: np.ndarray, hop_seconds: float) -> Tuple[np.ndarray, float]:
+    """
+    フレームごとのdB値から有音マスクを作る
+
+    Returns:
+        (有音マスク, 使用した閾値dB)
+    """
+    db = np.asarray(db)
+    if len(db) == 0:
+        return np.zeros(0, dtype=bool), MIN_THRESHOLD_DB
+    floor = float(np.percentile(db, FLOOR_PERCENTILE))
+    threshold = float(np.clip(floor + MARGIN_DB, MIN_THRESHOLD_DB, MAX_THRESHOLD_DB))
+    mask = db > threshold
+
+    # 短い途切れ（息継ぎ・単語間）を埋める
+    max_gap = int(round(MAX_GAP_SECONDS / hop_seconds))
+    for start, end in mask_to_runs(~mask):
+        if start > 0 and end < len(mask) and end - start <= max_gap:
+            mask[start:end] = True
+
+    # 短すぎる有音区間（クリックノイズなど）を除く
+    min_active = int(round(MIN_ACTIVE_SECONDS / hop_seconds))
+    for start, end in mask_to_runs(mask):
+        if end - start < min_active:
+            mask[start:end] = False
+    return mask, threshold
+
+
+def summarize_activity(mask: np.ndarray, hop_seconds: float, threshold_db: float) -> Dict:
+    """有音マスクを区間（秒）の一覧と有音率にまとめる"""
+    runs = mask_to_runs(mask)
+    active_frames = int(np.count_nonzero(mask))
+    return {
+        "speech_ratio": round(active_frames / len(mask), 4) if len(mask) else 0.0,
+        "active_seconds": round(active_frames * hop_seconds, 2),
+        "threshold_db": round(threshold_db, 2),
+        "segment_count": len(runs),
+        "segments": [
+            {"start": round(start * hop_seconds, 2), "end": round(end * hop_seconds, 2)}
+            for start, end in runs
+        ]
+    }
+
+
+def frames_to_frames(runs: List[Tuple[int, int]], src_hop: int, dst_hop: int, dst_frames: int) -> List[Tuple[int, int]]:
+    """
+    ホップ長の異なるフレーム系列へ区間を写す（RMSフレーム → STFTフレーム）
+
+    区間の中心サンプルを含むフレームを前後1フレーム広めに取り、重なった区間は結合する。
+    """
+    mapped: List[Tuple[int, int]] = []
+    for start, end in runs:
+        dst_start = max(0, (start * src_hop) // dst_hop - 1)
+        dst_end = min(dst_frames, -(-((end - 1) * src_hop) // dst_hop) + 2)
+        if dst_start >= dst_end:
+            continue
+        if mapped and dst_start <= mapped[-1][1]:
+            mapped[-1] = (mapped[-1][0], max(mapped[-1][1], dst_end))
+        else:
+            mapped.append((dst_start, dst_end))
+    return mapped
@@ -0,0 +1,87 @@
+"""
+ワーカープロセスのウォームアップと起動時間の計測
+
+librosaはサブモジュールを初回使用時に読み込み、numbaの関数も初回呼び出し時にJITコンパイルされるため、
+何もしないと最初の分析リクエストが数秒余計にかかる。起動時に短い合成音声で各分析プロファイルの
+分析とチャート描画を一度実行し、リクエストを受け付ける前にこれらのコストを払っておく。
+
+起動時間（モジュール読み込み・ウォームアップ）は clipers_startup_seconds{phase} として /metrics に出力する。
+"""
+import os
+import shutil
+import tempfile
+import time
+from typing import Dict
+
+from metrics import registry
+from logging_setup import get_logger
+
+WARMUP_SECONDS = 3.0
+WARMUP_SAMPLE_RATE = 44100
+
+STARTUP_SECONDS = registry.gauge(
+    "clipers_startup_seconds", "Time spent in each startup phase of this worker", ["phase"])
+WARMUP_READY = registry.gauge(
+    "clipers_warmup_completed", "1 once this worker has finished warming up")
+
+logger = get_logger("startup")
+
+
+def record_startup_phase(phase: str, seconds: float):
+    """起動フェーズの所要時間を記録"""
+    STARTUP_SECONDS.set(seconds, phase=phase)
+    logger.info("startup phase", extra={"phase": phase, "seconds": round(seconds, 3)})
+
+
+def _synthetic_audio(path: str):
+    """ウォームアップ用の合成音声（倍音 + 大音量区間 + ノイズ、ステレオ）を書き出す"""
+    import numpy as np
+    import soundfile as sf  # type: ignore
+
+    t = np.arange(int(WARMUP_SECONDS * WARMUP_SAMPLE_RATE)) / WARMUP_SAMPLE_RATE
+    rng = np.random.default_rng(0)
+    loud = 1.0 + 4.0 * (t > WARMUP_SECONDS * 0.6)
+    y = 0.05 * loud * (np.sin(2 * np.pi * 220 * t) + 0.5 * np.sin(2 * np.pi * 440 * t))
+    y = y + 0.005 * rng.standard_normal(len(t))
+    stereo = np.stack([y, 0.8 * y], axis=1).astype(np.float32)
+    sf.write(path, stereo, WARMUP_SAMPLE_RATE)
+
+
+def warm_up() -> Dict[str, float]:
+    """
+    合成音声で各分析プロファイルの分析とチャート描画を実行し、ステップごとの所要時間を返す
+    
+    DSPスタックはここで初めて読み込む（ウォームアップしないプロセスでは読み込まない）
+    """
+    import numpy as np
+    from analysis_profiles import PROFILES
+    from chart_renderer import render_timeline_png
+    from improved_audio_analyzer import ImprovedAudioAnalyzer
+
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+    temp_dir = tempfile.mkdtemp(prefix="clipers_warmup_")
+    try:
+        audio_path = os.path.join(temp_dir, "warmup.wav")
+        _synthetic_audio(audio_path)
+
+        analyzer = ImprovedAudioAnalyzer()
+        analysis: Dict = {}
+        for name in PROFILES:
+            step_started = time.perf_counter()
+            analysis = analyzer.analyze_audio_accurate(audio_path, profile=name)
+            timings[f"analyze.{name}"] = time.perf_counter() - step_started
+            if "error" in analysis:
+                logger.warning("ウォームアップの分析に失敗しました", extra={"profile": name, "error": analysis["error"]})
+
+        step_started = time.perf_counter()
+        db = np.linspace(-40, -10, 200)
+        render_timeline_png(np.linspace(0, WARMUP_SECONDS, len(db)), db,
+                            analysis.get("excitement_points", [])[:3])
+        timings["chart"] = time.perf_counter() - step_started
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    record_startup_phase("warmup", time.perf_counter() - started)
+    WARMUP_READY.set(1)
+    return timings